@@ -470,6 +470,20 @@ def api_dashboard_stats():
     """Get dashboard statistics"""
     return AdminAPIView.get_dashboard_stats()
 
+@admin_bp.route("/api/cache-stats")
+@require_auth
+@require_permission('view_dashboard')
+def api_cache_stats():
+    """Get this worker's cache hit/miss counters"""
+    return AdminAPIView.get_cache_stats()
+
+@admin_bp.route("/api/now-playing")
+@require_auth
+@require_permission('view_schedule')
+def api_now_playing():
+    """Get bookings that are in progress right now"""
+    return AdminAPIView.get_now_playing()
+
 @admin_bp.route("/api/schedule-data", methods=["POST"])
 @require_auth
 @require_permission('manage_bookings')
@@ -477,6 +491,20 @@ def api_schedule_data():
     """Get schedule data for date range"""
     return AdminAPIView.get_schedule_data()
 
+@admin_bp.route("/api/block-slots", methods=["POST"])
+@require_auth
+@require_permission('manage_schedule')
+def api_block_slots():
+    """Block a time range on several courts over several days"""
+    return AdminAPIView.block_slots()
+
+@admin_bp.route("/api/unblock-slots", methods=["POST"])
+@require_auth
+@require_permission('manage_schedule')
+def api_unblock_slots():
+    """Unblock a time range on several courts over several days"""
+    return AdminAPIView.unblock_slots()
+
 @admin_bp.route("/api/admin-create-booking", methods=["POST"])
 @require_auth
 @require_permission('manage_bookings')
@@ -484,6 +512,13 @@ def api_admin_create_booking():
     """Create booking from admin panel"""
     return AdminAPIView.create_booking()
 
+@admin_bp.route("/api/admin-create-booking-series", methods=["POST"])
+@require_auth
+@require_permission('manage_bookings')
+def api_admin_create_booking_series():
+    """Create a recurring booking series from admin panel"""
+    return AdminAPIView.create_booking_series()
+
 @admin_bp.route("/api/update-booking", methods=["POST"])
 @require_auth
 @require_permission('manage_bookings')
@@ -5,6 +5,7 @@ from flask import render_template, request, jsonify, redirect, url_for
 import logging
 
 from services.admin_service import AdminService
+from services.booking_service import BookingConflictError
 from services.schedule_service import ScheduleService
 from services.pricing_service import PricingService
 from services.expense_service import ExpenseService
@@ -192,6 +193,51 @@ class AdminAPIView:
             logger.error(f"Dashboard stats error: {e}")
             return jsonify({"success": False, "message": str(e)})
     
+    @staticmethod
+    def get_cache_stats():
+        """Get cache statistics API endpoint"""
+        try:
+            from services.availability_service import AvailabilityService
+            from services.notification_service import NotificationService
+            from services.pricing_service import PricingService
+            return jsonify({
+                "success": True,
+                "availability": AvailabilityService.get_stats(),
+                "pricing": PricingService.get_stats(),
+                "invalidation": NotificationService.get_stats(),
+            })
+        
+        except Exception as e:
+            logger.error(f"Error getting cache stats: {e}")
+            return jsonify({"success": False, "message": str(e)}), 500
+    
+    @staticmethod
+    def get_now_playing():
+        """Get bookings currently in progress API endpoint"""
+        try:
+            from services.booking_service import BookingService
+            bookings = BookingService.get_bookings_in_progress()
+            return jsonify({
+                "success": True,
+                "bookings": [
+                    {
+                        "bookingId": b["id"],
+                        "court": b["court"],
+                        "courtName": b["court_name"],
+                        "sport": b["sport"],
+                        "playerName": b["player_name"],
+                        "status": b["status"],
+                        "startAt": b["start_at"].isoformat(),
+                        "endAt": b["end_at"].isoformat(),
+                    }
+                    for b in bookings
+                ],
+            })
+        
+        except Exception as e:
+            logger.error(f"Error getting bookings in progress: {e}")
+            return jsonify({"success": False, "message": str(e)}), 500
+    
     @staticmethod
     def get_schedule_data():
         """Get schedule data for date range API endpoint"""
@@ -208,11 +254,18 @@ class AdminAPIView:
                     "schedule": {}
                 })
             
+            # Incremental refresh: only cells changed since the client's cursor
+            if data.get("since"):
+                delta = ScheduleService.get_schedule_changes(start_date, end_date, sport_filter, data.get("since"))
+                return jsonify({"success": True, **delta})
+            
+            cursor = ScheduleService.get_change_cursor()
             schedule = ScheduleService.get_schedule_data(start_date, end_date, sport_filter)
             
             return jsonify({
                 "success": True,
                 "schedule": schedule,
+                "cursor": cursor,
                 "debug_info": {
                     "total_days": len(schedule),
                     "sport_filter": sport_filter,
@@ -258,6 +311,33 @@ class AdminAPIView:
             logger.error(f"Admin create booking error: {e}")
             return jsonify({"success": False, "message": str(e)})
     
+    @staticmethod
+    def create_booking_series():
+        """Create a recurring booking series from admin panel API endpoint"""
+        try:
+            from flask import g
+            from services.booking_series_service import BookingSeriesService
+            from services.booking_service import BookingConflictError
+            
+            booking_data = request.json or {}
+            for field in ["court", "startTime", "duration", "playerName", "playerPhone", "recurrence"]:
+                if not booking_data.get(field):
+                    return jsonify({"success": False, "message": f"Missing required field: {field}"}), 400
+            
+            result = BookingSeriesService.create_series(
+                booking_data, booking_data["recurrence"], g.current_user.username,
+                dry_run=bool(booking_data.get("dryRun")),
+            )
+            return jsonify({"success": True, **result})
+        
+        except BookingConflictError as e:
+            return jsonify({"success": False, "message": str(e), "conflicts": e.conflicts}), 409
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        except Exception as e:
+            logger.error(f"Admin create booking series error: {e}")
+            return jsonify({"success": False, "message": "Failed to create booking series"}), 500
+    
     @staticmethod
     def update_booking():
         """Update booking details API endpoint"""
@@ -270,6 +350,12 @@ class AdminAPIView:
             else:
                 return jsonify({"success": False, "message": "Failed to update booking"})
         
+        except BookingConflictError as e:
+            return jsonify({
+                "success": False,
+                "message": f"Booking slots already taken: {', '.join(e.conflicts)}",
+                "conflicts": e.conflicts,
+            }), 409
         except Exception as e:
             logger.error(f"Update booking error: {e}")
             return jsonify({"success": False, "message": str(e)})
@@ -295,6 +381,12 @@ class AdminAPIView:
             else:
                 return jsonify({"success": False, "message": f"Failed to {action} booking"})
         
+        except BookingConflictError as e:
+            return jsonify({
+                "success": False,
+                "message": f"Booking slots already taken: {', '.join(e.conflicts)}",
+                "conflicts": e.conflicts,
+            }), 409
         except Exception as e:
             logger.error(f"Booking action error: {e}")
             return jsonify({"success": False, "message": str(e)})
@@ -338,6 +430,73 @@ class AdminAPIView:
             logger.error(f"Delete booking error: {e}")
             return jsonify({"success": False, "message": str(e)})
     
+    @staticmethod
+    def _slot_range_request(data):
+        """Courts, dates and slot times named by a bulk block/unblock request"""
+        from services.blocked_slot_service import BlockedSlotService
+        
+        courts = data.get("courts") or ([data["court"]] if data.get("court") else [])
+        start_date = data.get("startDate")
+        end_date = data.get("endDate") or start_date
+        if data.get("timeSlots"):
+            time_slots = data["timeSlots"]
+        elif data.get("startTime") and data.get("endTime"):
+            # Step by the finest grid among the courts; block_slots keeps each court's own slots
+            from utils.booking_utils import BookingUtils
+            slot_minutes = min((BookingUtils.get_slot_minutes(court) for court in courts), default=None)
+            time_slots = BlockedSlotService.expand_time_range(data["startTime"], data["endTime"], slot_minutes)
+        else:
+            raise ValueError("Provide startTime and endTime, or timeSlots")
+        if not start_date:
+            raise ValueError("Missing startDate")
+        return courts, start_date, end_date, time_slots
+    
+    @staticmethod
+    def block_slots():
+        """Block a range of slots across courts and days API endpoint"""
+        try:
+            from flask import g
+            from services.blocked_slot_service import BlockedSlotService
+            
+            data = request.json or {}
+            courts, start_date, end_date, time_slots = AdminAPIView._slot_range_request(data)
+            result = BlockedSlotService.block_slots(
+                courts, start_date, end_date, time_slots,
+                (data.get("reason") or "").strip() or "No reason provided",
+                g.current_user.username,
+            )
+            return jsonify({
+                "success": True,
+                "message": f"Blocked {result['blocked_count']} slots ({result['already_blocked_count']} already blocked)",
+                **result,
+            })
+        
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        except Exception as e:
+            logger.error(f"Block slots error: {e}")
+            return jsonify({"success": False, "message": "Failed to block slots"}), 500
+    
+    @staticmethod
+    def unblock_slots():
+        """Unblock a range of slots across courts and days API endpoint"""
+        try:
+            from services.blocked_slot_service import BlockedSlotService
+            
+            courts, start_date, end_date, time_slots = AdminAPIView._slot_range_request(request.json or {})
+            result = BlockedSlotService.unblock_slots(courts, start_date, end_date, time_slots)
+            return jsonify({
+                "success": True,
+                "message": f"Unblocked {result['unblocked_count']} slots",
+                **result,
+            })
+        
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        except Exception as e:
+            logger.error(f"Unblock slots error: {e}")
+            return jsonify({"success": False, "message": "Failed to unblock slots"}), 500
+    
     @staticmethod
     def get_pricing():
         """Get current pricing for all courts API endpoint"""
@@ -530,7 +689,11 @@ class AdminAPIView:
     def get_pricing_by_court(court_id: str):
         """Get pricing for specific court"""
         try:
-            pricing = PricingService.get_pricing_by_court(court_id)
+            from datetime import datetime
+            on = request.args.get("date")
+            pricing = PricingService.get_pricing_by_court(
+                court_id, datetime.strptime(on, "%Y-%m-%d").date() if on else None
+            )
             
             if pricing:
                 return jsonify({
@@ -580,7 +743,8 @@ class AdminAPIView:
     def delete_pricing(court_id: str):
         """Delete court pricing"""
         try:
-            success, message = PricingService.delete_pricing(court_id)
+            pricing_id = request.args.get("id", type=int)
+            success, message = PricingService.delete_pricing(court_id, pricing_id)
             
             return jsonify({
                 "success": success,
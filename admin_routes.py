@@ -22,5 +22,10 @@ class AdminDatabaseManager:
         from database import DatabaseManager
         return DatabaseManager.get_connection()
 
+    @staticmethod
+    def release_connection(conn):
+        from database import DatabaseManager
+        DatabaseManager.release_connection(conn)
+
 # Export the blueprint as the main interface
 __all__ = ['admin_bp', 'AdminDatabaseManager', 'AdminScheduleService', 'AdminBookingService']
\ No newline at end of file
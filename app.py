@@ -4,8 +4,9 @@ ALC (All-in-one Leisure Club) Management System
 """
 
 import os
+import math
 import logging
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 
 from flask import Flask, render_template, request, jsonify
 
@@ -18,39 +19,27 @@ except ImportError:  # pragma: no cover
 # Import modular components
 from config import config
 from database import DatabaseManager
-from services import BookingService, ContactService
+from services import BookingService, ContactService, AvailabilityService, NotificationService, HoldService, QuoteService
+from services.booking_service import BookingConflictError
 from services.auth_service import AuthService, SessionManager
 from admin import admin_bp
 from config import Config
 from services.email_service import EmailService
+from utils import BookingUtils, TimeUtils
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --------- TZ + window helpers (cross-midnight safe) ---------
-ARENA_TZ = ZoneInfo("Asia/Karachi")
-WORKDAY_END_MIN = 5 * 60 + 30  # 05:30
+ARENA_TZ = ZoneInfo(Config.ARENA_TIMEZONE)
+AVAILABILITY_RANGE_MAX_DAYS = 62  # widest /api/availability/range request
+EARLIEST_SEARCH_MAX_DAYS = 14  # how far /api/availability/earliest looks ahead
 
 def parse_local_ymd(ymd: str) -> datetime:
     """Local midnight for a YYYY-MM-DD string."""
     y, m, d = map(int, ymd.split("-"))
     return datetime(y, m, d, 0, 0, 0, tzinfo=ARENA_TZ)
-
-def combine_local(display_ymd: str, hhmm: str) -> datetime:
-    """
-    Map (selected workday date, HH:mm) → actual local datetime.
-    00:00–05:30 belong to the *next* calendar date, but they are still part of the workday.
-    """
-    h, mm = map(int, hhmm.split(":"))
-    base = parse_local_ymd(display_ymd)
-    if (h * 60 + mm) < WORKDAY_END_MIN:
-        base = base + timedelta(days=1)
-    return base.replace(hour=h, minute=mm)
-
-def to_storage(dt_local: datetime) -> datetime:
-    """Convert local datetime to UTC (storage canonical)."""
-    return dt_local.astimezone(timezone.utc)
 # ------------------------------------------------------------
 
 
@@ -78,23 +67,66 @@ def create_app(config_name=None):
     # Register blueprints
     app.register_blueprint(admin_bp)
 
-    # Initialize database (don't fail startup if database is not ready)
-    try:
-        if DatabaseManager.init_database():
-            logger.info("Database initialized successfully")
-        else:
-            logger.warning("Database initialization did not complete; some tables may be missing.")
-    except Exception as e:
-        logger.warning(
-            f"Database initialization failed: {e}. App will start without database."
-        )
+    # One pooled connection / transaction per request
+    DatabaseManager.init_app(app)
+    # Evict other workers' cached entries when one worker writes
+    NotificationService.init_app(app)
+    # Sweep expired checkout holds in every worker
+    HoldService.init_app(app)
+
+    # Schema setup and data migrations run one worker at a time: every gunicorn
+    # worker imports the app, and the later ones find nothing left to do
+    with DatabaseManager.session_lock("startup-migrations"):
+        # Initialize database (don't fail startup if database is not ready)
+        try:
+            if DatabaseManager.init_database():
+                logger.info("Database initialized successfully")
+            else:
+                logger.warning("Database initialization did not complete; some tables may be missing.")
+        except Exception as e:
+            logger.warning(
+                f"Database initialization failed: {e}. App will start without database."
+            )
 
-    # Ensure default pricing exists (seed once if empty)
-    try:
-        from services.pricing_service import PricingService
-        PricingService.initialize_default_pricing()
-    except Exception as e:
-        logger.warning(f"Pricing initialization skipped: {e}")
+        # Ensure default pricing exists (seed once if empty)
+        try:
+            from services.pricing_service import PricingService
+            PricingService.initialize_default_pricing()
+        except Exception as e:
+            logger.warning(f"Pricing initialization skipped: {e}")
+
+        # The backfills only rewrite how legacy bookings are stored, so they
+        # are kept out of the schedule change log (one row per booking otherwise)
+        try:
+            with DatabaseManager.without_schedule_log():
+                # Make sure every active booking has its slot occupancy rows
+                try:
+                    BookingService.backfill_booking_slots()
+                except Exception as e:
+                    logger.warning(f"Booking slot backfill skipped: {e}")
+
+                try:
+                    BookingService.backfill_booking_times()
+                except Exception as e:
+                    logger.warning(f"Booking time backfill skipped: {e}")
+
+                try:
+                    BookingService.backfill_slot_masks()
+                except Exception as e:
+                    logger.warning(f"Booking slot mask backfill skipped: {e}")
+
+                try:
+                    BookingService.regrid_bookings()
+                except Exception as e:
+                    logger.warning(f"Booking slot grid migration skipped: {e}")
+
+                # Fills resource_group before adding the constraint
+                try:
+                    BookingService.ensure_overlap_constraint()
+                except Exception as e:
+                    logger.warning(f"Booking overlap constraint skipped: {e}")
+        except Exception as e:
+            logger.warning(f"Booking backfills skipped: {e}")
 
     # Optionally bootstrap a super admin if explicitly enabled
     try:
@@ -267,13 +299,161 @@ def register_api_routes(app):
             if not court or not date:
                 return jsonify({"error": "Missing court or date"}), 400
 
-            booked_slots = BookingService.get_booked_slots(court, date)
+            booked_slots = AvailabilityService.get_booked_slots(court, date, data.get("holdToken") or None)
             return jsonify(booked_slots)
 
         except Exception as e:
             logger.error(f"API error - get_booked_slots: {e}")
             return jsonify({"error": "Internal server error"}), 500
 
+    @app.route("/api/availability", methods=["GET"])
+    def get_availability():
+        """
+        Unavailable (booked, blocked or held) "HH:mm" slots for every court of a
+        sport (or all courts) on one WORKDAY date, in a single response. Slots
+        held under ?holdToken= are shown as free to their holder.
+        """
+        try:
+            date = request.args.get("date")
+            sport = request.args.get("sport") or None
+
+            if not date:
+                return jsonify({"error": "Missing date"}), 400
+            try:
+                parse_local_ymd(date)
+            except ValueError:
+                return jsonify({"error": "Invalid date"}), 400
+            if sport and sport not in Config.COURT_CONFIG:
+                return jsonify({"error": "Unknown sport"}), 400
+
+            sports = [sport] if sport else list(Config.COURT_CONFIG.keys())
+            court_ids = [court["id"] for sport_key in sports for court in Config.COURT_CONFIG[sport_key]]
+
+            return jsonify({
+                "date": date,
+                "sport": sport,
+                "courts": BookingService.get_booked_slots_for_courts(
+                    court_ids, date, request.args.get("holdToken") or None
+                ),
+            })
+
+        except Exception as e:
+            logger.error(f"API error - get_availability: {e}")
+            return jsonify({"error": "Internal server error"}), 500
+
+    @app.route("/api/availability/range", methods=["GET"])
+    def get_availability_range():
+        """
+        Per-day, per-court free-slot counts (and free evening-peak slots) for a
+        range of WORKDAY dates, for shading the date picker.
+        """
+        try:
+            start = request.args.get("start")
+            end = request.args.get("end")
+            sport = request.args.get("sport") or None
+
+            if not start or not end:
+                return jsonify({"error": "Missing start or end"}), 400
+            try:
+                start_date = parse_local_ymd(start).date()
+                end_date = parse_local_ymd(end).date()
+            except ValueError:
+                return jsonify({"error": "Invalid date"}), 400
+            if end_date < start_date:
+                return jsonify({"error": "end must not be before start"}), 400
+            if (end_date - start_date).days >= AVAILABILITY_RANGE_MAX_DAYS:
+                return jsonify({"error": f"Range is limited to {AVAILABILITY_RANGE_MAX_DAYS} days"}), 400
+            if sport and sport not in Config.COURT_CONFIG:
+                return jsonify({"error": "Unknown sport"}), 400
+
+            sports = [sport] if sport else list(Config.COURT_CONFIG.keys())
+            court_ids = [court["id"] for sport_key in sports for court in Config.COURT_CONFIG[sport_key]]
+
+            days = AvailabilityService.get_range_summary(court_ids, start_date, end_date)
+            if days is None:
+                return jsonify({"error": "Availability unavailable"}), 503
+
+            return jsonify({
+                "start": start_date.isoformat(),
+                "end": end_date.isoformat(),
+                "sport": sport,
+                "slotsPerDay": AvailabilityService.open_mask().bit_count(),
+                "peakSlotsPerDay": AvailabilityService.peak_mask().bit_count(),
+                # The per-day totals are for 30-minute courts; scale by 30 / slotMinutes for others
+                "slotMinutes": {court_id: BookingUtils.get_slot_minutes(court_id) for court_id in court_ids},
+                "days": days,
+            })
+
+        except Exception as e:
+            logger.error(f"API error - get_availability_range: {e}")
+            return jsonify({"error": "Internal server error"}), 500
+
+    @app.route("/api/availability/earliest", methods=["GET"])
+    def find_earliest_availability():
+        """
+        Earliest start of `duration` hours of contiguous free slots on any court
+        of `sport`, scanning forward from WORKDAY `date` at `after` ("HH:mm";
+        defaults to now for the current workday, else opening time).
+        """
+        try:
+            sport = request.args.get("sport")
+            if not sport or sport not in Config.COURT_CONFIG:
+                return jsonify({"error": "Unknown sport"}), 400
+            courts = [c for c in Config.COURT_CONFIG[sport] if c.get("booking_mode") != "phone_only"]
+            if not courts:
+                return jsonify({"error": "This activity is booked by phone"}), 400
+
+            try:
+                duration = float(request.args.get("duration", "1"))
+                days = int(request.args.get("days", "7"))
+            except ValueError:
+                return jsonify({"error": "Invalid duration or days"}), 400
+            # Durations and start times step by a slot length every court of the sport can book
+            step = math.lcm(*{BookingUtils.get_slot_minutes(c["id"]) for c in courts})
+            duration_minutes = int(round(duration * 60 / step)) * step
+            if duration_minutes < step or duration_minutes != duration * 60 or duration > 6:
+                return jsonify({"error": f"Duration must be up to 6 hours in {step}-minute steps"}), 400
+            if not 1 <= days <= EARLIEST_SEARCH_MAX_DAYS:
+                return jsonify({"error": f"days must be 1 to {EARLIEST_SEARCH_MAX_DAYS}"}), 400
+
+            current_workday, current_index = TimeUtils.locate_slot(datetime.now(timezone.utc), step)
+            try:
+                workday = parse_local_ymd(request.args["date"]).date() if request.args.get("date") else current_workday
+            except ValueError:
+                return jsonify({"error": "Invalid date"}), 400
+            if workday < current_workday:
+                return jsonify({"error": "Date cannot be in the past"}), 400
+
+            after = request.args.get("after")
+            if after:
+                if not TimeUtils.is_valid_time_slot(after):
+                    return jsonify({"error": "Invalid after time"}), 400
+                after_minutes = TimeUtils.slot_grid(step).time_to_index(after) * step
+            elif workday == current_workday:
+                # Next slot that has not started yet
+                after_minutes = (current_index + 1) * step
+            else:
+                after_minutes = 0
+
+            options = AvailabilityService.find_earliest(
+                [c["id"] for c in courts], workday, after_minutes, duration_minutes, days
+            )
+            for option in options:
+                option["courtName"] = BookingUtils.get_court_name(option["court"])
+                option["startTime"] = option["slots"][0]
+                option["endTime"] = TimeUtils.calculate_end_time(option["slots"][0], duration)
+                option.pop("startMinutes")
+
+            return jsonify({
+                "found": bool(options),
+                "earliest": options[0] if options else None,
+                "options": options,
+            })
+
+        except Exception as e:
+            logger.error(f"API error - find_earliest_availability: {e}")
+            return jsonify({"error": "Internal server error"}), 500
+
     @app.route("/api/check-conflicts", methods=["POST"])
     def check_conflicts():
         """
@@ -311,6 +491,119 @@ def register_api_routes(app):
                 500,
             )
 
+    @app.route("/api/slot-holds", methods=["POST"])
+    def create_slot_hold():
+        """
+        Hold selected slots of a court on a WORKDAY date for a few minutes while
+        the customer checks out. Pass the returned holdToken to /api/create-booking;
+        pass it back here as holdToken to replace the hold when the selection changes.
+        """
+        try:
+            data = request.get_json(force=True) or {}
+            court = data.get("court")
+            date = data.get("date")
+            selected = data.get("selectedSlots", [])
+
+            if not court or not date or not selected:
+                return jsonify({"success": False, "message": "Missing court/date/slots"}), 400
+            if not BookingUtils.get_court_info(court):
+                return jsonify({"success": False, "message": "Unknown court"}), 400
+            try:
+                parse_local_ymd(date)
+            except ValueError:
+                return jsonify({"success": False, "message": "Invalid date"}), 400
+
+            times = [(s["time"] if isinstance(s, dict) else s) for s in selected]
+            if not all(isinstance(t, str) and TimeUtils.is_valid_time_slot(t) for t in times):
+                return jsonify({"success": False, "message": "Invalid time slots format"}), 400
+
+            try:
+                hold = HoldService.create_hold(court, date, times, replace_token=data.get("holdToken"))
+            except BookingConflictError as conflict:
+                return jsonify({
+                    "success": False,
+                    "message": "One or more selected time slots are no longer available",
+                    "conflicts": conflict.conflicts,
+                }), 409
+
+            return jsonify({
+                "success": True,
+                "holdToken": hold["token"],
+                "expiresAt": hold["expires_at"].isoformat(),
+                "ttlSeconds": hold["ttl_seconds"],
+            }), 201
+
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        except Exception as e:
+            logger.error(f"API error - create_slot_hold: {e}")
+            return jsonify({"success": False, "message": "Internal server error"}), 500
+
+    @app.route("/api/quote", methods=["POST"])
+    def create_quote():
+        """
+        Availability, price and promo for a selection in one call. Returns a
+        short-lived signed quoteToken when every slot is free; pass it to
+        /api/create-booking to book at the quoted amounts. court "any" with a
+        sport quotes the court that would be assigned.
+        """
+        try:
+            data = request.get_json(force=True) or {}
+            court = data.get("court")
+            date = data.get("date")
+            selected = data.get("selectedSlots", [])
+
+            # court "any" (or none) with a sport quotes the court that would be assigned
+            if court in (None, "", "any") and data.get("sport"):
+                court = "any"
+            if not court or not date or not selected:
+                return jsonify({"success": False, "message": "Missing court/date/slots"}), 400
+            if court == "any":
+                if data["sport"] not in Config.COURT_CONFIG:
+                    return jsonify({"success": False, "message": "Unknown sport"}), 400
+            elif not BookingUtils.get_court_info(court):
+                return jsonify({"success": False, "message": "Unknown court"}), 400
+            try:
+                parse_local_ymd(date)
+            except ValueError:
+                return jsonify({"success": False, "message": "Invalid date"}), 400
+
+            times = [(s["time"] if isinstance(s, dict) else s) for s in selected]
+            if not all(isinstance(t, str) and TimeUtils.is_valid_time_slot(t) for t in times):
+                return jsonify({"success": False, "message": "Invalid time slots format"}), 400
+
+            # The promo's sport always comes from the court, never the request
+            quote = QuoteService.create_quote(
+                court, date, times,
+                sport=data.get("sport") if court == "any" else None,
+                promo_code=data.get("promoCode", ""),
+                hold_token=data.get("holdToken"),
+            )
+            if not quote["available"]:
+                return jsonify({
+                    "success": False,
+                    "message": "One or more selected time slots are no longer available",
+                    **quote,
+                }), 409
+
+            return jsonify({"success": True, "currency": "PKR", **quote})
+
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+        except Exception as e:
+            logger.error(f"API error - create_quote: {e}")
+            return jsonify({"success": False, "message": "Internal server error"}), 500
+
+    @app.route("/api/slot-holds/<token>", methods=["DELETE"])
+    def release_slot_hold(token):
+        """Release a checkout hold early (e.g. the customer went back)"""
+        try:
+            released = HoldService.release_hold(token)
+            return jsonify({"success": True, "released": released})
+        except Exception as e:
+            logger.error(f"API error - release_slot_hold: {e}")
+            return jsonify({"success": False, "message": "Internal server error"}), 500
+
     @app.route("/api/create-booking", methods=["POST"])
     def create_booking():
         """
@@ -324,8 +617,14 @@ def register_api_routes(app):
             workday = data.get("date") or data.get("booking_date")  # selected date (workday)
             selected = data.get("selectedSlots", [])  # [{time:'HH:mm', index:int}, ...] OR ["HH:mm", ...]
 
+            # court "any" (or none) with a sport: BookingService assigns the court
+            grid_court = court
+            if court in (None, "", "any") and data.get("sport"):
+                court = "any"
+                grid_court = next(iter(BookingService.get_assignable_courts(data["sport"])), None)
+
             # Basic validations
-            if not court or not workday or not selected:
+            if not grid_court or not workday or not selected:
                 return jsonify({"success": False, "message": "Missing court/date/slots"}), 400
 
             # Customer field validations
@@ -349,44 +648,17 @@ def register_api_routes(app):
             times = [(s["time"] if isinstance(s, dict) else s) for s in selected]
             if not all(isinstance(t, str) and ":" in t for t in times):
                 return jsonify({"success": False, "message": "Invalid time slots format"}), 400
+            # Stored/compared slot shape is [{time:'HH:mm', ...}]
+            selected = [(s if isinstance(s, dict) else {"time": s}) for s in selected]
 
-            # Build concrete datetimes (local) for robustness / email / UTC storage if needed
-            start_dts_local = sorted(combine_local(workday, t) for t in times)
-            start_local = start_dts_local[0]
-            end_local = start_dts_local[-1] + timedelta(minutes=30)
-
-            start_utc = to_storage(start_local)
-            end_utc = to_storage(end_local)
-            slot_starts_utc = [to_storage(dt) for dt in start_dts_local]
+            # Canonical UTC span from the cached workday slot table
+            slot_minutes = BookingUtils.get_slot_minutes(grid_court)
+            start_utc, end_utc = TimeUtils.booking_span_utc(workday, times, slot_minutes)
 
             # Duration (hours) for legacy code/notifications
-            duration_hours = round(len(times) * 0.5, 2)
+            duration_hours = round(len(times) * slot_minutes / 60, 2)
             slots_count = len(times)
 
-            # ---- Conflict check: try new signature, fallback to legacy ----
-            try:
-                available, conflicts = BookingService.check_slot_availability(
-                    court=court,
-                    start_at_utc=start_utc,
-                    end_at_utc=end_utc,
-                    slot_starts_utc=slot_starts_utc,
-                )
-            except TypeError:
-                # Legacy API (court, date, selected_slots)
-                # Ensure it's list of dicts with "time"
-                legacy_slots = selected if (selected and isinstance(selected[0], dict) and "time" in selected[0]) \
-                    else [{"time": t} for t in times]
-                available, conflicts = BookingService.check_slot_availability(
-                    court, workday, legacy_slots
-                )
-
-            if not available:
-                return jsonify({
-                    "success": False,
-                    "message": "One or more selected time slots are no longer available",
-                    "conflicts": conflicts,
-                }), 409
-
             # ---- Create booking payload (include canonical + legacy fields) ----
             payload = {
                 "court": court,
@@ -400,6 +672,8 @@ def register_api_routes(app):
                 "paymentType": data.get("paymentType", "advance"),
                 "totalAmount": data.get("totalAmount", 0),
                 "promoCode": data.get("promoCode", ""),
+                "holdToken": data.get("holdToken"),
+                "quoteToken": data.get("quoteToken"),
 
                 # Canonical timestamps (UTC)
                 "start_at_utc": start_utc.isoformat(),
@@ -425,7 +699,19 @@ def register_api_routes(app):
                 "end_time": data.get("endTime"),
             }
 
-            booking_id = BookingService.create_booking(payload)
+            # Availability is re-checked and the slots claimed atomically inside
+            # create_booking (serialized per court/workday), so no pre-check here.
+            try:
+                booking_id = BookingService.create_booking(payload)
+            except BookingConflictError as conflict:
+                return jsonify({
+                    "success": False,
+                    "message": "One or more selected time slots are no longer available",
+                    "conflicts": conflict.conflicts,
+                }), 409
+
+            # Release the slot lock before talking to SMTP
+            DatabaseManager.commit()
 
             # Fire-and-forget: email customer (SMTP must be configured)
             try:
@@ -447,6 +733,8 @@ def register_api_routes(app):
             return jsonify({
                 "success": True,
                 "bookingId": booking_id,
+                "court": payload["court"],
+                "courtName": payload["courtName"],
                 "message": "Booking created successfully",
             })
 
@@ -622,6 +910,42 @@ def register_api_routes(app):
             logger.error(f"API error - calculate_price: {e}")
             return jsonify({"success": False, "message": "Failed to calculate price"}), 500
 
+    @app.route("/api/price-matrix", methods=["GET"])
+    def get_price_matrix():
+        """
+        Price of every bookable slot for each court of a sport (or all courts) on
+        one WORKDAY date, so the booking page can price selections locally.
+        """
+        try:
+            date = request.args.get("date")
+            sport = request.args.get("sport") or None
+
+            if not date:
+                return jsonify({"success": False, "message": "Missing date"}), 400
+            try:
+                booking_date = parse_local_ymd(date).date()
+            except ValueError:
+                return jsonify({"success": False, "message": "Invalid date"}), 400
+            if sport and sport not in Config.COURT_CONFIG:
+                return jsonify({"success": False, "message": "Unknown sport"}), 400
+
+            sports = [sport] if sport else list(Config.COURT_CONFIG.keys())
+            court_ids = [court["id"] for sport_key in sports for court in Config.COURT_CONFIG[sport_key]]
+
+            from services.pricing_service import PricingService
+
+            return jsonify({
+                "success": True,
+                "date": date,
+                "sport": sport,
+                "currency": "PKR",
+                "courts": PricingService.get_price_matrix(court_ids, booking_date),
+            })
+
+        except Exception as e:
+            logger.error(f"API error - get_price_matrix: {e}")
+            return jsonify({"success": False, "message": "Failed to get price matrix"}), 500
+
     @app.route("/api/apply-promo-code", methods=["POST"])
     def apply_promo_code():
         """Apply promo code for customer booking"""
@@ -680,7 +1004,7 @@ def register_api_routes(app):
         try:
             from services.pricing_service import PricingService
 
-            pricing_data = PricingService.get_all_pricing()
+            pricing_data = PricingService.get_current_pricing()
 
             # Format pricing data for customer display
             formatted_pricing = {}
@@ -717,11 +1041,7 @@ def register_api_routes(app):
                 {
                     "success": True,
                     "pricing": formatted_pricing,
-                    "timing_info": {
-                        "peak_hours": "5:00 PM - 2:00 AM",
-                        "off_peak_hours": "2:00 PM - 5:00 PM & 2:00 AM - 6:00 AM",
-                        "weekend": "Saturday & Sunday (All Day)",
-                    },
+                    "timing_info": PricingService.get_timing_info(),
                 }
             )
 
@@ -103,6 +103,35 @@ class Config:
             "sslmode": os.environ.get("DB_SSLMODE", "prefer"),
         }
 
+    # Connection pool (per gunicorn worker process)
+    DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "1"))
+    DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "5"))
+    # Seconds to wait for a free connection before giving up
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+    # Recycle connections older than this many seconds
+    DB_POOL_MAX_LIFETIME = int(os.environ.get("DB_POOL_MAX_LIFETIME", "1800"))
+    # Ping connections idle for longer than this many seconds before reuse
+    DB_POOL_PING_AFTER = int(os.environ.get("DB_POOL_PING_AFTER", "30"))
+
+    # Per-worker availability cache (see services/availability_service.py)
+    AVAILABILITY_CACHE_TTL = int(os.environ.get("AVAILABILITY_CACHE_TTL", "60"))
+    AVAILABILITY_CACHE_MAX_ENTRIES = int(os.environ.get("AVAILABILITY_CACHE_MAX_ENTRIES", "1024"))
+
+    # Per-worker pricing snapshot: seconds between checks of the stored pricing
+    # version (a fallback for missed cross-worker notifications)
+    PRICING_VERSION_CHECK_SECONDS = int(os.environ.get("PRICING_VERSION_CHECK_SECONDS", "60"))
+
+    # Checkout slot holds
+    SLOT_HOLD_SECONDS = int(os.environ.get("SLOT_HOLD_SECONDS", "300"))
+    SLOT_HOLD_REAP_INTERVAL = int(os.environ.get("SLOT_HOLD_REAP_INTERVAL", "60"))
+
+    # Signed checkout quotes: how long a quoted price is honoured at booking
+    QUOTE_TTL_SECONDS = int(os.environ.get("QUOTE_TTL_SECONDS", "300"))
+
+    # Cross-worker cache invalidation (Postgres LISTEN/NOTIFY)
+    CACHE_NOTIFY_ENABLED = os.environ.get("CACHE_NOTIFY_ENABLED", "true").lower() in ("1", "true", "yes")
+    CACHE_NOTIFY_CHANNEL = os.environ.get("CACHE_NOTIFY_CHANNEL", "cache_invalidation")
+
     # Court Configurations
     COURT_CONFIG = {
         "padel": [
@@ -117,7 +146,10 @@ class Config:
         "pickleball": [{"id": "pickleball-1", "name": "Court 1: Professional"}],
         "axe_throw": [{"id": "axe-1", "name": "Lane 1: Axe Throw"}],
         "archery": [{"id": "archery-1", "name": "Lane 1: Archery Range"}],
-        # Phone-only experience (15-minute sessions)
+        # 15-minute sessions (courts without "slot_minutes" use 30-minute
+        # slots). Staff book it on its own grid from the admin schedule and
+        # series; online checkout stays off ("phone_only") until it has a
+        # list price below and the customer page renders 15-minute slots.
         "rage_room": [
             {
                 "id": "rage-room-1",
@@ -128,6 +160,23 @@ class Config:
         ],
     }
 
+    # Local timezone of the arena; bookings.start_at/end_at are stored in UTC
+    ARENA_TIMEZONE = os.environ.get("ARENA_TIMEZONE", "Asia/Karachi")
+
+    # Public booking grid opens at this time; the workday ends at 05:30
+    BOOKING_OPEN_TIME = os.environ.get("BOOKING_OPEN_TIME", "14:00")
+
+    # Pricing windows as [start, end) local times (a window may run past
+    # midnight). A slot is charged the court's rate for the first window its
+    # start time falls in, else the base price; /api/pricing-info describes
+    # the same windows.
+    PRICING_WINDOWS = {
+        "peak": [("17:00", "02:00")],
+        "off_peak": [("14:00", "17:00"), ("02:00", "06:00")],
+    }
+    # Days (Monday = 0) charged at a court's weekend_price all day, if it has one
+    WEEKEND_DAYS = (5, 6)
+
     # Multi-purpose court mapping
     MULTI_PURPOSE_COURTS = {"cricket-2": "multi-130x60", "futsal-1": "multi-130x60"}
 
@@ -141,7 +190,7 @@ class Config:
         "pickleball": 3000,
         "axe_throw": 4000,
         "archery": 3500,
-        "rage_room": 0,  # phone-only; priced per conversation
+        "rage_room": 0,  # priced per conversation while phone-only; set before enabling online booking
     }
 
     # Admin Configuration
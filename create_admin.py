@@ -16,6 +16,7 @@ import hashlib
 
 def create_admin_user(username, password, role='super_admin'):
     """Create an admin user with proper password hashing"""
+    conn = None
     try:
         conn = DatabaseManager.get_connection()
         cursor = conn.cursor()
@@ -56,7 +57,7 @@ def create_admin_user(username, password, role='super_admin'):
             conn.rollback()
     finally:
         if conn:
-            conn.close()
+            DatabaseManager.release_connection(conn)
 
 if __name__ == "__main__":
     # Create multiple admin users
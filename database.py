@@ -1,39 +1,492 @@
 """
 Database connection and management module.
 """
+import os
+import time
+import threading
+from contextlib import contextmanager
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError
 import logging
+from flask import g, has_app_context, jsonify
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+
+class ConnectionPool:
+    """Bounded, thread-safe psycopg2 connection pool.
+
+    - At most ``max_size`` connections are checked out at once; callers wait up
+      to ``timeout`` seconds for a free one.
+    - Connections are health-checked on checkout (closed/broken connections and
+      ones left mid-transaction are discarded; long-idle ones are pinged).
+    - Connections older than ``max_lifetime`` seconds are recycled.
+    """
+
+    def __init__(self, config, min_size=1, max_size=5, timeout=10.0, max_lifetime=1800, ping_after=30):
+        self._config = config
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.pid = os.getpid()
+
+        self._idle = []     # [(conn, last_used)]
+        self._born = {}     # id(conn) -> monotonic time opened
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+
+        self._prefill()
+
+    def _prefill(self):
+        """Open ``min_size`` connections up front (best effort)."""
+        for _ in range(self.min_size):
+            try:
+                conn = self._connect()
+            except Exception as e:
+                logger.warning(f"Connection pool prefill skipped: {e}")
+                return
+            self._idle.append((conn, time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._config)
+        self._born[id(conn)] = time.monotonic()
+        return conn
+
+    def _expired(self, conn) -> bool:
+        born = self._born.get(id(conn))
+        return born is None or (time.monotonic() - born) > self.max_lifetime
+
+    def _discard(self, conn):
+        self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if conn.closed or self._expired(conn):
+            return False
+        if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            return False
+        if (time.monotonic() - last_used) > self.ping_after:
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+                conn.rollback()
+            except Exception:
+                return False
+        return True
+
+    def getconn(self):
+        """Check out a healthy connection, opening a new one if none are idle."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError(f"connection pool exhausted (max_size={self.max_size})")
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    return self._connect()
+                conn, last_used = entry
+                if self._is_healthy(conn, last_used):
+                    return conn
+                self._discard(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close: bool = False):
+        """Return a connection to the pool (or close it when broken/expired)."""
+        if id(conn) not in self._born:
+            # Not ours (e.g. checked out from a pool inherited across fork)
+            return
+        try:
+            if not close and not conn.closed and not self._expired(conn):
+                if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+            else:
+                self._discard(conn)
+        except Exception:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+
+class UnitOfWork:
+    """One connection and one transaction shared by every query it runs.
+
+    The connection is checked out lazily on the first query. A statement whose
+    error can be survived (one that is logged and turned into ``None``, or any
+    statement outside a ``savepoint()`` block) is guarded by a savepoint so it
+    does not poison the rest of the transaction. ``raise_errors`` statements
+    inside a block are not: the block's own savepoint rolls them back, and
+    skipping the extra subtransaction keeps write-heavy requests well under
+    Postgres's per-backend subtransaction cache.
+    """
+
+    _STATEMENT_SAVEPOINT = "uow_stmt"
+
+    def __init__(self):
+        self.conn = None
+        self.cursor = None
+        self._savepoint_seq = 0
+        self._depth = 0
+        # The last statement savepoint at this nesting level is still open; it
+        # is released in the same round trip as the next guarded statement
+        self._statement_open = False
+        self._on_end = []
+
+    def _ensure_cursor(self):
+        if self.cursor is None:
+            conn = DatabaseManager.get_connection()
+            if not conn:
+                return None
+            self.conn = conn
+            self.cursor = conn.cursor(cursor_factory=RealDictCursor)
+        return self.cursor
+
+    def execute(self, query, params=None, fetch_one=False, fetch_all=True, raise_errors=False):
+        """Run a query inside this unit of work (same semantics as execute_query)"""
+        cursor = self._ensure_cursor()
+        if cursor is None:
+            if raise_errors:
+                raise PoolError("No database connection available")
+            return None
+        guarded = not raise_errors or self._depth == 0
+        prefix = ""
+        if guarded:
+            prefix = f"SAVEPOINT {self._STATEMENT_SAVEPOINT}; "
+            if self._statement_open:
+                prefix = f"RELEASE SAVEPOINT {self._STATEMENT_SAVEPOINT}; " + prefix
+        try:
+            cursor.execute(prefix + query, params)
+            if guarded:
+                self._statement_open = True
+            if fetch_one:
+                return cursor.fetchone()
+            if fetch_all:
+                return cursor.fetchall()
+            return cursor.rowcount
+        except Exception as e:
+            if guarded:
+                try:
+                    # The savepoint stays open (and empty) until the next guarded statement
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT {self._STATEMENT_SAVEPOINT}")
+                    self._statement_open = True
+                except Exception:
+                    # Savepoint itself is gone: the whole transaction is lost
+                    self.rollback()
+            if raise_errors:
+                raise
+            logger.error(f"Query execution error: {e}")
+            logger.error(f"Query: {query}")
+            logger.error(f"Params: {params}")
+            return None
+
+    @contextmanager
+    def savepoint(self):
+        """Nested transaction: roll back only this block on error"""
+        cursor = self._ensure_cursor()
+        if cursor is None:
+            raise PoolError("No database connection available")
+        self._savepoint_seq += 1
+        name = f"uow_sp_{self._savepoint_seq}"
+        cursor.execute(f"SAVEPOINT {name}")
+        outer_statement_open, self._statement_open = self._statement_open, False
+        self._depth += 1
+        try:
+            yield self
+        except Exception:
+            try:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+            except Exception:
+                self.rollback()
+            raise
+        else:
+            cursor.execute(f"RELEASE SAVEPOINT {name}")
+        finally:
+            # Rolling back to or releasing the block also ends any statement
+            # savepoint opened inside it
+            self._depth -= 1
+            self._statement_open = outer_statement_open
+
+    def after_transaction(self, callback):
+        """Run ``callback`` once this unit's transaction ends (commit or rollback)"""
+        self._on_end.append(callback)
+
+    def _run_end_callbacks(self):
+        callbacks, self._on_end = self._on_end, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"After-transaction callback failed: {e}")
+
+    def commit(self):
+        self._statement_open = False
+        try:
+            if self.conn is not None and not self.conn.closed:
+                self.conn.commit()
+        finally:
+            self._run_end_callbacks()
+
+    def rollback(self):
+        try:
+            self._rollback()
+        finally:
+            self._run_end_callbacks()
+
+    def _rollback(self):
+        self._statement_open = False
+        if self.conn is not None and not self.conn.closed:
+            try:
+                self.conn.rollback()
+            except Exception as e:
+                logger.error(f"Rollback error: {e}")
+
+    def close(self):
+        """Return the connection to the pool (rolls back anything uncommitted)"""
+        conn, self.conn, self.cursor = self.conn, None, None
+        if conn is not None:
+            DatabaseManager.release_connection(conn)
+
+
 class DatabaseManager:
     """Professional database connection manager with connection pooling support"""
     
     _instance = None
     _config = Config.DATABASE_CONFIG
+    _pool = None
+    _pool_lock = threading.Lock()
+    # Pools inherited from a parent process across fork(); kept referenced so
+    # their sockets are never closed (and the parent's sessions terminated) here.
+    _inherited_pools = []
+    # Units of work opened with transaction() outside of a Flask request
+    _local = threading.local()
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(DatabaseManager, cls).__new__(cls)
         return cls._instance
+
+    @staticmethod
+    def _get_pool() -> ConnectionPool:
+        """Get the connection pool for the current process, creating it lazily."""
+        pool = DatabaseManager._pool
+        if pool is not None and pool.pid == os.getpid():
+            return pool
+        with DatabaseManager._pool_lock:
+            pool = DatabaseManager._pool
+            if pool is not None and pool.pid != os.getpid():
+                DatabaseManager._inherited_pools.append(pool)
+                pool = None
+            if pool is None:
+                pool = ConnectionPool(
+                    DatabaseManager._config,
+                    min_size=Config.DB_POOL_MIN_SIZE,
+                    max_size=Config.DB_POOL_MAX_SIZE,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+                    ping_after=Config.DB_POOL_PING_AFTER,
+                )
+                DatabaseManager._pool = pool
+            return pool
+
+    @staticmethod
+    def _after_fork_in_child():
+        """Drop the parent's pool in a forked worker (gunicorn --workers N)."""
+        if DatabaseManager._pool is not None:
+            DatabaseManager._inherited_pools.append(DatabaseManager._pool)
+            DatabaseManager._pool = None
+        DatabaseManager._pool_lock = threading.Lock()
     
     @staticmethod
     def get_connection():
-        """Get database connection with error handling"""
+        """Check out a pooled database connection (return it with release_connection)"""
         try:
-            conn = psycopg2.connect(**DatabaseManager._config)
-            return conn
+            return DatabaseManager._get_pool().getconn()
         except Exception as e:
             host = DatabaseManager._config.get("host")
             port = DatabaseManager._config.get("port")
             logger.error(f"Database connection error: {e} (host={host}, port={port})")
             return None
+
+    @staticmethod
+    def release_connection(conn, discard: bool = False):
+        """Return a connection to the pool; discard it if it may be broken"""
+        if conn is None:
+            return
+        pool = DatabaseManager._pool
+        if pool is not None and pool.pid == os.getpid():
+            pool.putconn(conn, close=discard)
+        else:
+            try:
+                conn.close()
+            except Exception:
+                pass
     
     @staticmethod
-    def execute_query(query, params=None, fetch_one=False, fetch_all=True):
-        """Execute query with proper error handling and connection management"""
+    def _current_unit():
+        """Unit of work bound to the current request (flask.g) or thread, if any"""
+        if has_app_context():
+            unit = g.get("_db_unit")
+            if unit is not None:
+                return unit
+        return getattr(DatabaseManager._local, "unit", None)
+
+    @staticmethod
+    @contextmanager
+    def transaction():
+        """Run a block atomically.
+
+        Inside a request (or an enclosing transaction) this is a savepoint on the
+        shared connection; otherwise it opens, commits and releases its own.
+        """
+        unit = DatabaseManager._current_unit()
+        if unit is not None:
+            with unit.savepoint():
+                yield unit
+            return
+
+        unit = UnitOfWork()
+        DatabaseManager._local.unit = unit
+        try:
+            yield unit
+            unit.commit()
+        except Exception:
+            unit.rollback()
+            raise
+        finally:
+            DatabaseManager._local.unit = None
+            unit.close()
+
+    @staticmethod
+    @contextmanager
+    def session_lock(name: str):
+        """Hold a session-level advisory lock for the block, waiting for other holders.
+
+        Used so that one gunicorn worker at a time runs the startup
+        migrations. Yields False (and runs the block unlocked) if no
+        connection is available.
+        """
+        conn = DatabaseManager.get_connection()
+        if not conn:
+            yield False
+            return
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (name,))
+            conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not take advisory lock {name}: {e}")
+            DatabaseManager.release_connection(conn, discard=True)
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (name,))
+                conn.commit()
+                DatabaseManager.release_connection(conn)
+            except Exception as e:
+                # Closing the session drops the lock as well
+                logger.warning(f"Could not release advisory lock {name}: {e}")
+                DatabaseManager.release_connection(conn, discard=True)
+
+    @staticmethod
+    @contextmanager
+    def without_schedule_log():
+        """Run a block in a transaction whose booking/block writes skip schedule_changes.
+
+        For data migrations that rewrite stored rows without changing what
+        the schedule shows. The setting lasts until the enclosing
+        transaction ends.
+        """
+        with DatabaseManager.transaction() as unit:
+            DatabaseManager.execute_query(
+                "SELECT set_config('noball.skip_schedule_log', 'on', true)", fetch_one=True, raise_errors=True
+            )
+            yield unit
+
+    @staticmethod
+    def commit():
+        """Commit the current unit of work early (e.g. before sending emails)"""
+        unit = DatabaseManager._current_unit()
+        if unit is not None:
+            unit.commit()
+
+    @staticmethod
+    def after_transaction(callback):
+        """Run ``callback`` when the current unit of work ends (immediately if there is none)"""
+        unit = DatabaseManager._current_unit()
+        if unit is not None:
+            unit.after_transaction(callback)
+        else:
+            callback()
+
+    @staticmethod
+    def init_app(app):
+        """Bind one unit of work to every request: commit (or roll back) once at the end"""
+
+        @app.before_request
+        def _begin_unit_of_work():
+            g._db_unit = UnitOfWork()
+
+        @app.after_request
+        def _finish_unit_of_work(response):
+            unit = g.pop("_db_unit", None)
+            if unit is None:
+                return response
+            try:
+                if response.status_code >= 500:
+                    unit.rollback()
+                else:
+                    unit.commit()
+            except Exception as e:
+                logger.error(f"Request transaction commit failed: {e}")
+                unit.rollback()
+                response = jsonify({"success": False, "message": "Database error"})
+                response.status_code = 500
+            finally:
+                unit.close()
+            return response
+
+        @app.teardown_request
+        def _discard_unit_of_work(exc):
+            # Only reached with a unit still bound when after_request did not run
+            unit = g.pop("_db_unit", None)
+            if unit is not None:
+                unit.rollback()
+                unit.close()
+    
+    @staticmethod
+    def execute_query(query, params=None, fetch_one=False, fetch_all=True, raise_errors=False):
+        """Execute query with proper error handling and connection management.
+
+        Errors are logged and turned into None unless raise_errors is set (used
+        where callers need to inspect e.g. a unique violation).
+        """
+        unit = DatabaseManager._current_unit()
+        if unit is not None:
+            return unit.execute(query, params, fetch_one=fetch_one, fetch_all=fetch_all,
+                                raise_errors=raise_errors)
+
         conn = None
         try:
             conn = DatabaseManager.get_connection()
@@ -41,7 +494,7 @@ class DatabaseManager:
                 return None
             
             cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute(query, params or ())
+            cursor.execute(query, params)
             
             if fetch_one:
                 result = cursor.fetchone()
@@ -55,40 +508,32 @@ class DatabaseManager:
         
         except Exception as e:
             if conn:
-                conn.rollback()
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            if raise_errors:
+                raise
             logger.error(f"Query execution error: {e}")
             logger.error(f"Query: {query}")
             logger.error(f"Params: {params}")
             return None
         finally:
             if conn:
-                conn.close()
+                DatabaseManager.release_connection(conn)
     
     @staticmethod
     def execute_transaction(queries_with_params):
         """Execute multiple queries in a single transaction"""
-        conn = None
         try:
-            conn = DatabaseManager.get_connection()
-            if not conn:
-                return False
-            
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            
-            for query, params in queries_with_params:
-                cursor.execute(query, params or ())
-            
-            conn.commit()
+            with DatabaseManager.transaction() as unit:
+                for query, params in queries_with_params:
+                    unit.execute(query, params, fetch_all=False, raise_errors=True)
             return True
         
         except Exception as e:
-            if conn:
-                conn.rollback()
             logger.error(f"Transaction execution error: {e}")
             return False
-        finally:
-            if conn:
-                conn.close()
     
     @staticmethod
     def init_database():
@@ -154,7 +599,7 @@ class DatabaseManager:
                     booking_date DATE NOT NULL,
                     start_time TIME NOT NULL,
                     end_time TIME NOT NULL,
-                    duration DECIMAL(3,1) NOT NULL,
+                    duration DECIMAL(4,2) NOT NULL,
                     selected_slots JSONB NOT NULL,
                     player_name VARCHAR(100) NOT NULL,
                     player_phone VARCHAR(20) NOT NULL,
@@ -208,8 +653,7 @@ class DatabaseManager:
                     effective_from DATE,
                     effective_until DATE,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(court_id, is_active) DEFERRABLE INITIALLY DEFERRED
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 );
                 
                 CREATE TABLE IF NOT EXISTS promo_codes (
@@ -506,6 +950,134 @@ class DatabaseManager:
                 if not _ensure_table(tbl, stmt):
                     success = False
 
+            # Normalized slot occupancy: one row per booked slot of a resource
+            # (multi-purpose courts share one resource_group). slot_index counts
+            # slots of the court's grid (30 or 15 minutes) from the 05:30 boundary.
+            if not _ensure_table("booking_slots", """
+                CREATE TABLE IF NOT EXISTS booking_slots (
+                    resource_group VARCHAR(50) NOT NULL,
+                    workday DATE NOT NULL,
+                    slot_index SMALLINT NOT NULL,
+                    booking_id VARCHAR(50) NOT NULL REFERENCES bookings(id) ON DELETE CASCADE
+                );
+            """):
+                success = False
+
+            # Short-lived checkout holds on the same slot grid as booking_slots;
+            # rows past expires_at are ignored and reaped in the background.
+            if not _ensure_table("slot_holds", """
+                CREATE TABLE IF NOT EXISTS slot_holds (
+                    token VARCHAR(64) NOT NULL,
+                    court VARCHAR(50) NOT NULL,
+                    resource_group VARCHAR(50) NOT NULL,
+                    workday DATE NOT NULL,
+                    slot_index SMALLINT NOT NULL,
+                    expires_at TIMESTAMPTZ NOT NULL,
+                    created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                );
+            """):
+                success = False
+
+            # Recurring admin bookings; each occurrence is a normal booking
+            # row carrying the series id.
+            if not _ensure_table("booking_series", """
+                CREATE TABLE IF NOT EXISTS booking_series (
+                    id VARCHAR(50) PRIMARY KEY,
+                    court VARCHAR(50) NOT NULL,
+                    start_time TIME NOT NULL,
+                    duration DECIMAL(4,2) NOT NULL,
+                    recurrence JSONB NOT NULL,
+                    first_date DATE NOT NULL,
+                    last_date DATE NOT NULL,
+                    player_name VARCHAR(100) NOT NULL,
+                    player_phone VARCHAR(20) NOT NULL,
+                    created_by VARCHAR(100) DEFAULT 'admin',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """):
+                success = False
+
+            # Version counters for per-worker caches (e.g. "pricing"); writers
+            # bump them in the same transaction as the data they change.
+            if not _ensure_table("cache_versions", """
+                CREATE TABLE IF NOT EXISTS cache_versions (
+                    name VARCHAR(50) PRIMARY KEY,
+                    version BIGINT NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """):
+                success = False
+
+            # Change log behind the admin schedule's incremental refresh: one row
+            # per (court, date) touched by a booking or block write. txid lets
+            # readers resume from a snapshot without missing late commits.
+            # pg_current_xact_id() (and pg_snapshot_xmin in ScheduleService)
+            # need PostgreSQL 13 or newer.
+            if not _ensure_table("schedule_changes", """
+                CREATE TABLE IF NOT EXISTS schedule_changes (
+                    id BIGSERIAL PRIMARY KEY,
+                    txid BIGINT NOT NULL DEFAULT (pg_current_xact_id()::text::bigint),
+                    entity VARCHAR(20) NOT NULL,
+                    entity_id VARCHAR(50),
+                    court VARCHAR(50),
+                    sport VARCHAR(50),
+                    change_date DATE,
+                    op VARCHAR(10) NOT NULL,
+                    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """):
+                success = False
+            else:
+                try:
+                    DatabaseManager.execute_query("""
+                        CREATE OR REPLACE FUNCTION log_schedule_change() RETURNS trigger AS $$
+                        BEGIN
+                            -- Set by DatabaseManager.without_schedule_log() for data migrations
+                            IF current_setting('noball.skip_schedule_log', true) = 'on' THEN
+                                RETURN NULL;
+                            END IF;
+                            IF TG_TABLE_NAME = 'bookings' THEN
+                                IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND
+                                        (OLD.court, OLD.booking_date) IS DISTINCT FROM (NEW.court, NEW.booking_date)) THEN
+                                    INSERT INTO schedule_changes (entity, entity_id, court, sport, change_date, op)
+                                    VALUES ('booking', OLD.id, OLD.court, OLD.sport, OLD.booking_date, TG_OP);
+                                END IF;
+                                IF TG_OP <> 'DELETE' THEN
+                                    INSERT INTO schedule_changes (entity, entity_id, court, sport, change_date, op)
+                                    VALUES ('booking', NEW.id, NEW.court, NEW.sport, NEW.booking_date, TG_OP);
+                                END IF;
+                            ELSE
+                                IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND
+                                        (OLD.court, OLD.date) IS DISTINCT FROM (NEW.court, NEW.date)) THEN
+                                    INSERT INTO schedule_changes (entity, entity_id, court, change_date, op)
+                                    VALUES ('blocked_slot', OLD.id::text, OLD.court, OLD.date, TG_OP);
+                                END IF;
+                                IF TG_OP <> 'DELETE' THEN
+                                    INSERT INTO schedule_changes (entity, entity_id, court, change_date, op)
+                                    VALUES ('blocked_slot', NEW.id::text, NEW.court, NEW.date, TG_OP);
+                                END IF;
+                            END IF;
+                            RETURN NULL;
+                        END;
+                        $$ LANGUAGE plpgsql;
+
+                        DO $$
+                        BEGIN
+                            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_bookings_schedule_change') THEN
+                                CREATE TRIGGER trg_bookings_schedule_change
+                                AFTER INSERT OR UPDATE OR DELETE ON bookings
+                                FOR EACH ROW EXECUTE FUNCTION log_schedule_change();
+                            END IF;
+                            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_blocked_slots_schedule_change') THEN
+                                CREATE TRIGGER trg_blocked_slots_schedule_change
+                                AFTER INSERT OR UPDATE OR DELETE ON blocked_slots
+                                FOR EACH ROW EXECUTE FUNCTION log_schedule_change();
+                            END IF;
+                        END $$;
+                    """, fetch_all=False)
+                except Exception as exc:
+                    logger.warning(f"Schedule change triggers warning: {exc}")
+
             # Ensure corporate_inquiries has expected columns (idempotent)
             inquiry_columns = {
                 "company_name": "VARCHAR(200)",
@@ -560,10 +1132,52 @@ class DatabaseManager:
                 "discount_amount": "INTEGER DEFAULT 0",
                 "original_amount": "INTEGER",
                 "admin_comments": "TEXT",
+                "series_id": "VARCHAR(50)",
+                # Canonical UTC span of the booked slots (workday times resolved)
+                "start_at": "TIMESTAMPTZ",
+                "end_at": "TIMESTAMPTZ",
+                # Config.MULTI_PURPOSE_COURTS group (or the court itself), for overlap checks
+                "resource_group": "VARCHAR(50)",
+                # Bit i set = workday slot i booked (see TimeUtils.slot_indexes_to_mask);
+                # 96 bits for 15-minute lanes, so wider than BIGINT
+                "slot_mask": "NUMERIC(29,0)",
+                # Slot length slot_mask is expressed in (the court's grid)
+                "slot_minutes": "SMALLINT NOT NULL DEFAULT 30",
             }
             for col, col_def in booking_columns.items():
                 _ensure_column("bookings", col, col_def)
 
+            # Widen columns created before 15-minute lanes existed (96-bit slot
+            # masks, quarter-hour durations)
+            for table, column, column_type in (
+                ("bookings", "slot_mask", "numeric(29,0)"),
+                ("bookings", "duration", "numeric(4,2)"),
+                ("booking_series", "duration", "numeric(4,2)"),
+            ):
+                try:
+                    current = DatabaseManager.execute_query(
+                        "SELECT format_type(atttypid, atttypmod) AS column_type FROM pg_attribute "
+                        "WHERE attrelid = to_regclass(%s) AND attname = %s AND NOT attisdropped",
+                        (table, column),
+                        fetch_one=True,
+                    )
+                    if current and current["column_type"] != column_type:
+                        DatabaseManager.execute_query(
+                            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE {column_type};",
+                            fetch_all=False,
+                        )
+                except Exception as exc:
+                    logger.warning(f"Column widen warning {table}.{column}: {exc}")
+
+            # A court may have several effective-dated pricing versions
+            try:
+                DatabaseManager.execute_query(
+                    "ALTER TABLE court_pricing DROP CONSTRAINT IF EXISTS court_pricing_court_id_is_active_key;",
+                    fetch_all=False,
+                )
+            except Exception as exc:
+                logger.warning(f"court_pricing constraint warning: {exc}")
+
             expense_columns = {
                 "title": "VARCHAR(255)",
                 "description": "TEXT",
@@ -595,6 +1209,16 @@ class DatabaseManager:
             # Create indexes after columns exist (run individually to avoid rolling back init)
             index_statements = [
                 "CREATE INDEX IF NOT EXISTS idx_bookings_date_court ON bookings(booking_date, court, status);",
+                "CREATE INDEX IF NOT EXISTS idx_bookings_series ON bookings(series_id) WHERE series_id IS NOT NULL;",
+                "CREATE INDEX IF NOT EXISTS idx_bookings_time_range ON bookings USING gist (tstzrange(start_at, end_at)) WHERE start_at IS NOT NULL;",
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_booking_slots_occupancy ON booking_slots(resource_group, workday, slot_index);",
+                "CREATE INDEX IF NOT EXISTS idx_booking_slots_booking ON booking_slots(booking_id);",
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_slot_holds_occupancy ON slot_holds(resource_group, workday, slot_index);",
+                "CREATE INDEX IF NOT EXISTS idx_slot_holds_token ON slot_holds(token);",
+                "CREATE INDEX IF NOT EXISTS idx_slot_holds_expires ON slot_holds(expires_at);",
+                "CREATE INDEX IF NOT EXISTS idx_schedule_changes_txid ON schedule_changes(txid);",
+                "CREATE INDEX IF NOT EXISTS idx_schedule_changes_changed_at ON schedule_changes(changed_at);",
+                "CREATE INDEX IF NOT EXISTS idx_court_pricing_court ON court_pricing(court_id, effective_from) WHERE is_active = TRUE;",
                 "CREATE INDEX IF NOT EXISTS idx_promo_codes_code ON promo_codes(code);",
                 "CREATE INDEX IF NOT EXISTS idx_promo_codes_active ON promo_codes(is_active);",
                 "CREATE INDEX IF NOT EXISTS idx_promo_codes_dates ON promo_codes(valid_from, valid_until);",
@@ -630,14 +1254,22 @@ class DatabaseManager:
     @staticmethod
     def test_connection():
         """Test database connection"""
+        conn = None
         try:
             conn = DatabaseManager.get_connection()
             if conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT 1")
-                conn.close()
+                conn.rollback()
                 return True
             return False
         except Exception as e:
             logger.error(f"Database connection test failed: {e}")
             return False
+        finally:
+            if conn:
+                DatabaseManager.release_connection(conn)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=DatabaseManager._after_fork_in_child)
@@ -180,6 +180,11 @@ class BookingStatus:
     @classmethod
     def get_all_statuses(cls) -> List[str]:
         return [cls.PENDING_PAYMENT, cls.CONFIRMED, cls.CANCELLED]
+    
+    @classmethod
+    def get_active_statuses(cls) -> List[str]:
+        """Statuses that occupy their court slots"""
+        return [cls.PENDING_PAYMENT, cls.CONFIRMED]
 
 @dataclass
 class BlockedSlot:
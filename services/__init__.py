@@ -8,5 +8,10 @@ from .schedule_service import ScheduleService
 from .contact_service import ContactService
 from .blocked_slot_service import BlockedSlotService
 from .pricing_service import PricingService
+from .availability_service import AvailabilityService
+from .notification_service import NotificationService
+from .hold_service import HoldService
+from .booking_series_service import BookingSeriesService
+from .quote_service import QuoteService
 
-__all__ = ['BookingService', 'AdminService', 'ScheduleService', 'ContactService', 'BlockedSlotService', 'PricingService']
\ No newline at end of file
+__all__ = ['BookingService', 'AdminService', 'ScheduleService', 'ContactService', 'BlockedSlotService', 'PricingService', 'AvailabilityService', 'NotificationService', 'HoldService', 'BookingSeriesService', 'QuoteService']
\ No newline at end of file
@@ -18,6 +18,10 @@ logger = logging.getLogger(__name__)
 class AdminService:
     """Professional admin service for administrative operations"""
     
+    # Bulk deletes touching more (court, workday) pairs than this drop the
+    # whole availability cache with one notification instead of one per pair
+    BULK_INVALIDATE_MAX_KEYS = 50
+    
     @staticmethod
     def authenticate_admin(username: str, password: str) -> bool:
         """Authenticate admin login"""
@@ -245,68 +249,73 @@ class AdminService:
             sport = BookingUtils.get_sport_from_court(booking_data["court"])
             court_name = BookingUtils.get_court_name(booking_data["court"])
             
-            # Create selected_slots first for conflict checking
-            selected_slots = TimeUtils.generate_time_slots(start_time, duration)
-            
-            # Check for slot conflicts before creating booking
-            conflicts = AdminService._check_booking_conflicts(
-                booking_data["court"], 
-                booking_data["date"], 
-                selected_slots
-            )
-            
-            if conflicts:
-                conflict_times = [slot["time"] for slot in conflicts]
-                raise ValueError(f"Booking conflicts found at times: {', '.join(conflict_times)}")
-            
-            # Generate booking ID using utility
-            booking_id = BookingUtils.generate_booking_id()
+            grid = BookingUtils.get_slot_grid(booking_data["court"])
+            slot_indexes = grid.indexes_from_start(start_time, duration)
             
-            insert_query = """
-                INSERT INTO bookings (
-                    id, sport, court, court_name, booking_date, start_time, end_time,
-                    duration, selected_slots, player_name, player_phone, player_email,
-                    player_count, special_requests, payment_type, total_amount, status
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+            with DatabaseManager.transaction():
+                # No read-before-write: the overlap constraint and the booking_slots
+                # index reject clashing slots, surfacing as BookingConflictError
+                from services.booking_service import BookingService
+                
+                # Generate booking ID using utility
+                booking_id = BookingUtils.generate_booking_id()
+            
+                insert_query = """
+                    INSERT INTO bookings (
+                        id, sport, court, court_name, booking_date, start_time, end_time,
+                        duration, selected_slots, player_name, player_phone, player_email,
+                        player_count, special_requests, payment_type, total_amount, status,
+                        start_at, end_at, resource_group, slot_mask, slot_minutes
+                    ) VALUES (
+                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                    )
+                """
+                start_at, end_at = TimeUtils.booking_span_utc(booking_data["date"], slot_indexes, grid.minutes)
+            
+                params = (
+                    booking_id,
+                    sport,
+                    booking_data["court"],
+                    court_name,
+                    booking_data["date"],
+                    start_time,
+                    end_time,
+                    duration,
+                    json.dumps([grid.index_to_time(i) for i in slot_indexes]),
+                    booking_data["playerName"],
+                    booking_data["playerPhone"],
+                    booking_data.get("playerEmail", ""),
+                    booking_data.get("playerCount", "2"),
+                    booking_data.get("specialRequests", ""),
+                    "full",
+                    booking_data.get("totalAmount", BookingUtils.calculate_booking_amount(sport, duration)),
+                    booking_data.get("status", "confirmed"),
+                    start_at,
+                    end_at,
+                    BookingUtils.get_resource_group(booking_data["court"]),
+                    TimeUtils.slot_indexes_to_mask(slot_indexes),
+                    grid.minutes,
                 )
-            """
-            
-            params = (
-                booking_id,
-                sport,
-                booking_data["court"],
-                court_name,
-                booking_data["date"],
-                start_time,
-                end_time,
-                duration,
-                json.dumps(selected_slots),
-                booking_data["playerName"],
-                booking_data["playerPhone"],
-                booking_data.get("playerEmail", ""),
-                booking_data.get("playerCount", "2"),
-                booking_data.get("specialRequests", ""),
-                "full",
-                booking_data.get("totalAmount", BookingUtils.calculate_booking_amount(sport, duration)),
-                booking_data.get("status", "confirmed"),
-            )
             
-            result = DatabaseManager.execute_query(insert_query, params, fetch_all=False)
+                with BookingService.overlap_as_conflict(booking_data["court"], booking_data["date"], slot_indexes):
+                    result = DatabaseManager.execute_query(insert_query, params, fetch_all=False, raise_errors=True)
             
-            if result is not None:
-                # Log the booking creation activity
-                try:
-                    from services.activity_service import ActivityService
-                    ActivityService.log_booking_created(booking_id, booking_data["playerName"], 
-                                                      f"Admin created booking - Court: {booking_data['court']}, Duration: {duration}h")
-                except Exception as log_error:
-                    logger.warning(f"Failed to log booking creation: {log_error}")
+                if result is not None:
+                    if booking_data.get("status", "confirmed") in BookingStatus.get_active_statuses():
+                        BookingService.claim_slots(booking_id, booking_data["court"], booking_data["date"], slot_indexes)
+                    
+                    # Log the booking creation activity
+                    try:
+                        from services.activity_service import ActivityService
+                        ActivityService.log_booking_created(booking_id, booking_data["playerName"], 
+                                                          f"Admin created booking - Court: {booking_data['court']}, Duration: {duration}h")
+                    except Exception as log_error:
+                        logger.warning(f"Failed to log booking creation: {log_error}")
                 
-                logger.info(f"Admin created booking: {booking_id}")
-                return booking_id
-            else:
-                raise Exception("Failed to create booking")
+                    logger.info(f"Admin created booking: {booking_id}")
+                    return booking_id
+                else:
+                    raise Exception("Failed to create booking")
         
         except Exception as e:
             logger.error(f"Error creating admin booking: {e}")
@@ -360,7 +369,14 @@ class AdminService:
                 WHERE id = %s
             """
             
-            result = DatabaseManager.execute_query(update_query, update_values, fetch_all=False)
+            # A reactivated booking whose slots were taken meanwhile raises
+            # BookingConflictError (exclusion constraint or booking_slots index)
+            from services.booking_service import BookingService
+            with DatabaseManager.transaction():
+                with BookingService.status_change_as_conflict(booking_id):
+                    result = DatabaseManager.execute_query(update_query, update_values, fetch_all=False, raise_errors=True)
+                if result is not None and "status" in booking_data:
+                    BookingService.sync_booking_slots(booking_id)
             
             if result is not None:
                 # Log the booking update activity
@@ -411,7 +427,12 @@ class AdminService:
             if action not in action_queries:
                 raise ValueError(f"Invalid action: {action}")
             
-            result = DatabaseManager.execute_query(action_queries[action], (booking_id,), fetch_all=False)
+            from services.booking_service import BookingService
+            with DatabaseManager.transaction():
+                with BookingService.status_change_as_conflict(booking_id):
+                    result = DatabaseManager.execute_query(action_queries[action], (booking_id,), fetch_all=False, raise_errors=True)
+                if result is not None:
+                    BookingService.sync_booking_slots(booking_id)
             
             if result is not None:
                 # Log the activity
@@ -454,10 +475,17 @@ class AdminService:
     def delete_booking(booking_id: str) -> bool:
         """Delete booking"""
         try:
+            booking = DatabaseManager.execute_query(
+                "SELECT court, booking_date FROM bookings WHERE id = %s", (booking_id,), fetch_one=True
+            )
             delete_query = "DELETE FROM bookings WHERE id = %s"
             result = DatabaseManager.execute_query(delete_query, (booking_id,), fetch_all=False)
             
             if result is not None:
+                if booking:
+                    # Occupancy rows go with the booking (ON DELETE CASCADE)
+                    from services.availability_service import AvailabilityService
+                    AvailabilityService.invalidate(booking["court"], booking["booking_date"])
                 logger.info(f"Deleted booking: {booking_id}")
                 return True
             else:
@@ -655,92 +683,6 @@ class AdminService:
     
     # Legacy utility methods removed - now using utils package
     
-    @staticmethod
-    def _check_booking_conflicts(court_id: str, date: str, selected_slots: List[Dict]) -> List[Dict]:
-        """Check for booking conflicts in selected time slots"""
-        try:
-            conflicts = []
-            
-            # Get all existing booked slots for this court and date
-            existing_slots = AdminService._get_existing_booked_slots(court_id, date)
-            
-            # Check each selected slot for conflicts
-            for slot in selected_slots:
-                slot_time = slot["time"]
-                if slot_time in existing_slots:
-                    conflicts.append(slot)
-            
-            return conflicts
-        
-        except Exception as e:
-            logger.error(f"Error checking booking conflicts: {e}")
-            return []
-    
-    @staticmethod
-    def _get_existing_booked_slots(court_id: str, date: str) -> List[str]:
-        """Get existing booked slots for conflict checking"""
-        try:
-            booked_slots = set()
-            
-            # Direct bookings for this court
-            direct_query = """
-                SELECT selected_slots FROM bookings 
-                WHERE status IN ('confirmed', 'pending_payment') 
-                AND booking_date = %s 
-                AND court = %s
-            """
-            
-            direct_bookings = DatabaseManager.execute_query(direct_query, (date, court_id))
-            if direct_bookings:
-                for booking in direct_bookings:
-                    slots_data = booking["selected_slots"]
-                    if isinstance(slots_data, str):
-                        import json
-                        slots_data = json.loads(slots_data)
-                    
-                    if isinstance(slots_data, list):
-                        for slot in slots_data:
-                            if isinstance(slot, dict) and "time" in slot:
-                                booked_slots.add(slot["time"])
-            
-            # Multi-purpose court conflicts
-            if court_id in Config.MULTI_PURPOSE_COURTS:
-                multi_court_type = Config.MULTI_PURPOSE_COURTS[court_id]
-                conflicting_courts = [
-                    k for k, v in Config.MULTI_PURPOSE_COURTS.items() 
-                    if v == multi_court_type and k != court_id
-                ]
-                
-                if conflicting_courts:
-                    placeholders = ",".join(["%s"] * len(conflicting_courts))
-                    conflict_query = f"""
-                        SELECT selected_slots FROM bookings 
-                        WHERE status IN ('confirmed', 'pending_payment') 
-                        AND booking_date = %s 
-                        AND court IN ({placeholders})
-                    """
-                    
-                    conflict_params = [date] + conflicting_courts
-                    conflict_bookings = DatabaseManager.execute_query(conflict_query, conflict_params)
-                    
-                    if conflict_bookings:
-                        for booking in conflict_bookings:
-                            slots_data = booking["selected_slots"]
-                            if isinstance(slots_data, str):
-                                import json
-                                slots_data = json.loads(slots_data)
-                            
-                            if isinstance(slots_data, list):
-                                for slot in slots_data:
-                                    if isinstance(slot, dict) and "time" in slot:
-                                        booked_slots.add(slot["time"])
-            
-            return list(booked_slots)
-        
-        except Exception as e:
-            logger.error(f"Error getting existing booked slots: {e}")
-            return []
-    
     # Booking ID generation moved to BookingUtils
 
     @staticmethod
@@ -755,20 +697,37 @@ class AdminService:
         try:
             if before_date:
                 query = """
-                    DELETE FROM bookings
-                    WHERE booking_date < %s
+                    WITH deleted AS (
+                        DELETE FROM bookings
+                        WHERE booking_date < %s
+                        RETURNING court, booking_date
+                    )
+                    SELECT court, booking_date, COUNT(*) AS bookings FROM deleted GROUP BY court, booking_date
                 """
                 params = (before_date,)
             else:
                 query = """
-                    DELETE FROM bookings
-                    WHERE booking_date < CURRENT_DATE
+                    WITH deleted AS (
+                        DELETE FROM bookings
+                        WHERE booking_date < CURRENT_DATE
+                        RETURNING court, booking_date
+                    )
+                    SELECT court, booking_date, COUNT(*) AS bookings FROM deleted GROUP BY court, booking_date
                 """
                 params = None
 
-            deleted = DatabaseManager.execute_query(query, params, fetch_all=False)
-            # DatabaseManager returns rowcount or None
-            return int(deleted or 0)
+            rows = DatabaseManager.execute_query(query, params)
+            if not rows:
+                return 0
+
+            # Occupancy rows go with the bookings (ON DELETE CASCADE)
+            from services.availability_service import AvailabilityService
+            if len(rows) <= AdminService.BULK_INVALIDATE_MAX_KEYS:
+                for row in rows:
+                    AvailabilityService.invalidate(row["court"], row["booking_date"])
+            else:
+                AvailabilityService.invalidate_all()
+            return sum(int(row["bookings"]) for row in rows)
         except Exception as e:
             logger.error(f"Error deleting old bookings: {e}")
             return 0
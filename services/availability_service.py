@@ -0,0 +1,444 @@
+"""
+Availability service: cached per-workday slot occupancy bitmaps.
+"""
+import time
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+import logging
+
+from database import DatabaseManager
+from config import Config
+from services.notification_service import NotificationService
+from services.pricing_service import PricingService
+from utils.booking_utils import BookingUtils
+from utils.time_utils import TimeUtils
+
+logger = logging.getLogger(__name__)
+
+
+class WorkdayAvailability:
+    """Occupancy of one resource group for one workday.
+
+    Bit ``i`` of a mask is slot ``i`` of the workday on the courts' slot grid
+    (05:30 → bit 0; 48 bits for 30-minute courts, 96 for 15-minute lanes).
+    ``booked`` (bookings) and ``held`` (live checkout holds, per hold token)
+    are shared by every court on the resource; blocks are per court.
+    ``valid_until`` is when the first hold expires (epoch seconds), after
+    which the entry must be reloaded.
+    """
+
+    __slots__ = ("booked", "held", "blocked", "loaded_at", "valid_until")
+
+    def __init__(self, booked: int = 0, blocked: Optional[Dict[str, int]] = None):
+        self.booked = booked
+        self.held = {}
+        self.blocked = blocked or {}
+        self.loaded_at = time.monotonic()
+        self.valid_until = None
+
+    def add_hold_expiry(self, expires_at: Optional[float]) -> None:
+        if expires_at is not None and (self.valid_until is None or expires_at < self.valid_until):
+            self.valid_until = float(expires_at)
+
+    def is_fresh(self) -> bool:
+        if time.monotonic() - self.loaded_at >= Config.AVAILABILITY_CACHE_TTL:
+            return False
+        return self.valid_until is None or time.time() < self.valid_until
+
+    def add_hold(self, token: str, mask: int, expires_at: Optional[float]) -> None:
+        self.held[token] = self.held.get(token, 0) | mask
+        self.add_hold_expiry(expires_at)
+
+    def unavailable_mask(self, court_id: str, hold_token: str = None) -> int:
+        """Booked, blocked and held slots; slots held under ``hold_token`` count as free"""
+        mask = self.booked | self.blocked.get(court_id, 0)
+        for token, held in self.held.items():
+            if token != hold_token:
+                mask |= held
+        return mask
+
+
+class AvailabilityService:
+    """Per-worker cache of slot availability keyed by (resource group, workday).
+
+    Entries are dropped whenever a booking or block touching them is written
+    (see ``invalidate``) and expire after ``AVAILABILITY_CACHE_TTL`` seconds
+    as a safety net. Conflict checks that must be authoritative read the
+    database directly (``BookingService.check_slot_availability``).
+    """
+
+    _cache = OrderedDict()  # (resource_group, workday) -> WorkdayAvailability
+    _lock = threading.Lock()
+    # Bumped on every invalidation; a load that raced one is not cached
+    _epoch = 0
+    _hits = 0
+    _misses = 0
+    _invalidations = 0
+
+    @staticmethod
+    def _key(court_id: str, date) -> tuple:
+        return BookingUtils.get_resource_group(court_id), str(date)
+
+    @staticmethod
+    def _courts_in_group(resource_group: str) -> List[str]:
+        return [
+            court["id"]
+            for courts in Config.COURT_CONFIG.values()
+            for court in courts
+            if BookingUtils.get_resource_group(court["id"]) == resource_group
+        ]
+
+    @staticmethod
+    def _load_many(resource_groups: List[str], workday: str) -> Optional[Dict[str, WorkdayAvailability]]:
+        """Read several resources' occupancy and blocks for one workday in a single query"""
+        courts = [court for group in resource_groups for court in AvailabilityService._courts_in_group(group)]
+        rows = DatabaseManager.execute_query("""
+            SELECT resource_group, NULL AS court, slot_index, NULL::time AS time_slot,
+                   NULL AS token, NULL::float8 AS hold_expires
+            FROM booking_slots
+            WHERE resource_group = ANY(%s) AND workday = %s
+            UNION ALL
+            SELECT resource_group, NULL, slot_index, NULL, token, EXTRACT(EPOCH FROM expires_at)::float8
+            FROM slot_holds
+            WHERE resource_group = ANY(%s) AND workday = %s AND expires_at > CURRENT_TIMESTAMP
+            UNION ALL
+            SELECT NULL, court, NULL, time_slot, NULL, NULL FROM blocked_slots
+            WHERE court = ANY(%s) AND date = %s
+        """, (list(resource_groups), workday, list(resource_groups), workday, courts, workday))
+        if rows is None:
+            return None
+
+        entries = {group: WorkdayAvailability() for group in resource_groups}
+        for row in rows:
+            if row["token"] is not None:
+                entries[row["resource_group"]].add_hold(row["token"], 1 << row["slot_index"], row["hold_expires"])
+            elif row["slot_index"] is not None:
+                entries[row["resource_group"]].booked |= 1 << row["slot_index"]
+            else:
+                entry = entries[BookingUtils.get_resource_group(row["court"])]
+                bit = 1 << BookingUtils.get_slot_grid(row["court"]).time_to_index(row["time_slot"].strftime("%H:%M"))
+                entry.blocked[row["court"]] = entry.blocked.get(row["court"], 0) | bit
+        return entries
+
+    @staticmethod
+    def get_workdays(court_ids: List[str], date) -> Optional[Dict[str, WorkdayAvailability]]:
+        """Cached occupancy for several courts on one workday, loading all misses in one query"""
+        workday = str(date)
+        groups = {BookingUtils.get_resource_group(court_id) for court_id in court_ids}
+        found = {}
+        with AvailabilityService._lock:
+            for group in groups:
+                entry = AvailabilityService._cache.get((group, workday))
+                if entry is not None and entry.is_fresh():
+                    AvailabilityService._cache.move_to_end((group, workday))
+                    AvailabilityService._hits += 1
+                    found[group] = entry
+            missing = sorted(groups - found.keys())
+            AvailabilityService._misses += len(missing)
+            epoch = AvailabilityService._epoch
+
+        if missing:
+            loaded = AvailabilityService._load_many(missing, workday)
+            if loaded is None:
+                return None
+            found.update(loaded)
+            with AvailabilityService._lock:
+                if epoch == AvailabilityService._epoch:
+                    for group, entry in loaded.items():
+                        AvailabilityService._cache[(group, workday)] = entry
+                        AvailabilityService._cache.move_to_end((group, workday))
+                    while len(AvailabilityService._cache) > Config.AVAILABILITY_CACHE_MAX_ENTRIES:
+                        AvailabilityService._cache.popitem(last=False)
+
+        return {court_id: found[BookingUtils.get_resource_group(court_id)] for court_id in court_ids}
+
+    @staticmethod
+    def get_workday(court_id: str, date) -> Optional[WorkdayAvailability]:
+        """Cached occupancy for the court's resource on a workday (None if the DB is unreachable)"""
+        entries = AvailabilityService.get_workdays([court_id], date)
+        return entries[court_id] if entries is not None else None
+
+    @staticmethod
+    def get_unavailable_mask(court_id: str, date, hold_token: str = None) -> Optional[int]:
+        """Bitmap of booked, blocked or held slots for a court on a workday (except the caller's hold)"""
+        entry = AvailabilityService.get_workday(court_id, date)
+        return entry.unavailable_mask(court_id, hold_token) if entry is not None else None
+
+    @staticmethod
+    def open_mask(slot_minutes: int = None) -> int:
+        """Slots offered on the public booking grid (opening time → workday end)"""
+        grid = TimeUtils.slot_grid(slot_minutes)
+        return grid.full_mask & ~((1 << grid.time_to_index(Config.BOOKING_OPEN_TIME)) - 1)
+
+    @staticmethod
+    def peak_mask(slot_minutes: int = None) -> int:
+        """Open slots in the "peak" pricing window (Config.PRICING_WINDOWS)"""
+        grid = TimeUtils.slot_grid(slot_minutes)
+        mask = 0
+        for i, band in enumerate(PricingService.slot_bands(grid.minutes)):
+            if band == "peak":
+                mask |= 1 << i
+        return mask & AvailabilityService.open_mask(grid.minutes)
+
+    # Per-day bitmaps for a date range: booked and held slots per resource
+    # group and blocked slots per court (on each court's grid), combined in
+    # SQL. Masks go up to 96 bits, so they are sums of distinct powers of two
+    # rather than BIGINT bit_or.
+    _RANGE_MASKS_QUERY = """
+        SELECT resource_group, NULL AS court, workday AS day, SUM(DISTINCT power(2::numeric, slot_index)) AS mask,
+               NULL AS token, NULL::float8 AS hold_expires
+        FROM booking_slots
+        WHERE resource_group = ANY(%s) AND workday BETWEEN %s AND %s
+        GROUP BY resource_group, workday
+        UNION ALL
+        SELECT resource_group, NULL, workday, SUM(DISTINCT power(2::numeric, slot_index)),
+               token, MIN(EXTRACT(EPOCH FROM expires_at))::float8
+        FROM slot_holds
+        WHERE resource_group = ANY(%s) AND workday BETWEEN %s AND %s AND expires_at > CURRENT_TIMESTAMP
+        GROUP BY resource_group, workday, token
+        UNION ALL
+        SELECT NULL, b.court, b.date,
+               SUM(DISTINCT power(2::numeric, (((EXTRACT(HOUR FROM b.time_slot) * 60
+                                                + EXTRACT(MINUTE FROM b.time_slot))::int + 1440 - %s) %% 1440
+                                              / g.slot_minutes))),
+               NULL, NULL
+        FROM blocked_slots b
+        JOIN unnest(%s::text[], %s::int[]) AS g(court, slot_minutes) ON g.court = b.court
+        WHERE b.date BETWEEN %s AND %s
+        GROUP BY b.court, b.date
+    """
+
+    @staticmethod
+    def get_range(court_ids: List[str], start_date: date, end_date: date) -> Optional[Dict[str, Dict[str, WorkdayAvailability]]]:
+        """Occupancy for several courts over a date range: {workday: {court: entry}}.
+
+        Served from the cache when every (resource, day) is present; otherwise
+        the whole range is read with one grouped query and cached.
+        """
+        groups = sorted({BookingUtils.get_resource_group(court_id) for court_id in court_ids})
+        days = [(start_date + timedelta(days=i)).isoformat() for i in range((end_date - start_date).days + 1)]
+
+        with AvailabilityService._lock:
+            cached = {}
+            for day in days:
+                for group in groups:
+                    entry = AvailabilityService._cache.get((group, day))
+                    if entry is not None and entry.is_fresh():
+                        cached[(group, day)] = entry
+            complete = len(cached) == len(days) * len(groups)
+            if complete:
+                AvailabilityService._hits += len(cached)
+            else:
+                AvailabilityService._misses += len(days) * len(groups) - len(cached)
+            epoch = AvailabilityService._epoch
+
+        if not complete:
+            courts = [court for group in groups for court in AvailabilityService._courts_in_group(group)]
+            rows = DatabaseManager.execute_query(AvailabilityService._RANGE_MASKS_QUERY, (
+                groups, start_date, end_date,
+                groups, start_date, end_date,
+                TimeUtils.WORKDAY_START_MINUTES,
+                courts, [BookingUtils.get_slot_minutes(court) for court in courts], start_date, end_date,
+            ))
+            if rows is None:
+                return None
+
+            loaded = {(group, day): WorkdayAvailability() for day in days for group in groups}
+            for row in rows:
+                day = row["day"].isoformat()
+                if row["token"] is not None:
+                    loaded[(row["resource_group"], day)].add_hold(row["token"], int(row["mask"]), row["hold_expires"])
+                elif row["resource_group"] is not None:
+                    loaded[(row["resource_group"], day)].booked |= int(row["mask"])
+                else:
+                    loaded[(BookingUtils.get_resource_group(row["court"]), day)].blocked[row["court"]] = int(row["mask"])
+            cached = loaded
+
+            with AvailabilityService._lock:
+                if epoch == AvailabilityService._epoch:
+                    for key, entry in loaded.items():
+                        AvailabilityService._cache[key] = entry
+                        AvailabilityService._cache.move_to_end(key)
+                    while len(AvailabilityService._cache) > Config.AVAILABILITY_CACHE_MAX_ENTRIES:
+                        AvailabilityService._cache.popitem(last=False)
+
+        return {
+            day: {court_id: cached[(BookingUtils.get_resource_group(court_id), day)] for court_id in court_ids}
+            for day in days
+        }
+
+    @staticmethod
+    def get_range_summary(court_ids: List[str], start_date: date, end_date: date) -> Optional[Dict[str, Dict[str, Dict]]]:
+        """Free-slot counts per day and court: {workday: {court: {"free", "peakFree"}}}"""
+        entries = AvailabilityService.get_range(court_ids, start_date, end_date)
+        if entries is None:
+            return None
+        minutes = {court_id: BookingUtils.get_slot_minutes(court_id) for court_id in court_ids}
+        open_masks = {m: AvailabilityService.open_mask(m) for m in set(minutes.values())}
+        peak_masks = {m: AvailabilityService.peak_mask(m) for m in set(minutes.values())}
+        summary = {}
+        for day, courts in entries.items():
+            summary[day] = {}
+            for court_id, entry in courts.items():
+                free = open_masks[minutes[court_id]] & ~entry.unavailable_mask(court_id)
+                summary[day][court_id] = {
+                    "free": free.bit_count(),
+                    "peakFree": (free & peak_masks[minutes[court_id]]).bit_count(),
+                }
+        return summary
+
+    @staticmethod
+    def runs_mask(free: int, slot_count: int) -> int:
+        """Bits i such that slots i .. i+slot_count-1 are all set in ``free``"""
+        runs = free
+        for shift in range(1, slot_count):
+            runs &= free >> shift
+        return runs
+
+    @staticmethod
+    def free_runs(free: int) -> List[tuple]:
+        """Maximal runs of set bits in ``free`` as (first slot, length), lowest first"""
+        runs = []
+        while free:
+            start = (free & -free).bit_length() - 1
+            shifted = free >> start
+            length = (shifted ^ (shifted + 1)).bit_length() - 1
+            runs.append((start, length))
+            free &= ~(((1 << length) - 1) << start)
+        return runs
+
+    @staticmethod
+    def find_earliest(court_ids: List[str], start_date: date, after_minutes: int, duration_minutes: int,
+                      days: int = 7) -> List[Dict]:
+        """Earliest start of ``duration_minutes`` of contiguous free slots on each court.
+
+        Scans from ``after_minutes`` past the 05:30 start of ``start_date``
+        forward through ``days`` workdays (a booking never crosses the 05:30
+        boundary), on each court's own slot grid. Returns one option per
+        court that has room, earliest first.
+        """
+        end_date = start_date + timedelta(days=days - 1)
+        entries = AvailabilityService.get_range(court_ids, start_date, end_date)
+        if entries is None:
+            return []
+
+        options = []
+        for court_id in court_ids:
+            grid = BookingUtils.get_slot_grid(court_id)
+            open_mask = AvailabilityService.open_mask(grid.minutes)
+            slot_count = duration_minutes // grid.minutes
+            after_index = -(-after_minutes // grid.minutes)
+            for offset, (day, courts) in enumerate(sorted(entries.items())):
+                free = open_mask & ~courts[court_id].unavailable_mask(court_id)
+                runs = AvailabilityService.runs_mask(free, slot_count)
+                if offset == 0:
+                    runs &= ~((1 << after_index) - 1)
+                if runs:
+                    first = (runs & -runs).bit_length() - 1
+                    options.append({
+                        "court": court_id,
+                        "date": day,
+                        "startMinutes": first * grid.minutes,
+                        "slots": [grid.index_to_time(i) for i in range(first, first + slot_count)],
+                    })
+                    break
+
+        options.sort(key=lambda option: (option["date"], option["startMinutes"]))
+        return options
+
+    @staticmethod
+    def mask_to_times(mask: int, slot_minutes: int = None) -> List[str]:
+        """'HH:mm' start times of the set bits on a slot grid, sorted as strings"""
+        grid = TimeUtils.slot_grid(slot_minutes)
+        return sorted(grid.index_to_time(i) for i in TimeUtils.mask_to_slot_indexes(mask))
+
+    @staticmethod
+    def get_booked_slots(court_id: str, date: str, hold_token: str = None) -> List[str]:
+        """Booked, blocked and held 'HH:mm' slots for a court and workday (cached); the caller's hold counts as free"""
+        try:
+            mask = AvailabilityService.get_unavailable_mask(court_id, date, hold_token)
+            if mask is None:
+                return []
+            return AvailabilityService.mask_to_times(mask, BookingUtils.get_slot_minutes(court_id))
+        except Exception as e:
+            logger.error(f"Error reading availability for {court_id} {date}: {e}")
+            return []
+
+    @staticmethod
+    def get_booked_slots_for_courts(court_ids: List[str], date: str, hold_token: str = None) -> Dict[str, List[str]]:
+        """Booked, blocked and held 'HH:mm' slots for several courts on one workday (cached)"""
+        try:
+            entries = AvailabilityService.get_workdays(court_ids, date)
+            if entries is None:
+                return {court_id: [] for court_id in court_ids}
+            return {
+                court_id: AvailabilityService.mask_to_times(
+                    entry.unavailable_mask(court_id, hold_token), BookingUtils.get_slot_minutes(court_id)
+                )
+                for court_id, entry in entries.items()
+            }
+        except Exception as e:
+            logger.error(f"Error reading availability for {court_ids} {date}: {e}")
+            return {court_id: [] for court_id in court_ids}
+
+    @staticmethod
+    def _evict(key: tuple) -> None:
+        with AvailabilityService._lock:
+            AvailabilityService._epoch += 1
+            AvailabilityService._invalidations += 1
+            AvailabilityService._cache.pop(key, None)
+
+    @staticmethod
+    def invalidate(court_id: str, date) -> None:
+        """Drop the cached workday for a court's resource in every worker.
+
+        Evicts now (so the writing request sees its own changes) and again once
+        the transaction ends (so neither a concurrent reader nor the writer
+        itself leaves pre-commit or rolled-back state cached). Other workers
+        evict when the NOTIFY arrives after commit.
+        """
+        key = AvailabilityService._key(court_id, date)
+        AvailabilityService._evict(key)
+        DatabaseManager.after_transaction(lambda: AvailabilityService._evict(key))
+        NotificationService.publish("availability", list(key))
+
+    @staticmethod
+    def invalidate_all() -> None:
+        """Drop every cached workday in every worker (after bulk writes)"""
+        AvailabilityService.clear()
+        DatabaseManager.after_transaction(AvailabilityService.clear)
+        NotificationService.publish("availability", None)
+
+    @staticmethod
+    def _on_notification(key) -> None:
+        if key is None:
+            AvailabilityService.clear()
+        else:
+            AvailabilityService._evict(tuple(key))
+
+    @staticmethod
+    def clear() -> None:
+        with AvailabilityService._lock:
+            AvailabilityService._epoch += 1
+            AvailabilityService._cache.clear()
+
+    @staticmethod
+    def get_stats() -> Dict:
+        """Hit/miss counters for this worker's cache"""
+        with AvailabilityService._lock:
+            hits, misses = AvailabilityService._hits, AvailabilityService._misses
+            lookups = hits + misses
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "invalidations": AvailabilityService._invalidations,
+                "entries": len(AvailabilityService._cache),
+                "max_entries": Config.AVAILABILITY_CACHE_MAX_ENTRIES,
+                "ttl_seconds": Config.AVAILABILITY_CACHE_TTL,
+            }
+
+
+NotificationService.subscribe("availability", AvailabilityService._on_notification)
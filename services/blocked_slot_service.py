@@ -4,7 +4,11 @@ Blocked slot service for managing court slot blocking functionality.
 import logging
 from typing import List, Dict, Optional, Tuple
 from database import DatabaseManager
+from config import Config
 from models import BlockedSlot
+from services.availability_service import AvailabilityService
+from utils.booking_utils import BookingUtils
+from utils.time_utils import TimeUtils
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -12,44 +16,19 @@ logger = logging.getLogger(__name__)
 class BlockedSlotService:
     """Service for managing blocked slots"""
     
+    # Widest date span one bulk block/unblock may cover
+    MAX_RANGE_DAYS = 62
+
     @staticmethod
     def block_slot(court: str, date: str, time_slot: str, reason: str, blocked_by: str = 'admin') -> Tuple[bool, str]:
         """Block a specific time slot for a court on a given date"""
         try:
             logger.info(f"Blocking slot: {court}, {date}, {time_slot}")
             
-            # Check if slot is already blocked
-            existing_query = """
-                SELECT id FROM blocked_slots 
-                WHERE court = %s AND date = %s AND time_slot = %s
-            """
-            existing = DatabaseManager.execute_query(
-                existing_query, 
-                (court, date, time_slot), 
-                fetch_one=True
-            )
-            
-            if existing:
-                return False, "Slot is already blocked"
-            
-            # Insert new blocked slot
-            insert_query = """
-                INSERT INTO blocked_slots (court, date, time_slot, reason, blocked_by, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """
-            
-            result = DatabaseManager.execute_query(
-                insert_query,
-                (court, date, time_slot, reason, blocked_by, datetime.now()),
-                fetch_one=True
-            )
-            
-            if result:
-                logger.info(f"Slot blocked successfully with ID: {result['id']}")
-                return True, f"Slot blocked successfully"
-            else:
-                return False, "Failed to block slot"
+            result = BlockedSlotService.block_slots([court], date, date, [time_slot], reason, blocked_by)
+            if result["blocked_count"]:
+                return True, "Slot blocked successfully"
+            return False, "Slot is already blocked"
                 
         except Exception as e:
             logger.error(f"Error blocking slot: {e}")
@@ -61,18 +40,8 @@ class BlockedSlotService:
         try:
             logger.info(f"Unblocking slot: {court}, {date}, {time_slot}")
             
-            delete_query = """
-                DELETE FROM blocked_slots 
-                WHERE court = %s AND date = %s AND time_slot = %s
-            """
-            
-            result = DatabaseManager.execute_query(
-                delete_query,
-                (court, date, time_slot),
-                fetch_all=False
-            )
-            
-            if result and result > 0:
+            result = BlockedSlotService.unblock_slots([court], date, date, [time_slot])
+            if result["unblocked_count"]:
                 logger.info(f"Slot unblocked successfully")
                 return True, "Slot unblocked successfully"
             else:
@@ -82,6 +51,144 @@ class BlockedSlotService:
             logger.error(f"Error unblocking slot: {e}")
             return False, f"Error unblocking slot: {str(e)}"
     
+    @staticmethod
+    def expand_time_range(start_time: str, end_time: str, slot_minutes: int = None) -> List[str]:
+        """Slot times from ``start_time`` up to (not including) ``end_time`` within one workday.
+
+        The range may cross midnight (e.g. 22:00 → 02:00); an end of 05:30
+        means the end of the workday. Times step by ``slot_minutes`` (default 30).
+        """
+        grid = TimeUtils.slot_grid(slot_minutes)
+        for value in (start_time, end_time):
+            if not TimeUtils.is_valid_time_slot(value) or int(value.split(':')[1]) % grid.minutes:
+                raise ValueError(f"Invalid slot time: {value}")
+        
+        first = grid.time_to_index(start_time)
+        last = grid.time_to_index(end_time) or grid.count
+        if last <= first:
+            raise ValueError("End time must be after start time within the workday")
+        return [grid.index_to_time(i) for i in range(first, last)]
+    
+    @staticmethod
+    def _range_params(courts: List[str], start_date: str, end_date: str, time_slots: List[str]) -> Tuple:
+        if not courts or not time_slots:
+            raise ValueError("At least one court and one time slot are required")
+        known = {court['id'] for sport_courts in Config.COURT_CONFIG.values() for court in sport_courts}
+        unknown = sorted(set(courts) - known)
+        if unknown:
+            raise ValueError(f"Unknown courts: {', '.join(unknown)}")
+        first = datetime.strptime(start_date, "%Y-%m-%d").date()
+        last = datetime.strptime(end_date, "%Y-%m-%d").date()
+        if last < first:
+            raise ValueError("End date must not be before start date")
+        if (last - first).days + 1 > BlockedSlotService.MAX_RANGE_DAYS:
+            raise ValueError(f"Date range cannot exceed {BlockedSlotService.MAX_RANGE_DAYS} days")
+        for time_slot in time_slots:
+            if not isinstance(time_slot, str) or not TimeUtils.is_valid_time_slot(time_slot):
+                raise ValueError(f"Invalid slot time: {time_slot}")
+        return sorted(set(courts)), first, last, sorted(set(time_slots))
+    
+    @staticmethod
+    def _grid_cells(courts: List[str], time_slots: List[str]) -> List[Tuple[str, str]]:
+        """(court, time) pairs for the times that start a slot on each court's own grid.
+
+        A 15-minute range covers 30-minute courts at :00 and :30 only.
+        """
+        cells = [
+            (court, time_slot)
+            for court in courts
+            for time_slot in time_slots
+            if time_slot in BookingUtils.get_slot_grid(court).index_by_time
+        ]
+        if not cells:
+            raise ValueError("None of the times start a slot on the selected courts")
+        return cells
+    
+    @staticmethod
+    def _invalidate_days(rows: List[Dict]) -> None:
+        for court, date in {(row['court'], row['date']) for row in rows}:
+            AvailabilityService.invalidate(court, date)
+    
+    @staticmethod
+    def block_slots(courts: List[str], start_date: str, end_date: str, time_slots: List[str],
+                    reason: str, blocked_by: str = 'admin') -> Dict:
+        """Block every (court, date, time) in the cross product with a single INSERT.
+
+        Cells that are already blocked are left untouched (their reason is
+        kept) and reported under ``already_blocked``. Raises ValueError for
+        a malformed request.
+        """
+        courts, first, last, time_slots = BlockedSlotService._range_params(courts, start_date, end_date, time_slots)
+        cells = BlockedSlotService._grid_cells(courts, time_slots)
+        
+        rows = DatabaseManager.execute_query("""
+            WITH wanted AS (
+                SELECT c.court, d::date AS date, c.time_slot
+                FROM unnest(%s::varchar[], %s::time[]) AS c(court, time_slot)
+                CROSS JOIN generate_series(%s::date, %s::date, interval '1 day') AS d
+            ), inserted AS (
+                INSERT INTO blocked_slots (court, date, time_slot, reason, blocked_by, created_at)
+                SELECT court, date, time_slot, %s, %s, CURRENT_TIMESTAMP FROM wanted
+                ON CONFLICT (court, date, time_slot) DO NOTHING
+                RETURNING court, date, time_slot
+            )
+            SELECT w.court, w.date, w.time_slot, (i.court IS NOT NULL) AS inserted
+            FROM wanted w
+            LEFT JOIN inserted i USING (court, date, time_slot)
+            ORDER BY w.date, w.court, w.time_slot
+        """, (
+            [court for court, _ in cells], [time_slot for _, time_slot in cells], first, last, reason, blocked_by,
+        ), raise_errors=True) or []
+        
+        blocked = [row for row in rows if row['inserted']]
+        already_blocked = [row for row in rows if not row['inserted']]
+        BlockedSlotService._invalidate_days(blocked)
+        
+        logger.info(
+            f"Blocked {len(blocked)} slots ({len(already_blocked)} already blocked) "
+            f"on {', '.join(courts)} from {first} to {last}"
+        )
+        return {
+            "blocked_count": len(blocked),
+            "already_blocked_count": len(already_blocked),
+            "blocked": BlockedSlotService._format_cells(blocked),
+            "already_blocked": BlockedSlotService._format_cells(already_blocked),
+        }
+    
+    @staticmethod
+    def unblock_slots(courts: List[str], start_date: str, end_date: str, time_slots: List[str]) -> Dict:
+        """Remove every block in the (court, date, time) cross product with a single DELETE.
+
+        Times are checked like ``block_slots``; raises ValueError for a
+        malformed request.
+        """
+        courts, first, last, time_slots = BlockedSlotService._range_params(courts, start_date, end_date, time_slots)
+        cells = BlockedSlotService._grid_cells(courts, time_slots)
+        
+        rows = DatabaseManager.execute_query("""
+            DELETE FROM blocked_slots b
+            USING unnest(%s::varchar[], %s::time[]) AS c(court, time_slot)
+            WHERE b.court = c.court AND b.time_slot = c.time_slot AND b.date BETWEEN %s AND %s
+            RETURNING b.court, b.date, b.time_slot
+        """, (
+            [court for court, _ in cells], [time_slot for _, time_slot in cells], first, last,
+        ), raise_errors=True) or []
+        BlockedSlotService._invalidate_days(rows)
+        
+        logger.info(f"Unblocked {len(rows)} slots on {', '.join(courts)} from {first} to {last}")
+        rows.sort(key=lambda row: (row['date'], row['court'], row['time_slot']))
+        return {
+            "unblocked_count": len(rows),
+            "unblocked": BlockedSlotService._format_cells(rows),
+        }
+    
+    @staticmethod
+    def _format_cells(rows: List[Dict]) -> List[Dict]:
+        return [
+            {"court": row['court'], "date": row['date'].isoformat(), "time_slot": row['time_slot'].strftime('%H:%M')}
+            for row in rows
+        ]
+    
     @staticmethod
     def get_blocked_slots(court: str, date: str) -> List[str]:
         """Get all blocked time slots for a specific court and date"""
@@ -0,0 +1,240 @@
+"""
+Booking series service for recurring admin bookings (leagues, academies).
+"""
+import json
+from datetime import datetime, timedelta, date as date_cls
+from typing import Dict, List
+import logging
+
+import psycopg2
+
+from database import DatabaseManager
+from models import BookingStatus
+from services.availability_service import AvailabilityService
+from services.booking_service import BookingService, BookingConflictError
+from utils.booking_utils import BookingUtils
+from utils.time_utils import TimeUtils
+
+logger = logging.getLogger(__name__)
+
+
+class BookingSeriesService:
+    """Expand a recurrence rule into bookings that share a ``series_id``.
+
+    All occurrences are checked against booked and blocked slots in one
+    query; the free ones are inserted together and the rest are reported
+    back per date.
+    """
+
+    WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+    FREQUENCIES = ("daily", "weekly")
+    MAX_OCCURRENCES = 120
+    MAX_SPAN_DAYS = 366
+
+    @staticmethod
+    def expand_rule(rule: Dict) -> List[date_cls]:
+        """Workdays described by a rule.
+
+        ``{"startDate", "endDate" | "count", "frequency": "daily"|"weekly",
+        "interval": n, "weekdays": ["tue", ...]}``; weekly rules default to
+        the start date's weekday. Raises ValueError for a malformed rule.
+        """
+        start = datetime.strptime(rule.get("startDate") or "", "%Y-%m-%d").date()
+        end = datetime.strptime(rule["endDate"], "%Y-%m-%d").date() if rule.get("endDate") else None
+        count = int(rule["count"]) if rule.get("count") else None
+        frequency = rule.get("frequency", "weekly")
+        interval = int(rule.get("interval") or 1)
+
+        if frequency not in BookingSeriesService.FREQUENCIES:
+            raise ValueError(f"Frequency must be one of: {', '.join(BookingSeriesService.FREQUENCIES)}")
+        if interval < 1:
+            raise ValueError("Interval must be at least 1")
+        if end is None and count is None:
+            raise ValueError("A series needs an endDate or a count")
+        if end is not None and end < start:
+            raise ValueError("End date must not be before start date")
+        if count is not None and not 1 <= count <= BookingSeriesService.MAX_OCCURRENCES:
+            raise ValueError(f"Count must be between 1 and {BookingSeriesService.MAX_OCCURRENCES}")
+
+        weekdays = {start.weekday()}
+        if frequency == "weekly" and rule.get("weekdays"):
+            names = [str(day).lower()[:3] for day in rule["weekdays"]]
+            unknown = [day for day in names if day not in BookingSeriesService.WEEKDAYS]
+            if unknown:
+                raise ValueError(f"Unknown weekdays: {', '.join(unknown)}")
+            weekdays = {BookingSeriesService.WEEKDAYS.index(day) for day in names}
+
+        horizon = start + timedelta(days=BookingSeriesService.MAX_SPAN_DAYS - 1)
+        last = min(end, horizon) if end else horizon
+        week_start = start - timedelta(days=start.weekday())
+
+        dates = []
+        day = start
+        while day <= last and (count is None or len(dates) < count):
+            if frequency == "daily":
+                if (day - start).days % interval == 0:
+                    dates.append(day)
+            elif day.weekday() in weekdays and ((day - week_start).days // 7) % interval == 0:
+                dates.append(day)
+            day += timedelta(days=1)
+
+        if not dates:
+            raise ValueError("The rule does not produce any dates")
+        if len(dates) > BookingSeriesService.MAX_OCCURRENCES:
+            raise ValueError(f"A series cannot exceed {BookingSeriesService.MAX_OCCURRENCES} occurrences")
+        return dates
+
+    @staticmethod
+    def _find_conflicts(court_id: str, dates: List[date_cls], slot_indexes: List[int]) -> Dict[date_cls, Dict]:
+        """Booked and blocked slots for every occurrence, from a single query"""
+        grid = BookingUtils.get_slot_grid(court_id)
+        rows = DatabaseManager.execute_query("""
+            SELECT workday AS day, slot_index, NULL::time AS time_slot FROM booking_slots
+            WHERE resource_group = %s AND workday = ANY(%s::date[]) AND slot_index = ANY(%s::smallint[])
+            UNION ALL
+            SELECT date, NULL, time_slot FROM blocked_slots
+            WHERE court = %s AND date = ANY(%s::date[]) AND time_slot = ANY(%s::time[])
+        """, (
+            BookingUtils.get_resource_group(court_id), dates,
+            slot_indexes,
+            court_id, dates, [grid.index_to_time(i) for i in slot_indexes],
+        ), raise_errors=True) or []
+
+        conflicts = {}
+        for row in rows:
+            entry = conflicts.setdefault(row["day"], {"booked": set(), "blocked": set()})
+            if row["slot_index"] is not None:
+                entry["booked"].add(grid.index_to_time(row["slot_index"]))
+            else:
+                entry["blocked"].add(row["time_slot"].strftime("%H:%M"))
+        return conflicts
+
+    @staticmethod
+    def create_series(booking_data: Dict, rule: Dict, created_by: str = "admin", dry_run: bool = False) -> Dict:
+        """Create every non-conflicting occurrence of a recurring admin booking.
+
+        Returns ``{"seriesId", "created", "conflicts", "occurrences"}`` where
+        each occurrence is reported as created (with its booking ID) or
+        skipped with the clashing times. ``dry_run`` only reports.
+        """
+        court_id = booking_data["court"]
+        start_time = booking_data["startTime"]
+        duration = float(booking_data["duration"])
+        status = booking_data.get("status", "confirmed")
+        if status not in BookingStatus.get_active_statuses():
+            raise ValueError(f"A series cannot be created with status {status}")
+
+        # Validated once up front: a slot run past 05:30 is wrong for every date
+        slot_indexes = BookingUtils.get_slot_grid(court_id).indexes_from_start(start_time, duration)
+        dates = BookingSeriesService.expand_rule(rule)
+        end_time = TimeUtils.calculate_end_time(start_time, duration)
+        sport = BookingUtils.get_sport_from_court(court_id)
+
+        with DatabaseManager.transaction():
+            if not dry_run:
+                BookingService.lock_court_workdays(court_id, dates)
+            conflicts = BookingSeriesService._find_conflicts(court_id, dates, slot_indexes)
+
+            occurrences = []
+            free_dates = []
+            for day in dates:
+                clash = conflicts.get(day)
+                if clash:
+                    occurrences.append({
+                        "date": day.isoformat(),
+                        "status": "conflict",
+                        "bookedTimes": sorted(clash["booked"]),
+                        "blockedTimes": sorted(clash["blocked"]),
+                    })
+                else:
+                    free_dates.append(day)
+                    occurrences.append({"date": day.isoformat(), "status": "available" if dry_run else "created"})
+
+            series_id = None
+            if free_dates and not dry_run:
+                series_id = BookingUtils.generate_booking_id("NS")
+                booking_ids = [BookingUtils.generate_booking_id() for _ in free_dates]
+                BookingSeriesService._insert_occurrences(
+                    series_id, booking_ids, free_dates, booking_data, rule, created_by,
+                    sport, end_time, duration, slot_indexes, status,
+                )
+                ids_by_date = dict(zip(free_dates, booking_ids))
+                for occurrence in occurrences:
+                    if occurrence["status"] == "created":
+                        occurrence["bookingId"] = ids_by_date[date_cls.fromisoformat(occurrence["date"])]
+
+        if series_id:
+            try:
+                from services.activity_service import ActivityService
+                ActivityService.log_booking_created(
+                    series_id, booking_data["playerName"],
+                    f"Admin created recurring series - Court: {court_id}, {len(free_dates)} of {len(dates)} "
+                    f"occurrences, {start_time} for {duration}h"
+                )
+            except Exception as log_error:
+                logger.warning(f"Failed to log series creation: {log_error}")
+            logger.info(f"Admin created series {series_id}: {len(free_dates)} bookings, {len(dates) - len(free_dates)} conflicts")
+
+        return {
+            "seriesId": series_id,
+            "created": 0 if dry_run else len(free_dates),
+            "conflicts": len(dates) - len(free_dates),
+            "occurrences": occurrences,
+        }
+
+    @staticmethod
+    def _insert_occurrences(series_id: str, booking_ids: List[str], dates: List[date_cls], booking_data: Dict,
+                            rule: Dict, created_by: str, sport: str, end_time: str, duration: float,
+                            slot_indexes: List[int], status: str) -> None:
+        court_id = booking_data["court"]
+        grid = BookingUtils.get_slot_grid(court_id)
+        slot_times = [grid.index_to_time(i) for i in slot_indexes]
+        spans = [TimeUtils.booking_span_utc(day.isoformat(), slot_indexes, grid.minutes) for day in dates]
+        DatabaseManager.execute_query("""
+            INSERT INTO booking_series (
+                id, court, start_time, duration, recurrence, first_date, last_date,
+                player_name, player_phone, created_by
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (
+            series_id, court_id, booking_data["startTime"], duration, json.dumps(rule), dates[0], dates[-1],
+            booking_data["playerName"], booking_data["playerPhone"], created_by,
+        ), fetch_all=False, raise_errors=True)
+
+        try:
+            DatabaseManager.execute_query("""
+                INSERT INTO bookings (
+                    id, sport, court, court_name, booking_date, start_time, end_time,
+                    duration, selected_slots, player_name, player_phone, player_email,
+                    player_count, special_requests, payment_type, total_amount, status, series_id,
+                    start_at, end_at, resource_group, slot_mask, slot_minutes
+                )
+                SELECT o.id, %s, %s, %s, o.day, %s, %s, %s, %s, %s, %s, %s, %s, %s, 'full', %s, %s, %s,
+                       o.start_at, o.end_at, %s, %s, %s
+                FROM unnest(%s::varchar[], %s::date[], %s::timestamptz[], %s::timestamptz[])
+                    AS o(id, day, start_at, end_at)
+            """, (
+                sport, court_id, BookingUtils.get_court_name(court_id), booking_data["startTime"], end_time,
+                duration, json.dumps(slot_times), booking_data["playerName"], booking_data["playerPhone"],
+                booking_data.get("playerEmail", ""), booking_data.get("playerCount", "2"),
+                booking_data.get("specialRequests", ""),
+                booking_data.get("totalAmount", BookingUtils.calculate_booking_amount(sport, duration)),
+                status, series_id, BookingUtils.get_resource_group(court_id), TimeUtils.slot_indexes_to_mask(slot_indexes),
+                grid.minutes,
+                booking_ids, dates, [span[0] for span in spans], [span[1] for span in spans],
+            ), fetch_all=False, raise_errors=True)
+
+            DatabaseManager.execute_query("""
+                INSERT INTO booking_slots (resource_group, workday, slot_index, booking_id)
+                SELECT %s, o.day, s.slot_index, o.id
+                FROM unnest(%s::varchar[], %s::date[]) AS o(id, day)
+                CROSS JOIN unnest(%s::smallint[]) AS s(slot_index)
+            """, (
+                BookingUtils.get_resource_group(court_id), booking_ids, dates,
+                slot_indexes,
+            ), fetch_all=False, raise_errors=True)
+        except (psycopg2.errors.ExclusionViolation, psycopg2.errors.UniqueViolation):
+            # Only reachable if a writer bypassed the workday locks
+            raise BookingConflictError(slot_times)
+
+        for day in dates:
+            AvailabilityService.invalidate(court_id, day)
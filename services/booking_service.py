@@ -3,86 +3,70 @@ Booking service for customer-facing booking operations.
 """
 import json
 import uuid
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Dict, Tuple
 import logging
 
+import psycopg2
+
 from database import DatabaseManager
 from config import Config
 from models import Booking, BookingStatus
-from services.blocked_slot_service import BlockedSlotService
 from services.pricing_service import PricingService
+from services.availability_service import AvailabilityService
+from utils.booking_utils import BookingUtils
+from utils.time_utils import TimeUtils
 
 logger = logging.getLogger(__name__)
 
+class BookingConflictError(Exception):
+    """Raised when requested slots are already booked or blocked"""
+    
+    def __init__(self, conflicts: List[str]):
+        self.conflicts = conflicts
+        super().__init__(f"Slots no longer available: {', '.join(conflicts)}")
+
 class BookingService:
     """Professional booking service for customer operations"""
     
     @staticmethod
-    def get_booked_slots(court_id: str, date: str) -> List[str]:
-        """Get all booked time slots for a specific court and date"""
+    def get_booked_slots(court_id: str, date: str, hold_token: str = None) -> List[str]:
+        """Get all booked time slots for a specific court and date.
+        
+        Slots held for checkout count as booked unless held under hold_token.
+        """
         try:
             logger.info(f"Fetching booked slots for court: {court_id}, date: {date}")
             
-            booked_slots = set()
-            
-            # Query direct bookings for this court
-            direct_query = """
-                SELECT selected_slots FROM bookings 
-                WHERE status IN ('confirmed', 'pending_payment') 
-                AND booking_date = %s 
-                AND court = %s
+            # Occupancy of the court's resource (shared by multi-purpose courts),
+            # live holds by others, plus this court's blocked slots, in one lookup
+            query = """
+                SELECT slot_index, NULL::time AS time_slot FROM booking_slots
+                WHERE resource_group = %s AND workday = %s
+                UNION ALL
+                SELECT slot_index, NULL FROM slot_holds
+                WHERE resource_group = %s AND workday = %s
+                AND expires_at > CURRENT_TIMESTAMP AND token IS DISTINCT FROM %s
+                UNION ALL
+                SELECT NULL, time_slot FROM blocked_slots
+                WHERE court = %s AND date = %s
             """
             
-            direct_bookings = DatabaseManager.execute_query(direct_query, (date, court_id))
-            
-            if direct_bookings:
-                logger.info(f"Found {len(direct_bookings)} direct bookings")
-                for booking in direct_bookings:
-                    slots = booking["selected_slots"]
-                    if slots:
-                        for slot in slots:
-                            if isinstance(slot, dict) and "time" in slot:
-                                booked_slots.add(slot["time"])
+            resource_group = BookingUtils.get_resource_group(court_id)
+            rows = DatabaseManager.execute_query(
+                query, (resource_group, date, resource_group, date, hold_token, court_id, date)
+            ) or []
             
-            # Check multi-purpose court conflicts
-            if court_id in Config.MULTI_PURPOSE_COURTS:
-                multi_court_type = Config.MULTI_PURPOSE_COURTS[court_id]
-                conflicting_courts = [
-                    k for k, v in Config.MULTI_PURPOSE_COURTS.items() 
-                    if v == multi_court_type and k != court_id
-                ]
-                
-                if conflicting_courts:
-                    logger.info(f"Checking conflicts with courts: {conflicting_courts}")
-                    
-                    placeholders = ",".join(["%s"] * len(conflicting_courts))
-                    conflict_query = f"""
-                        SELECT selected_slots FROM bookings 
-                        WHERE status IN ('confirmed', 'pending_payment') 
-                        AND booking_date = %s 
-                        AND court IN ({placeholders})
-                    """
-                    
-                    conflict_params = [date] + conflicting_courts
-                    conflict_bookings = DatabaseManager.execute_query(conflict_query, conflict_params)
-                    
-                    if conflict_bookings:
-                        logger.info(f"Found {len(conflict_bookings)} conflicting bookings")
-                        for booking in conflict_bookings:
-                            slots = booking["selected_slots"]
-                            if slots:
-                                for slot in slots:
-                                    if isinstance(slot, dict) and "time" in slot:
-                                        booked_slots.add(slot["time"])
-            
-            # Add blocked slots to the list
-            blocked_slots = BlockedSlotService.get_blocked_slots(court_id, date)
-            if blocked_slots:
-                logger.info(f"Found {len(blocked_slots)} blocked slots")
-                booked_slots.update(blocked_slots)
+            grid = BookingUtils.get_slot_grid(court_id)
+            booked_slots = set()
+            for row in rows:
+                if row["slot_index"] is not None:
+                    booked_slots.add(grid.index_to_time(row["slot_index"]))
+                else:
+                    booked_slots.add(row["time_slot"].strftime("%H:%M"))
             
-            result = sorted(list(booked_slots))
+            result = sorted(booked_slots)
             logger.info(f"Total unavailable slots (booked + blocked): {len(result)}")
             return result
         
@@ -91,11 +75,25 @@ class BookingService:
             return []
     
     @staticmethod
-    def check_slot_availability(court_id: str, date: str, selected_slots: List[Dict]) -> Tuple[bool, List[str]]:
-        """Check if selected slots are still available"""
+    def get_booked_slots_for_courts(court_ids: List[str], date: str, hold_token: str = None) -> Dict[str, List[str]]:
+        """Batch form of get_booked_slots: unavailable slots per court for one date.
+        
+        Served from the availability cache; every missing resource is loaded
+        with a single query. Slots held under hold_token count as free.
+        """
+        logger.info(f"Fetching booked slots for {len(court_ids)} courts, date: {date}")
+        return AvailabilityService.get_booked_slots_for_courts(court_ids, date, hold_token)
+    
+    @staticmethod
+    def check_slot_availability(court_id: str, date: str, selected_slots: List,
+                                hold_token: str = None) -> Tuple[bool, List[str]]:
+        """Check if selected slots ({"time": 'HH:mm'} or 'HH:mm') are still available.
+        
+        Slots held under hold_token count as free.
+        """
+        slot_times = [slot["time"] if isinstance(slot, dict) else slot for slot in selected_slots]
         try:
-            booked_slots = BookingService.get_booked_slots(court_id, date)
-            slot_times = [slot["time"] for slot in selected_slots]
+            booked_slots = BookingService.get_booked_slots(court_id, date, hold_token)
             
             conflicts = [slot for slot in slot_times if slot in booked_slots]
             return len(conflicts) == 0, conflicts
@@ -104,6 +102,141 @@ class BookingService:
             logger.error(f"Error checking availability: {e}")
             return False, []
     
+    @staticmethod
+    def lock_court_workday(court_id: str, date: str) -> None:
+        """Serialize slot claims for a court's resource and workday until the transaction ends.
+
+        Multi-purpose courts share one lock, so cricket-2 and futsal-1 claims
+        queue behind each other.
+        """
+        lock_key = f"booking:{BookingUtils.get_resource_group(court_id)}:{date}"
+        result = DatabaseManager.execute_query(
+            "SELECT pg_advisory_xact_lock(hashtext(%s)) AS locked", (lock_key,), fetch_one=True
+        )
+        if result is None:
+            raise Exception(f"Could not lock {lock_key}")
+    
+    @staticmethod
+    def lock_court_workdays(court_id: str, dates: List) -> None:
+        """lock_court_workday for many workdays in one round trip (taken in a fixed order)"""
+        resource_group = BookingUtils.get_resource_group(court_id)
+        BookingService._lock_keys({f"booking:{resource_group}:{date}" for date in dates})
+    
+    @staticmethod
+    def lock_courts_workday(court_ids: List[str], date: str) -> None:
+        """lock_court_workday for several courts on one workday in one round trip"""
+        BookingService._lock_keys({f"booking:{BookingUtils.get_resource_group(c)}:{date}" for c in court_ids})
+    
+    @staticmethod
+    def _lock_keys(lock_keys) -> None:
+        # Sorted, so callers holding several locks always take them in the same order
+        lock_keys = sorted(lock_keys)
+        result = DatabaseManager.execute_query("""
+            SELECT count(*) AS locked FROM (
+                SELECT pg_advisory_xact_lock(hashtext(lock_key))
+                FROM unnest(%s::text[]) WITH ORDINALITY AS k(lock_key, n) ORDER BY n
+            ) AS locks
+        """, (lock_keys,), fetch_one=True)
+        if result is None:
+            raise Exception(f"Could not lock {', '.join(lock_keys)}")
+    
+    @staticmethod
+    def get_assignable_courts(sport: str) -> List[str]:
+        """Courts of a sport that "any court" bookings may be placed on"""
+        return [
+            court["id"] for court in Config.COURT_CONFIG.get(sport, [])
+            if not BookingUtils.is_phone_only(court["id"])
+        ]
+    
+    @staticmethod
+    def _unavailable_masks(court_ids: List[str], date: str, hold_token: str = None) -> Dict[str, int]:
+        """Authoritative booked/held/blocked bitmaps per court for one workday (one query, no cache)"""
+        groups = sorted({BookingUtils.get_resource_group(court_id) for court_id in court_ids})
+        rows = DatabaseManager.execute_query("""
+            SELECT resource_group, NULL AS court, slot_index, NULL::time AS time_slot FROM booking_slots
+            WHERE resource_group = ANY(%s) AND workday = %s
+            UNION ALL
+            SELECT resource_group, NULL, slot_index, NULL FROM slot_holds
+            WHERE resource_group = ANY(%s) AND workday = %s
+            AND expires_at > CURRENT_TIMESTAMP AND token IS DISTINCT FROM %s
+            UNION ALL
+            SELECT NULL, court, NULL, time_slot FROM blocked_slots
+            WHERE court = ANY(%s) AND date = %s
+        """, (groups, date, groups, date, hold_token, list(court_ids), date), raise_errors=True) or []
+        
+        booked = {group: 0 for group in groups}
+        blocked = {court_id: 0 for court_id in court_ids}
+        for row in rows:
+            if row["slot_index"] is not None:
+                booked[row["resource_group"]] |= 1 << row["slot_index"]
+            else:
+                grid = BookingUtils.get_slot_grid(row["court"])
+                blocked[row["court"]] |= 1 << grid.time_to_index(row["time_slot"].strftime("%H:%M"))
+        return {
+            court_id: booked[BookingUtils.get_resource_group(court_id)] | blocked[court_id]
+            for court_id in court_ids
+        }
+    
+    # A free run shorter than this is left unsellable by a placement
+    MIN_SELLABLE_MINUTES = 60
+    
+    @staticmethod
+    def _placement_score(free: int, slot_indexes: List[int], slot_minutes: int) -> Tuple[int, int, int]:
+        """How badly booking ``slot_indexes`` fragments a court's ``free`` bitmap (lower is better).
+        
+        Compares, in order: free slots stranded in runs too short to sell,
+        the number of free runs left, and the length of the gap the booking
+        is cut from (best fit: the tightest gap wins).
+        """
+        booking_mask = TimeUtils.slot_indexes_to_mask(slot_indexes)
+        min_run = max(1, BookingService.MIN_SELLABLE_MINUTES // slot_minutes)
+        runs_after = AvailabilityService.free_runs(free & ~booking_mask)
+        stranded = sum(length for _, length in runs_after if length < min_run)
+        first = min(slot_indexes)
+        gap = next(length for start, length in AvailabilityService.free_runs(free) if start <= first < start + length)
+        return stranded, len(runs_after), gap
+    
+    @staticmethod
+    def assign_court(sport: str, date: str, slot_times: List[str], hold_token: str = None,
+                     lock: bool = True) -> str:
+        """Pick the court of ``sport`` that the booking leaves least fragmented.
+        
+        With ``lock`` (for booking) it must run inside a transaction: every
+        candidate court's workday is locked, so the choice stays valid until
+        commit. ``lock=False`` only previews the choice (e.g. for a quote) and
+        does not serialize against bookings. Courts keep their COURT_CONFIG
+        order on a tie. Raises BookingConflictError (with the slots taken on
+        the closest candidate) if no court has them all free.
+        """
+        court_ids = BookingService.get_assignable_courts(sport)
+        if not court_ids:
+            raise ValueError(f"No courts can be assigned automatically for {sport}")
+        
+        if lock:
+            BookingService.lock_courts_workday(court_ids, date)
+        unavailable = BookingService._unavailable_masks(court_ids, date, hold_token)
+        
+        best, best_score, fewest_conflicts = None, None, None
+        for court_id in court_ids:
+            grid = BookingUtils.get_slot_grid(court_id)
+            if any(t not in grid.index_by_time for t in slot_times):
+                continue  # the times are not on this court's grid
+            slot_indexes = grid.to_indexes(slot_times)
+            taken = [grid.index_to_time(i) for i in slot_indexes if unavailable[court_id] >> i & 1]
+            if taken:
+                if fewest_conflicts is None or len(taken) < len(fewest_conflicts):
+                    fewest_conflicts = taken
+                continue
+            free = AvailabilityService.open_mask(grid.minutes) & ~unavailable[court_id]
+            score = BookingService._placement_score(free, slot_indexes, grid.minutes)
+            if best_score is None or score < best_score:
+                best, best_score = court_id, score
+        
+        if best is None:
+            raise BookingConflictError(fewest_conflicts or list(slot_times))
+        logger.info(f"Assigned {best} for {sport} on {date} (stranded, runs, gap = {best_score})")
+        return best
+    
     @staticmethod
     def create_booking(booking_data: Dict) -> str:
         """Create a new booking with validation"""
@@ -114,92 +247,472 @@ class BookingService:
                 "endTime", "duration", "selectedSlots", "playerName", "playerPhone"
             ]
             
+            # "any court" requests name only the sport; the court is assigned below
+            auto_assign = booking_data.get("court") in (None, "", "any")
+            if auto_assign:
+                required_fields = [f for f in required_fields if f not in ("court", "courtName")]
+            
             for field in required_fields:
                 if not booking_data.get(field):
                     raise ValueError(f"Missing required field: {field}")
+            if not auto_assign and BookingUtils.is_phone_only(booking_data["court"]):
+                raise ValueError("This court can only be booked by phone")
             
-            # Generate booking ID
-            booking_id = BookingService._generate_booking_id()
-            
-            # Calculate total amount using dynamic pricing
-            original_amount = BookingService.calculate_booking_price(
-                booking_data["court"], 
-                booking_data["date"], 
-                booking_data["selectedSlots"]
+            # Courts of one sport share a slot grid, so this holds for any assigned court
+            grid_court = booking_data["court"] if not auto_assign else next(
+                iter(BookingService.get_assignable_courts(booking_data["sport"])), None
             )
+            if grid_court:
+                grid = BookingUtils.get_slot_grid(grid_court)
+                grid.require_contiguous(grid.to_indexes(booking_data["selectedSlots"]))
             
-            # Handle promo code if provided
-            promo_code = booking_data.get("promoCode", "").strip()
-            discount_amount = booking_data.get("discountAmount", 0)
-            final_amount = booking_data.get("totalAmount", original_amount)
+            with DatabaseManager.transaction():
+                # Conflict check and insert run under one lock so concurrent
+                # requests for the same slots cannot both succeed
+                hold_token = booking_data.get("holdToken") or None
+                if auto_assign:
+                    booking_data["court"] = BookingService.assign_court(
+                        booking_data["sport"], booking_data["date"],
+                        [slot["time"] if isinstance(slot, dict) else slot for slot in booking_data["selectedSlots"]],
+                        hold_token,
+                    )
+                    booking_data["courtName"] = BookingUtils.get_court_name(booking_data["court"])
+                else:
+                    BookingService.lock_court_workday(booking_data["court"], booking_data["date"])
+                available, conflicts = BookingService.check_slot_availability(
+                    booking_data["court"], booking_data["date"], booking_data["selectedSlots"], hold_token
+                )
+                if not available:
+                    raise BookingConflictError(conflicts)
+                
+                # Generate booking ID
+                booking_id = BookingService._generate_booking_id()
             
-            # Store original amount before discount
-            original_booking_amount = original_amount
+                quote_token = booking_data.get("quoteToken")
+                slot_times = [slot["time"] if isinstance(slot, dict) else slot for slot in booking_data["selectedSlots"]]
+                if quote_token or auto_assign:
+                    # Server-side amounts: a signed quote (re-priced if another
+                    # court was assigned), or the assigned court's price list
+                    from services.quote_service import QuoteService
+                    if quote_token:
+                        original_amount, discount_amount, promo_code = QuoteService.redeem_quote(
+                            quote_token, "any" if auto_assign else booking_data["court"],
+                            booking_data["court"], booking_data["date"], slot_times,
+                        )
+                    else:
+                        original_amount, discount_amount, promo_code, _ = QuoteService.price_selection(
+                            booking_data["court"], booking_data["date"], slot_times, booking_data.get("promoCode")
+                        )
+                    final_amount = original_amount - discount_amount
+                else:
+                    # Calculate total amount using dynamic pricing
+                    original_amount = BookingService.calculate_booking_price(
+                        booking_data["court"], 
+                        booking_data["date"], 
+                        booking_data["selectedSlots"]
+                    )
+                
+                    # Handle promo code if provided
+                    promo_code = booking_data.get("promoCode", "").strip()
+                    discount_amount = booking_data.get("discountAmount", 0)
+                    final_amount = booking_data.get("totalAmount", original_amount)
             
-            # Increment promo code usage if promo was applied
-            if promo_code and discount_amount > 0:
-                from services.promo_service import PromoService
-                PromoService.increment_usage_count(promo_code)
-                logger.info(f"Promo code {promo_code} used, discount: {discount_amount}")
+                # Store original amount before discount
+                original_booking_amount = original_amount
             
-            # Use the final amount (after promo discount)
-            booking_data["totalAmount"] = final_amount
+                # Increment promo code usage if promo was applied
+                if promo_code and discount_amount > 0:
+                    from services.promo_service import PromoService
+                    if not PromoService.increment_usage_count(promo_code):
+                        raise ValueError(f"Promo code {promo_code} can no longer be applied")
+                    logger.info(f"Promo code {promo_code} used, discount: {discount_amount}")
             
-            # Prepare insert query
-            insert_query = """
-                INSERT INTO bookings (
-                    id, sport, court, court_name, booking_date, start_time, end_time,
-                    duration, selected_slots, player_name, player_phone, player_email,
-                    player_count, special_requests, payment_type, total_amount, 
-                    promo_code, discount_amount, original_amount, status
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                )
-            """
+                # Use the final amount (after promo discount)
+                booking_data["totalAmount"] = final_amount
             
-            params = (
-                booking_id,
-                booking_data["sport"],
-                booking_data["court"],
-                booking_data["courtName"],
-                booking_data["date"],
-                booking_data["startTime"],
-                booking_data["endTime"],
-                booking_data["duration"],
-                json.dumps(booking_data["selectedSlots"]),
-                booking_data["playerName"],
-                booking_data["playerPhone"],
-                booking_data.get("playerEmail", ""),
-                booking_data.get("playerCount", "2"),
-                booking_data.get("specialRequests", ""),
-                booking_data.get("paymentType", "advance"),
-                final_amount,
-                promo_code if promo_code else None,
-                discount_amount,
-                original_booking_amount,
-                BookingStatus.PENDING_PAYMENT,
-            )
+                # Prepare insert query
+                insert_query = """
+                    INSERT INTO bookings (
+                        id, sport, court, court_name, booking_date, start_time, end_time,
+                        duration, selected_slots, player_name, player_phone, player_email,
+                        player_count, special_requests, payment_type, total_amount, 
+                        promo_code, discount_amount, original_amount, status, start_at, end_at,
+                        resource_group, slot_mask, slot_minutes
+                    ) VALUES (
+                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+                    )
+                """
+                grid = BookingUtils.get_slot_grid(booking_data["court"])
+                slot_indexes = grid.to_indexes(booking_data["selectedSlots"])
+                start_at, end_at = TimeUtils.booking_span_utc(booking_data["date"], slot_indexes, grid.minutes)
             
-            result = DatabaseManager.execute_query(insert_query, params, fetch_all=False)
+                params = (
+                    booking_id,
+                    booking_data["sport"],
+                    booking_data["court"],
+                    booking_data["courtName"],
+                    booking_data["date"],
+                    booking_data["startTime"],
+                    booking_data["endTime"],
+                    booking_data["duration"],
+                    json.dumps([grid.index_to_time(i) for i in slot_indexes]),
+                    booking_data["playerName"],
+                    booking_data["playerPhone"],
+                    booking_data.get("playerEmail", ""),
+                    booking_data.get("playerCount", "2"),
+                    booking_data.get("specialRequests", ""),
+                    booking_data.get("paymentType", "advance"),
+                    final_amount,
+                    promo_code if promo_code else None,
+                    discount_amount,
+                    original_booking_amount,
+                    BookingStatus.PENDING_PAYMENT,
+                    start_at,
+                    end_at,
+                    BookingUtils.get_resource_group(booking_data["court"]),
+                    TimeUtils.slot_indexes_to_mask(slot_indexes),
+                    grid.minutes,
+                )
             
-            if result is not None:
-                # Log the booking creation activity
-                try:
-                    from services.activity_service import ActivityService
-                    ActivityService.log_booking_created(booking_id, booking_data["playerName"], 
-                                                      f"Customer created booking - Court: {booking_data['courtName']}, Duration: {booking_data['duration']}h")
-                except Exception as log_error:
-                    logger.warning(f"Failed to log booking creation: {log_error}")
+                with BookingService.overlap_as_conflict(booking_data["court"], booking_data["date"], slot_indexes):
+                    result = DatabaseManager.execute_query(insert_query, params, fetch_all=False, raise_errors=True)
+            
+                if result is not None:
+                    BookingService.claim_slots(booking_id, booking_data["court"], booking_data["date"], slot_indexes)
+                    if hold_token:
+                        from services.hold_service import HoldService
+                        HoldService.release_hold(hold_token)
+                    
+                    # Log the booking creation activity
+                    try:
+                        from services.activity_service import ActivityService
+                        ActivityService.log_booking_created(booking_id, booking_data["playerName"], 
+                                                          f"Customer created booking - Court: {booking_data['courtName']}, Duration: {booking_data['duration']}h")
+                    except Exception as log_error:
+                        logger.warning(f"Failed to log booking creation: {log_error}")
                 
-                logger.info(f"Successfully created booking: {booking_id}")
-                return booking_id
-            else:
-                raise Exception("Failed to insert booking")
+                    logger.info(f"Successfully created booking: {booking_id}")
+                    return booking_id
+                else:
+                    raise Exception("Failed to insert booking")
         
+        except BookingConflictError as e:
+            logger.info(f"Booking conflict on {booking_data.get('court')} {booking_data.get('date')}: {e.conflicts}")
+            raise e
         except Exception as e:
             logger.error(f"Error creating booking: {e}")
             raise e
     
+    # Expands bookings.selected_slots of active bookings into booking_slots rows
+    # (slot_index = steps of the booking's slot_minutes from the 05:30 workday start)
+    _OCCUPANCY_BACKFILL_QUERY = """
+        INSERT INTO booking_slots (resource_group, workday, slot_index, booking_id)
+        SELECT DISTINCT
+            COALESCE(m.resource_group, b.court),
+            b.booking_date,
+            ((EXTRACT(HOUR FROM t.slot_time) * 60 + EXTRACT(MINUTE FROM t.slot_time))::int
+                + 1440 - %s) %% 1440 / b.slot_minutes,
+            b.id
+        FROM bookings b
+        CROSS JOIN LATERAL (
+            SELECT (CASE jsonb_typeof(slot)
+                        WHEN 'object' THEN slot->>'time'
+                        WHEN 'string' THEN slot #>> '{}'
+                    END)::time AS slot_time
+            FROM jsonb_array_elements(b.selected_slots) AS slot
+        ) t
+        LEFT JOIN unnest(%s::text[], %s::text[]) AS m(court, resource_group) ON m.court = b.court
+        WHERE jsonb_typeof(b.selected_slots) = 'array'
+        AND t.slot_time IS NOT NULL
+        AND b.status IN ('confirmed', 'pending_payment')
+        AND NOT EXISTS (SELECT 1 FROM booking_slots bs WHERE bs.booking_id = b.id)
+        ON CONFLICT DO NOTHING
+    """
+    
+    # Fills bookings.start_at/end_at from selected_slots (offsets in minutes
+    # from the 05:30 workday start), else from start_time + duration
+    _TIMES_BACKFILL_QUERIES = ("""
+        UPDATE bookings b
+        SET start_at = (b.booking_date + make_interval(mins => %s + s.first_offset)) AT TIME ZONE %s,
+            end_at = (b.booking_date + make_interval(mins => %s + s.last_offset + s.slot_minutes)) AT TIME ZONE %s
+        FROM (
+            SELECT bk.id, bk.slot_minutes, min(t.offset_min) AS first_offset, max(t.offset_min) AS last_offset
+            FROM bookings bk
+            CROSS JOIN LATERAL (
+                SELECT ((EXTRACT(HOUR FROM x.slot_time) * 60 + EXTRACT(MINUTE FROM x.slot_time))::int
+                            + 1440 - %s) %% 1440 AS offset_min
+                FROM (
+                    SELECT (CASE jsonb_typeof(slot)
+                                WHEN 'object' THEN slot->>'time'
+                                WHEN 'string' THEN slot #>> '{}'
+                            END)::time AS slot_time
+                    FROM jsonb_array_elements(bk.selected_slots) AS slot
+                ) x
+                WHERE x.slot_time IS NOT NULL
+            ) t
+            WHERE bk.start_at IS NULL AND jsonb_typeof(bk.selected_slots) = 'array'
+            GROUP BY bk.id, bk.slot_minutes
+        ) s
+        WHERE b.id = s.id
+    """, """
+        UPDATE bookings
+        SET start_at = (booking_date + start_time
+                        + CASE WHEN start_time < %s::time THEN interval '1 day' ELSE interval '0' END) AT TIME ZONE %s,
+            end_at = (booking_date + start_time
+                      + CASE WHEN start_time < %s::time THEN interval '1 day' ELSE interval '0' END
+                      + duration * interval '1 hour') AT TIME ZONE %s
+        WHERE start_at IS NULL AND start_time IS NOT NULL
+    """)
+    
+    @staticmethod
+    def backfill_booking_times() -> int:
+        """Populate start_at/end_at for bookings written before those columns existed"""
+        workday_start = TimeUtils.slot_index_to_time(0)
+        tz = Config.ARENA_TIMEZONE
+        from_slots, from_start_time = BookingService._TIMES_BACKFILL_QUERIES
+        result = (DatabaseManager.execute_query(from_slots, (
+            TimeUtils.WORKDAY_START_MINUTES, tz, TimeUtils.WORKDAY_START_MINUTES, tz,
+            TimeUtils.WORKDAY_START_MINUTES,
+        ), fetch_all=False) or 0) + (DatabaseManager.execute_query(
+            from_start_time, (workday_start, tz, workday_start, tz), fetch_all=False
+        ) or 0)
+        if result:
+            logger.info(f"Backfilled start/end timestamps for {result} bookings")
+        return result
+    
+    # Fills bookings.slot_mask from selected_slots for rows written before it
+    # existed (a sum of distinct powers of two, as masks can exceed 64 bits)
+    _SLOT_MASK_BACKFILL_QUERY = """
+        UPDATE bookings b SET slot_mask = s.mask
+        FROM (
+            SELECT bk.id, SUM(DISTINCT power(2::numeric, (
+                ((EXTRACT(HOUR FROM x.slot_time) * 60 + EXTRACT(MINUTE FROM x.slot_time))::int
+                    + 1440 - %s) %% 1440 / bk.slot_minutes
+            )))::numeric(29,0) AS mask
+            FROM bookings bk
+            CROSS JOIN LATERAL (
+                SELECT (CASE jsonb_typeof(slot)
+                            WHEN 'object' THEN slot->>'time'
+                            WHEN 'string' THEN slot #>> '{}'
+                        END)::time AS slot_time
+                FROM jsonb_array_elements(bk.selected_slots) AS slot
+            ) x
+            WHERE bk.slot_mask IS NULL AND jsonb_typeof(bk.selected_slots) = 'array'
+            AND x.slot_time IS NOT NULL
+            GROUP BY bk.id
+        ) s
+        WHERE b.id = s.id
+    """
+    
+    @staticmethod
+    def backfill_slot_masks() -> int:
+        """Populate slot_mask for bookings that only have selected_slots"""
+        result = DatabaseManager.execute_query(
+            BookingService._SLOT_MASK_BACKFILL_QUERY,
+            (TimeUtils.WORKDAY_START_MINUTES,),
+            fetch_all=False,
+        )
+        if result:
+            logger.info(f"Backfilled slot masks for {result} bookings")
+        return result or 0
+    
+    @staticmethod
+    def regrid_bookings() -> int:
+        """Move bookings onto their court's current slot grid (e.g. after it changed to 15-minute slots).
+        
+        Rewrites slot_mask/slot_minutes/selected_slots and rebuilds the
+        booking_slots rows, whose slot numbers depend on the grid.
+        """
+        courts = [court["id"] for courts in Config.COURT_CONFIG.values() for court in courts]
+        rows = DatabaseManager.execute_query("""
+            SELECT b.id, b.court, b.slot_mask, b.slot_minutes
+            FROM bookings b
+            JOIN unnest(%s::text[], %s::int[]) AS g(court, slot_minutes) ON g.court = b.court
+            WHERE b.slot_minutes <> g.slot_minutes AND b.slot_mask IS NOT NULL
+        """, (courts, [BookingUtils.get_slot_minutes(court) for court in courts])) or []
+        
+        moved = 0
+        for row in rows:
+            grid = BookingUtils.get_slot_grid(row["court"])
+            mask = grid.convert_mask(int(row["slot_mask"]), TimeUtils.slot_grid(row["slot_minutes"]))
+            try:
+                with DatabaseManager.transaction():
+                    DatabaseManager.execute_query("""
+                        UPDATE bookings SET slot_mask = %s, slot_minutes = %s, selected_slots = %s WHERE id = %s
+                    """, (
+                        mask, grid.minutes,
+                        json.dumps([grid.index_to_time(i) for i in TimeUtils.mask_to_slot_indexes(mask)]), row["id"],
+                    ), fetch_all=False, raise_errors=True)
+                    BookingService.sync_booking_slots(row["id"])
+                moved += 1
+            except BookingConflictError as e:
+                logger.warning(f"Could not move booking {row['id']} to {grid.minutes}-minute slots: {e}")
+        if moved:
+            logger.info(f"Moved {moved} bookings onto their court's slot grid")
+        return moved
+    
+    @staticmethod
+    def get_bookings_in_progress(at: datetime = None) -> List[Dict]:
+        """Active bookings whose span contains ``at`` (default: now), via the start/end range index"""
+        try:
+            return DatabaseManager.execute_query("""
+                SELECT id, court, court_name, sport, player_name, booking_date, start_time, end_time,
+                       start_at, end_at, status
+                FROM bookings
+                WHERE start_at IS NOT NULL
+                AND tstzrange(start_at, end_at) @> COALESCE(%s::timestamptz, CURRENT_TIMESTAMP)
+                AND status = ANY(%s)
+                ORDER BY court
+            """, (at, BookingStatus.get_active_statuses())) or []
+        except Exception as e:
+            logger.error(f"Error getting bookings in progress: {e}")
+            return []
+    
+    @staticmethod
+    def claim_slots(booking_id: str, court_id: str, date: str, slots: List) -> None:
+        """Record a booking's slot occupancy (slots as numbers on the court's grid or 'HH:mm').
+        
+        The unique (resource_group, workday, slot_index) index turns a double
+        booking into BookingConflictError.
+        """
+        resource_group = BookingUtils.get_resource_group(court_id)
+        slot_indexes = BookingUtils.get_slot_grid(court_id).to_indexes(slots)
+        AvailabilityService.invalidate(court_id, date)
+        try:
+            # Own savepoint: the conflict lookup below runs after the violation
+            with DatabaseManager.transaction():
+                DatabaseManager.execute_query("""
+                    INSERT INTO booking_slots (resource_group, workday, slot_index, booking_id)
+                    SELECT %s, %s, unnest(%s::smallint[]), %s
+                """, (resource_group, date, slot_indexes, booking_id), fetch_all=False, raise_errors=True)
+        except psycopg2.errors.UniqueViolation:
+            raise BookingConflictError(BookingService._taken_slot_times(court_id, date, slot_indexes))
+    
+    @staticmethod
+    def _taken_slot_times(court_id: str, date: str, slots: List) -> List[str]:
+        """Which of the slots are occupied on the court's resource, as 'HH:mm' (for conflict messages)"""
+        grid = BookingUtils.get_slot_grid(court_id)
+        slot_indexes = grid.to_indexes(slots)
+        taken = DatabaseManager.execute_query("""
+            SELECT slot_index FROM booking_slots
+            WHERE resource_group = %s AND workday = %s AND slot_index = ANY(%s::smallint[])
+        """, (BookingUtils.get_resource_group(court_id), date, slot_indexes)) or []
+        return [grid.index_to_time(i) for i in (sorted(r["slot_index"] for r in taken) or slot_indexes)]
+    
+    @staticmethod
+    @contextmanager
+    def overlap_as_conflict(court_id: str, date: str, slots: List):
+        """Turn a bookings_no_overlap violation (SQLSTATE 23P01) into BookingConflictError"""
+        try:
+            with DatabaseManager.transaction():
+                yield
+        except psycopg2.errors.ExclusionViolation:
+            raise BookingConflictError(BookingService._taken_slot_times(court_id, date, slots))
+    
+    @staticmethod
+    def ensure_overlap_constraint() -> bool:
+        """Let Postgres reject overlapping active bookings on one resource.
+        
+        Adds an EXCLUDE constraint on (resource_group, tstzrange(start_at, end_at))
+        once resource_group is filled in. It needs the btree_gist extension.
+        Where that cannot be installed (e.g. managed databases without it) the
+        fallback is permanent and supported: every booking write claims its
+        slots in booking_slots under the workday lock, and that table's unique
+        index rejects double bookings on its own. The constraint only adds a
+        second check on the canonical start/end times.
+        """
+        courts = list(Config.MULTI_PURPOSE_COURTS.keys())
+        DatabaseManager.execute_query("""
+            UPDATE bookings SET resource_group = COALESCE(
+                (SELECT m.resource_group FROM unnest(%s::text[], %s::text[]) AS m(court, resource_group)
+                 WHERE m.court = bookings.court),
+                court
+            )
+            WHERE resource_group IS NULL
+        """, (courts, [Config.MULTI_PURPOSE_COURTS[court] for court in courts]), fetch_all=False)
+        
+        if DatabaseManager.execute_query(
+            "SELECT 1 AS present FROM pg_constraint WHERE conname = 'bookings_no_overlap'", fetch_one=True
+        ):
+            return True
+        try:
+            with DatabaseManager.transaction():
+                DatabaseManager.execute_query(
+                    "CREATE EXTENSION IF NOT EXISTS btree_gist", fetch_all=False, raise_errors=True
+                )
+                DatabaseManager.execute_query("""
+                    ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap
+                    EXCLUDE USING gist (resource_group WITH =, tstzrange(start_at, end_at) WITH &&)
+                    WHERE (status IN ('confirmed', 'pending_payment') AND start_at IS NOT NULL)
+                """, fetch_all=False, raise_errors=True)
+            logger.info("Added bookings_no_overlap exclusion constraint")
+            return True
+        except Exception as e:
+            logger.warning(f"Booking overlap constraint not added ({e}); the booking_slots unique index "
+                           f"remains the double-booking guard")
+            return False
+    
+    @staticmethod
+    @contextmanager
+    def status_change_as_conflict(booking_id: str):
+        """overlap_as_conflict for reactivating an existing booking (slots read from the booking)"""
+        try:
+            with DatabaseManager.transaction():
+                yield
+        except psycopg2.errors.ExclusionViolation:
+            booking = DatabaseManager.execute_query(
+                "SELECT court, booking_date, slot_mask, slot_minutes, selected_slots FROM bookings WHERE id = %s",
+                (booking_id,), fetch_one=True
+            )
+            if not booking:
+                raise BookingConflictError([])
+            raise BookingConflictError(BookingService._taken_slot_times(
+                booking["court"], booking["booking_date"], BookingService._booking_slots(booking)
+            ))
+    
+    @staticmethod
+    def _booking_slots(booking: Dict) -> List:
+        """A booking row's slots on its court's current grid (numbers, or 'HH:mm' for legacy rows)"""
+        if booking["slot_mask"] is not None:
+            grid = BookingUtils.get_slot_grid(booking["court"])
+            mask = grid.convert_mask(int(booking["slot_mask"]), TimeUtils.slot_grid(booking["slot_minutes"]))
+            return TimeUtils.mask_to_slot_indexes(mask)
+        slots = booking["selected_slots"] or []
+        return json.loads(slots) if isinstance(slots, str) else slots
+    
+    @staticmethod
+    def sync_booking_slots(booking_id: str) -> None:
+        """Rebuild a booking's occupancy rows after its status changed"""
+        DatabaseManager.execute_query(
+            "DELETE FROM booking_slots WHERE booking_id = %s", (booking_id,), fetch_all=False, raise_errors=True
+        )
+        booking = DatabaseManager.execute_query(
+            "SELECT court, booking_date, status, slot_mask, slot_minutes, selected_slots FROM bookings WHERE id = %s",
+            (booking_id,), fetch_one=True, raise_errors=True
+        )
+        if not booking:
+            return
+        AvailabilityService.invalidate(booking["court"], booking["booking_date"])
+        if booking["status"] not in BookingStatus.get_active_statuses():
+            return
+        BookingService.claim_slots(
+            booking_id, booking["court"], booking["booking_date"].isoformat(), BookingService._booking_slots(booking)
+        )
+    
+    @staticmethod
+    def backfill_booking_slots() -> int:
+        """Populate booking_slots for active bookings that have no occupancy rows yet"""
+        courts = list(Config.MULTI_PURPOSE_COURTS.keys())
+        groups = [Config.MULTI_PURPOSE_COURTS[court] for court in courts]
+        result = DatabaseManager.execute_query(
+            BookingService._OCCUPANCY_BACKFILL_QUERY,
+            (TimeUtils.WORKDAY_START_MINUTES, courts, groups),
+            fetch_all=False,
+        )
+        if result:
+            logger.info(f"Backfilled {result} booking slot rows")
+        return result or 0
+    
     @staticmethod
     def get_booking_by_id(booking_id: str) -> Dict:
         """Get booking details by ID"""
@@ -222,8 +735,11 @@ class BookingService:
             if status not in BookingStatus.get_all_statuses():
                 raise ValueError(f"Invalid status: {status}")
             
-            query = "UPDATE bookings SET status = %s WHERE id = %s"
-            result = DatabaseManager.execute_query(query, (status, booking_id), fetch_all=False)
+            with DatabaseManager.transaction():
+                query = "UPDATE bookings SET status = %s WHERE id = %s"
+                result = DatabaseManager.execute_query(query, (status, booking_id), fetch_all=False)
+                if result is not None:
+                    BookingService.sync_booking_slots(booking_id)
             
             if result is not None:
                 logger.info(f"Updated booking {booking_id} status to {status}")
@@ -243,13 +759,12 @@ class BookingService:
             # Convert booking date string to date object
             booking_date_obj = datetime.strptime(booking_date, "%Y-%m-%d").date()
             
-            # Extract time slots from selected slots
-            time_slots = [slot.get("time") for slot in selected_slots if slot.get("time")]
+            slot_indexes = BookingUtils.get_slot_grid(court_id).to_indexes(selected_slots)
             
             # Use pricing service to calculate price
-            total_price = PricingService.calculate_price(court_id, booking_date_obj, time_slots)
+            total_price = PricingService.calculate_price(court_id, booking_date_obj, slot_indexes)
             
-            logger.info(f"Calculated price for {court_id} on {booking_date}: {total_price} PKR for {len(time_slots)} slots")
+            logger.info(f"Calculated price for {court_id} on {booking_date}: {total_price} PKR for {len(slot_indexes)} slots")
             return total_price
             
         except Exception as e:
@@ -261,7 +776,7 @@ class BookingService:
     def _get_fallback_price(court_id: str, slot_count: int) -> int:
         """Fallback pricing method using hardcoded values"""
         # Use existing hardcoded prices as fallback
-        # Prices per 30-minute slot (match PricingService defaults)
+        # Prices per 30-minute slot (match PricingService defaults), prorated for other slot lengths
         fallback_prices = {
             'padel-1': 3000,
             'padel-2': 2750,
@@ -272,7 +787,7 @@ class BookingService:
         }
         
         base_price = fallback_prices.get(court_id, 3000)
-        return base_price * slot_count
+        return base_price * slot_count * BookingUtils.get_slot_minutes(court_id) // TimeUtils.SLOT_MINUTES
     
     @staticmethod
     def _generate_booking_id() -> str:
@@ -0,0 +1,131 @@
+"""
+Hold service for reserving slots while a customer checks out.
+"""
+import os
+import time
+import secrets
+import threading
+from typing import Dict, List
+import logging
+
+from database import DatabaseManager
+from config import Config
+from services.availability_service import AvailabilityService
+from services.booking_service import BookingService, BookingConflictError
+from utils.booking_utils import BookingUtils
+
+logger = logging.getLogger(__name__)
+
+
+class HoldService:
+    """Time-limited holds on court slots, keyed by an opaque token.
+
+    Held slots count as unavailable to everyone but the holder until
+    ``expires_at``; ``BookingService.create_booking`` consumes the hold.
+    Expired rows are ignored by every query and deleted by a per-worker
+    background sweep.
+    """
+
+    _reaper = None
+    _reaper_pid = None
+    _reaper_lock = threading.Lock()
+
+    # Longest span one hold may cover (12 slots on a 30-minute court)
+    MAX_HOLD_MINUTES = 6 * 60
+
+    @staticmethod
+    def create_hold(court_id: str, date: str, slot_times: List[str], replace_token: str = None) -> Dict:
+        """Hold slots for SLOT_HOLD_SECONDS; raises BookingConflictError if any is taken.
+
+        ``replace_token`` releases the caller's previous hold in the same
+        transaction (e.g. when the selection changes).
+        """
+        if BookingUtils.is_phone_only(court_id):
+            raise ValueError("This court can only be booked by phone")
+        grid = BookingUtils.get_slot_grid(court_id)
+        max_slots = HoldService.MAX_HOLD_MINUTES // grid.minutes
+        if not slot_times or len(slot_times) > max_slots:
+            raise ValueError(f"A hold must cover 1 to {max_slots} slots")
+
+        with DatabaseManager.transaction():
+            BookingService.lock_court_workday(court_id, date)
+            if replace_token:
+                HoldService.release_hold(replace_token)
+
+            # Expired holds on this resource/day must not trip the unique index
+            DatabaseManager.execute_query("""
+                DELETE FROM slot_holds
+                WHERE resource_group = %s AND workday = %s AND expires_at <= CURRENT_TIMESTAMP
+            """, (BookingUtils.get_resource_group(court_id), date), fetch_all=False, raise_errors=True)
+
+            available, conflicts = BookingService.check_slot_availability(
+                court_id, date, slot_times
+            )
+            if not available:
+                raise BookingConflictError(conflicts)
+
+            token = secrets.token_urlsafe(24)
+            row = DatabaseManager.execute_query("""
+                INSERT INTO slot_holds (token, court, resource_group, workday, slot_index, expires_at)
+                SELECT %s, %s, %s, %s, unnest(%s::smallint[]),
+                       CURRENT_TIMESTAMP + make_interval(secs => %s)
+                RETURNING expires_at
+            """, (
+                token, court_id, BookingUtils.get_resource_group(court_id), date,
+                grid.to_indexes(slot_times), Config.SLOT_HOLD_SECONDS,
+            ), fetch_one=True, raise_errors=True)
+            AvailabilityService.invalidate(court_id, date)
+
+        logger.info(f"Held {len(slot_times)} slots on {court_id} {date} until {row['expires_at']}")
+        return {"token": token, "expires_at": row["expires_at"], "ttl_seconds": Config.SLOT_HOLD_SECONDS}
+
+    @staticmethod
+    def release_hold(token: str) -> int:
+        """Drop a hold (also used to consume it when its booking is created)"""
+        rows = DatabaseManager.execute_query(
+            "DELETE FROM slot_holds WHERE token = %s RETURNING court, workday", (token,), raise_errors=True
+        ) or []
+        for court, workday in {(row["court"], row["workday"]) for row in rows}:
+            AvailabilityService.invalidate(court, workday)
+        return len(rows)
+
+    @staticmethod
+    def reap_expired() -> int:
+        """Delete holds that have run out"""
+        result = DatabaseManager.execute_query(
+            "DELETE FROM slot_holds WHERE expires_at <= CURRENT_TIMESTAMP", fetch_all=False
+        )
+        if result:
+            logger.info(f"Reaped {result} expired slot holds")
+        return result or 0
+
+    @staticmethod
+    def _reap_forever() -> None:
+        while True:
+            time.sleep(Config.SLOT_HOLD_REAP_INTERVAL)
+            try:
+                HoldService.reap_expired()
+            except Exception as e:
+                logger.warning(f"Slot hold sweep failed: {e}")
+
+    @staticmethod
+    def ensure_reaper() -> None:
+        """Start this process's sweep thread if it is not running"""
+        reaper = HoldService._reaper
+        if reaper is not None and reaper.is_alive() and HoldService._reaper_pid == os.getpid():
+            return
+        with HoldService._reaper_lock:
+            reaper = HoldService._reaper
+            if reaper is None or not reaper.is_alive() or HoldService._reaper_pid != os.getpid():
+                reaper = threading.Thread(target=HoldService._reap_forever, name="slot-hold-reaper", daemon=True)
+                HoldService._reaper = reaper
+                HoldService._reaper_pid = os.getpid()
+                reaper.start()
+
+    @staticmethod
+    def init_app(app):
+        """Run the expired-hold sweep in every worker that serves requests"""
+
+        @app.before_request
+        def _ensure_hold_reaper():
+            HoldService.ensure_reaper()
@@ -0,0 +1,180 @@
+"""
+Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+"""
+import os
+import json
+import time
+import uuid
+import select
+import threading
+from typing import Callable, Dict, List, Optional
+import logging
+
+import psycopg2
+from psycopg2 import sql
+
+from database import DatabaseManager
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationService:
+    """Tell every worker process which cached entity/key was written.
+
+    Writers call ``publish(entity, key)`` inside their transaction; Postgres
+    delivers the NOTIFY only if it commits. Each worker runs one listener
+    thread on a dedicated connection and hands ``key`` to the callbacks
+    subscribed for ``entity``. After (re)connecting, callbacks get
+    ``key=None`` ("flush everything") since notifications may have been missed.
+    """
+
+    _subscribers: Dict[str, List[Callable]] = {}
+    _lock = threading.Lock()
+    _thread = None
+    _pid = None
+    # Identifies this process so it can skip its own notifications
+    _origin = None
+    _connected = False
+    _received = 0
+    _reconnects = 0
+
+    @staticmethod
+    def subscribe(entity: str, callback: Callable[[Optional[object]], None]) -> None:
+        """Call ``callback(key)`` when another worker publishes a change to ``entity``"""
+        with NotificationService._lock:
+            NotificationService._subscribers.setdefault(entity, []).append(callback)
+
+    @staticmethod
+    def publish(entity: str, key=None) -> None:
+        """Notify other workers (on commit of the current transaction) that ``entity``/``key`` changed"""
+        if not Config.CACHE_NOTIFY_ENABLED:
+            return
+        NotificationService._ensure_identity()
+        payload = json.dumps({"entity": entity, "key": key, "origin": NotificationService._origin})
+        result = DatabaseManager.execute_query(
+            "SELECT pg_notify(%s, %s) AS sent", (Config.CACHE_NOTIFY_CHANNEL, payload), fetch_one=True
+        )
+        if result is None:
+            logger.warning(f"Could not publish invalidation for {entity}: {key}")
+
+    @staticmethod
+    def _ensure_identity() -> None:
+        if NotificationService._pid != os.getpid():
+            with NotificationService._lock:
+                if NotificationService._pid != os.getpid():
+                    # Fresh process (e.g. forked gunicorn worker): new identity, no listener yet
+                    NotificationService._origin = uuid.uuid4().hex
+                    NotificationService._thread = None
+                    NotificationService._connected = False
+                    NotificationService._pid = os.getpid()
+
+    @staticmethod
+    def ensure_listener() -> None:
+        """Start this process's listener thread if it is not running"""
+        if not Config.CACHE_NOTIFY_ENABLED:
+            return
+        NotificationService._ensure_identity()
+        thread = NotificationService._thread
+        if thread is not None and thread.is_alive():
+            return
+        with NotificationService._lock:
+            thread = NotificationService._thread
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(
+                    target=NotificationService._listen_forever, name="cache-notify-listener", daemon=True
+                )
+                NotificationService._thread = thread
+                thread.start()
+
+    @staticmethod
+    def init_app(app):
+        """Make sure every worker that serves requests is listening"""
+
+        @app.before_request
+        def _ensure_notification_listener():
+            NotificationService.ensure_listener()
+
+    @staticmethod
+    def _connect():
+        conn = psycopg2.connect(
+            **DatabaseManager._config, keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3
+        )
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(Config.CACHE_NOTIFY_CHANNEL)))
+        return conn
+
+    @staticmethod
+    def _listen_forever() -> None:
+        backoff = 1
+        while True:
+            conn = None
+            try:
+                conn = NotificationService._connect()
+                NotificationService._connected = True
+                backoff = 1
+                NotificationService._dispatch_flush()
+                logger.info(f"Listening for cache invalidations on '{Config.CACHE_NOTIFY_CHANNEL}' (pid {os.getpid()})")
+
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        NotificationService._dispatch(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener disconnected: {e}; retrying in {backoff}s")
+            finally:
+                NotificationService._connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            NotificationService._reconnects += 1
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    @staticmethod
+    def _callbacks(entity: str) -> List[Callable]:
+        with NotificationService._lock:
+            return list(NotificationService._subscribers.get(entity, []))
+
+    @staticmethod
+    def _dispatch(payload: str) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed invalidation payload: {payload}")
+            return
+        if message.get("origin") == NotificationService._origin:
+            return  # the writing worker already evicted locally
+
+        NotificationService._received += 1
+        for callback in NotificationService._callbacks(message.get("entity")):
+            try:
+                callback(message.get("key"))
+            except Exception as e:
+                logger.error(f"Invalidation callback for {message.get('entity')} failed: {e}")
+
+    @staticmethod
+    def _dispatch_flush() -> None:
+        with NotificationService._lock:
+            callbacks = [cb for cbs in NotificationService._subscribers.values() for cb in cbs]
+        for callback in callbacks:
+            try:
+                callback(None)
+            except Exception as e:
+                logger.error(f"Invalidation flush callback failed: {e}")
+
+    @staticmethod
+    def get_stats() -> Dict:
+        thread = NotificationService._thread
+        return {
+            "enabled": Config.CACHE_NOTIFY_ENABLED,
+            "listening": bool(thread and thread.is_alive() and NotificationService._connected),
+            "received": NotificationService._received,
+            "reconnects": NotificationService._reconnects,
+            "subscribed_entities": sorted(NotificationService._subscribers),
+        }
@@ -1,161 +1,410 @@
 """
 Pricing service for managing court pricing and dynamic price calculations.
 """
+import time
+import bisect
+import calendar
+import threading
 import logging
 from typing import List, Dict, Optional, Tuple
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from database import DatabaseManager
 from models import CourtPricing
 from config import Config
+from services.notification_service import NotificationService
+from utils.booking_utils import BookingUtils
+from utils.time_utils import TimeUtils
 
 logger = logging.getLogger(__name__)
 
+class PriceTable:
+    """What each slot of one court's grid costs, by slot number, on weekdays
+    and on weekend days (stored per-30-minute rates prorated to the slot)."""
+
+    __slots__ = ("slot_minutes", "weekday", "weekend")
+
+    def __init__(self, slot_minutes: int, weekday: Tuple[int, ...], weekend: Tuple[int, ...]):
+        self.slot_minutes = slot_minutes
+        self.weekday = weekday
+        self.weekend = weekend
+
+    def for_date(self, day: date) -> Tuple[int, ...]:
+        return self.weekend if day.weekday() in Config.WEEKEND_DAYS else self.weekday
+
+
+class PricingIndex:
+    """Which of a court's pricing versions applies on each date.
+
+    A version covers ``effective_from`` .. ``effective_until`` (inclusive,
+    open-ended when NULL). Where versions overlap, the one that starts
+    latest wins (then the newest), so a seasonal version overrides the
+    standing price and a new standing price supersedes the old one from
+    its start. The result is kept as sorted, non-overlapping segments and
+    looked up with a binary search.
+    """
+
+    __slots__ = ("starts", "versions")
+
+    def __init__(self, versions: List[CourtPricing]):
+        bounds = {date.min}
+        for version in versions:
+            if version.effective_from:
+                bounds.add(version.effective_from)
+            if version.effective_until and version.effective_until < date.max:
+                bounds.add(version.effective_until + timedelta(days=1))
+
+        self.starts: List[date] = []
+        self.versions: List[Optional[CourtPricing]] = []
+        for start in sorted(bounds):
+            covering = [
+                v for v in versions
+                if (v.effective_from or date.min) <= start and (v.effective_until is None or start <= v.effective_until)
+            ]
+            winner = max(covering, key=PricingIndex._precedence, default=None)
+            if self.versions and self.versions[-1] is winner:
+                continue
+            self.starts.append(start)
+            self.versions.append(winner)
+
+    @staticmethod
+    def _precedence(version: CourtPricing) -> tuple:
+        return version.effective_from or date.min, version.created_at or datetime.min, version.id or 0
+
+    def at(self, day: date) -> Optional[CourtPricing]:
+        return self.versions[bisect.bisect_right(self.starts, day) - 1]
+
+
+class PricingSnapshot:
+    """Active court pricing versions as of one ``cache_versions`` version of
+    "pricing", with a PricingIndex per court and a PriceTable per version."""
+
+    __slots__ = ("version", "pricing_list", "by_court", "tables", "checked_at")
+
+    def __init__(self, version: int, pricing_list: List[CourtPricing]):
+        self.version = version
+        self.pricing_list = pricing_list
+        versions_by_court: Dict[str, List[CourtPricing]] = {}
+        for pricing in pricing_list:
+            versions_by_court.setdefault(pricing.court_id, []).append(pricing)
+        self.by_court = {court_id: PricingIndex(versions) for court_id, versions in versions_by_court.items()}
+        self.tables = {pricing.id: PricingService.compile_price_table(pricing) for pricing in pricing_list}
+        self.checked_at = time.monotonic()
+
+    def needs_check(self, notified_version: int = 0) -> bool:
+        if self.version < notified_version:
+            return True
+        return time.monotonic() - self.checked_at >= Config.PRICING_VERSION_CHECK_SECONDS
+
+
 class PricingService:
-    """Service for managing court pricing and price calculations"""
+    """Service for managing court pricing and price calculations.
+    
+    Reads are served from a per-worker snapshot of ``court_pricing``; writes
+    bump the "pricing" version in ``cache_versions`` and notify the other
+    workers, which reload on their next read.
+    """
+    
+    CACHE_NAME = "pricing"
+    _snapshot: Optional[PricingSnapshot] = None
+    _load_lock = threading.Lock()
+    # Highest version announced by another worker
+    _notified_version = 0
+    _hits = 0
+    _reloads = 0
+    
+    # slot_minutes -> pricing window of every slot on that grid
+    _bands: Dict[int, Tuple[Optional[str], ...]] = {}
+    
+    @staticmethod
+    def _minute_of_day(time_str: str) -> int:
+        hour, minute = map(int, time_str.split(':'))
+        return hour * 60 + minute
+    
+    @staticmethod
+    def _in_window(minute: int, window: Tuple[str, str]) -> bool:
+        start, end = (PricingService._minute_of_day(t) for t in window)
+        if start <= end:
+            return start <= minute < end
+        return minute >= start or minute < end  # runs past midnight
+    
+    @staticmethod
+    def slot_bands(slot_minutes: int = None) -> Tuple[Optional[str], ...]:
+        """Config.PRICING_WINDOWS name ("peak", "off_peak") or None for each slot of a grid"""
+        grid = TimeUtils.slot_grid(slot_minutes)
+        bands = PricingService._bands.get(grid.minutes)
+        if bands is None:
+            bands = tuple(
+                next((
+                    band for band, windows in Config.PRICING_WINDOWS.items()
+                    if any(PricingService._in_window(PricingService._minute_of_day(t), w) for w in windows)
+                ), None)
+                for t in grid.times
+            )
+            PricingService._bands[grid.minutes] = bands
+        return bands
+    
+    @staticmethod
+    def compile_price_table(pricing: CourtPricing) -> PriceTable:
+        """Price per slot of a court's grid: its window's rate if set, else the base price"""
+        slot_minutes = BookingUtils.get_slot_minutes(pricing.court_id)
+        prorate = lambda rate: rate * slot_minutes // TimeUtils.SLOT_MINUTES
+        rates = {"peak": pricing.peak_price, "off_peak": pricing.off_peak_price}
+        weekday = tuple(
+            prorate(rates.get(band) or pricing.base_price) for band in PricingService.slot_bands(slot_minutes)
+        )
+        weekend = (prorate(pricing.weekend_price),) * len(weekday) if pricing.weekend_price else weekday
+        return PriceTable(slot_minutes, weekday, weekend)
+    
+    @staticmethod
+    def get_timing_info() -> Dict[str, str]:
+        """Customer-facing description of PRICING_WINDOWS and WEEKEND_DAYS"""
+        info = {
+            f"{band}_hours": " & ".join(
+                f"{TimeUtils.format_time_12hr(start)} - {TimeUtils.format_time_12hr(end)}" for start, end in windows
+            )
+            for band, windows in Config.PRICING_WINDOWS.items()
+        }
+        days = " & ".join(calendar.day_name[day] for day in sorted(Config.WEEKEND_DAYS))
+        info["weekend"] = f"{days} (All Day)"
+        return info
+    
+    @staticmethod
+    def _row_to_pricing(row: Dict) -> CourtPricing:
+        return CourtPricing(
+            id=row['id'],
+            court_id=row['court_id'],
+            court_name=row['court_name'],
+            sport=row['sport'],
+            base_price=row['base_price'],
+            peak_price=row['peak_price'],
+            off_peak_price=row['off_peak_price'],
+            weekend_price=row['weekend_price'],
+            is_active=row['is_active'],
+            effective_from=row['effective_from'],
+            effective_until=row['effective_until'],
+            created_at=row['created_at'],
+            updated_at=row['updated_at']
+        )
+    
+    @staticmethod
+    def _current_version() -> Optional[int]:
+        result = DatabaseManager.execute_query(
+            "SELECT COALESCE(MAX(version), 0) AS version FROM cache_versions WHERE name = %s",
+            (PricingService.CACHE_NAME,), fetch_one=True
+        )
+        return int(result['version']) if result else None
+    
+    @staticmethod
+    def _load_snapshot(version: int) -> Optional[PricingSnapshot]:
+        # Read after the version, so the rows are at least that new
+        results = DatabaseManager.execute_query("""
+            SELECT * FROM court_pricing 
+            WHERE is_active = TRUE
+            ORDER BY sport, court_id, effective_from NULLS FIRST, created_at
+        """)
+        if results is None:
+            return None
+        pricing_list = [PricingService._row_to_pricing(row) for row in results]
+        logger.info(f"Loaded pricing snapshot v{version}: {len(pricing_list)} configurations")
+        return PricingSnapshot(version, pricing_list)
+    
+    @staticmethod
+    def _get_snapshot() -> Optional[PricingSnapshot]:
+        """This worker's pricing snapshot, reloaded only when the stored version moved.
+        
+        The version is re-read at most every PRICING_VERSION_CHECK_SECONDS as a
+        safety net for missed notifications. Returns the last snapshot (or
+        None) if the database is unreachable.
+        """
+        snapshot = PricingService._snapshot
+        if snapshot is not None and not snapshot.needs_check(PricingService._notified_version):
+            PricingService._hits += 1
+            return snapshot
+        
+        with PricingService._load_lock:
+            snapshot = PricingService._snapshot
+            if snapshot is not None and not snapshot.needs_check(PricingService._notified_version):
+                PricingService._hits += 1
+                return snapshot
+            try:
+                version = PricingService._current_version()
+                if version is None:
+                    return snapshot
+                if snapshot is not None and snapshot.version == version:
+                    snapshot.checked_at = time.monotonic()
+                    PricingService._hits += 1
+                    return snapshot
+                loaded = PricingService._load_snapshot(version)
+                if loaded is None:
+                    return snapshot
+                PricingService._reloads += 1
+                PricingService._snapshot = loaded
+                return loaded
+            except Exception as e:
+                logger.error(f"Error loading pricing snapshot: {e}")
+                return snapshot
     
     @staticmethod
     def get_all_pricing() -> List[CourtPricing]:
-        """Get all court pricing configurations"""
-        try:
-            query = """
-                SELECT * FROM court_pricing 
-                WHERE is_active = TRUE
-                ORDER BY sport, court_id
-            """
-            
-            results = DatabaseManager.execute_query(query)
-            
-            if results:
-                pricing_list = []
-                for row in results:
-                    pricing = CourtPricing(
-                        id=row['id'],
-                        court_id=row['court_id'],
-                        court_name=row['court_name'],
-                        sport=row['sport'],
-                        base_price=row['base_price'],
-                        peak_price=row['peak_price'],
-                        off_peak_price=row['off_peak_price'],
-                        weekend_price=row['weekend_price'],
-                        is_active=row['is_active'],
-                        effective_from=row['effective_from'],
-                        effective_until=row['effective_until'],
-                        created_at=row['created_at'],
-                        updated_at=row['updated_at']
-                    )
-                    pricing_list.append(pricing)
-                
-                logger.info(f"Retrieved {len(pricing_list)} pricing configurations")
-                return pricing_list
-            else:
-                return []
-                
-        except Exception as e:
-            logger.error(f"Error getting all pricing: {e}")
+        """Get all court pricing configurations (every active version)"""
+        snapshot = PricingService._get_snapshot()
+        return list(snapshot.pricing_list) if snapshot else []
+    
+    @staticmethod
+    def get_current_pricing(on: date = None) -> List[CourtPricing]:
+        """The pricing version each court has in effect on a date (default today)"""
+        snapshot = PricingService._get_snapshot()
+        if not snapshot:
             return []
+        on = on or date.today()
+        current = [index.at(on) for index in snapshot.by_court.values()]
+        return sorted((p for p in current if p), key=lambda p: (p.sport, p.court_id))
     
     @staticmethod
-    def get_pricing_by_court(court_id: str) -> Optional[CourtPricing]:
-        """Get pricing configuration for a specific court"""
-        try:
-            query = """
-                SELECT * FROM court_pricing 
-                WHERE court_id = %s AND is_active = TRUE
-                ORDER BY created_at DESC
-                LIMIT 1
-            """
-            
-            result = DatabaseManager.execute_query(query, (court_id,), fetch_one=True)
-            
-            if result:
-                return CourtPricing(
-                    id=result['id'],
-                    court_id=result['court_id'],
-                    court_name=result['court_name'],
-                    sport=result['sport'],
-                    base_price=result['base_price'],
-                    peak_price=result['peak_price'],
-                    off_peak_price=result['off_peak_price'],
-                    weekend_price=result['weekend_price'],
-                    is_active=result['is_active'],
-                    effective_from=result['effective_from'],
-                    effective_until=result['effective_until'],
-                    created_at=result['created_at'],
-                    updated_at=result['updated_at']
-                )
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error getting pricing for court {court_id}: {e}")
+    def get_pricing_by_court(court_id: str, on: date = None) -> Optional[CourtPricing]:
+        """Get the pricing version in effect for a court on a date (default today)"""
+        snapshot = PricingService._get_snapshot()
+        index = snapshot.by_court.get(court_id) if snapshot else None
+        return index.at(on or date.today()) if index else None
+    
+    @staticmethod
+    def _bump_version() -> None:
+        """Invalidate every worker's snapshot once the current pricing write commits"""
+        result = DatabaseManager.execute_query("""
+            INSERT INTO cache_versions (name, version) VALUES (%s, 1)
+            ON CONFLICT (name) DO UPDATE
+            SET version = cache_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+            RETURNING version
+        """, (PricingService.CACHE_NAME,), fetch_one=True, raise_errors=True)
+        PricingService._drop_snapshot()
+        DatabaseManager.after_transaction(PricingService._drop_snapshot)
+        NotificationService.publish(PricingService.CACHE_NAME, int(result['version']))
+    
+    @staticmethod
+    def _drop_snapshot() -> None:
+        PricingService._snapshot = None
+    
+    @staticmethod
+    def _on_notification(version) -> None:
+        if version is not None:
+            # Also catches a load that started before this commit and finishes after it
+            PricingService._notified_version = max(PricingService._notified_version, int(version))
+        PricingService._drop_snapshot()
+    
+    @staticmethod
+    def get_stats() -> Dict:
+        """Snapshot counters for this worker"""
+        snapshot = PricingService._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "configurations": len(snapshot.pricing_list) if snapshot else 0,
+            "hits": PricingService._hits,
+            "reloads": PricingService._reloads,
+            "check_seconds": Config.PRICING_VERSION_CHECK_SECONDS,
+        }
+    
+    @staticmethod
+    def _parse_date(value) -> Optional[date]:
+        if not value:
             return None
+        return value if isinstance(value, date) else datetime.strptime(str(value), "%Y-%m-%d").date()
     
     @staticmethod
     def create_or_update_pricing(pricing_data: Dict) -> Tuple[bool, str]:
-        """Create or update court pricing"""
+        """Create or update an effective-dated pricing version of a court.
+        
+        With ``id`` the given version is corrected in place. Otherwise the
+        version with the same effective_from/effective_until is updated, or
+        a new one is added. Without effective_from a court that already has
+        pricing gets a new version from today, so earlier dates keep the
+        prices they were booked at.
+        """
         try:
             court_id = pricing_data.get('court_id')
             if not court_id:
                 return False, "Court ID is required"
             
-            # Check if pricing already exists
-            existing = PricingService.get_pricing_by_court(court_id)
+            effective_from = PricingService._parse_date(pricing_data.get('effective_from'))
+            effective_until = PricingService._parse_date(pricing_data.get('effective_until'))
+            if effective_from and effective_until and effective_until < effective_from:
+                return False, "Effective until must not be before effective from"
+            
+            # Look up versions in the database, not the snapshot
+            if pricing_data.get('id'):
+                existing = DatabaseManager.execute_query(
+                    "SELECT id FROM court_pricing WHERE id = %s AND court_id = %s AND is_active = TRUE",
+                    (int(pricing_data['id']), court_id), fetch_one=True
+                )
+                if not existing:
+                    return False, "Pricing version not found"
+            else:
+                if effective_from is None and DatabaseManager.execute_query(
+                    "SELECT id FROM court_pricing WHERE court_id = %s AND is_active = TRUE LIMIT 1",
+                    (court_id,), fetch_one=True
+                ):
+                    effective_from = date.today()
+                existing = DatabaseManager.execute_query("""
+                    SELECT id FROM court_pricing
+                    WHERE court_id = %s AND is_active = TRUE
+                    AND effective_from IS NOT DISTINCT FROM %s AND effective_until IS NOT DISTINCT FROM %s
+                    ORDER BY created_at DESC
+                    LIMIT 1
+                """, (court_id, effective_from, effective_until), fetch_one=True)
+            
+            prices = (
+                pricing_data.get('court_name'),
+                pricing_data.get('sport'),
+                int(pricing_data.get('base_price', 0)),
+                int(pricing_data.get('peak_price')) if pricing_data.get('peak_price') else None,
+                int(pricing_data.get('off_peak_price')) if pricing_data.get('off_peak_price') else None,
+                int(pricing_data.get('weekend_price')) if pricing_data.get('weekend_price') else None,
+                effective_from,
+                effective_until,
+            )
             
             if existing:
-                # Update existing pricing
+                # Update existing pricing version
                 update_query = """
                     UPDATE court_pricing 
                     SET court_name = %s, sport = %s, base_price = %s, 
                         peak_price = %s, off_peak_price = %s, weekend_price = %s,
                         effective_from = %s, effective_until = %s,
                         updated_at = CURRENT_TIMESTAMP
-                    WHERE court_id = %s AND is_active = TRUE
+                    WHERE id = %s
                 """
                 
-                params = (
-                    pricing_data.get('court_name'),
-                    pricing_data.get('sport'),
-                    int(pricing_data.get('base_price', 0)),
-                    int(pricing_data.get('peak_price')) if pricing_data.get('peak_price') else None,
-                    int(pricing_data.get('off_peak_price')) if pricing_data.get('off_peak_price') else None,
-                    int(pricing_data.get('weekend_price')) if pricing_data.get('weekend_price') else None,
-                    pricing_data.get('effective_from'),
-                    pricing_data.get('effective_until'),
-                    court_id
-                )
-                
-                result = DatabaseManager.execute_query(update_query, params, fetch_all=False)
+                # The write and the version bump commit (or roll back) together
+                with DatabaseManager.transaction():
+                    result = DatabaseManager.execute_query(
+                        update_query, prices + (existing['id'],), fetch_all=False, raise_errors=True
+                    )
+                    PricingService._bump_version()
                 
                 if result is not None:
-                    logger.info(f"Updated pricing for court {court_id}")
+                    logger.info(f"Updated pricing version {existing['id']} for court {court_id}")
                     return True, f"Pricing updated for {court_id}"
                 else:
                     return False, "Failed to update pricing"
             
             else:
-                # Create new pricing
+                # Create new pricing version
                 insert_query = """
                     INSERT INTO court_pricing 
-                    (court_id, court_name, sport, base_price, peak_price, off_peak_price, 
-                     weekend_price, effective_from, effective_until)
+                    (court_name, sport, base_price, peak_price, off_peak_price, 
+                     weekend_price, effective_from, effective_until, court_id)
                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """
                 
-                params = (
-                    court_id,
-                    pricing_data.get('court_name'),
-                    pricing_data.get('sport'),
-                    int(pricing_data.get('base_price', 0)),
-                    int(pricing_data.get('peak_price')) if pricing_data.get('peak_price') else None,
-                    int(pricing_data.get('off_peak_price')) if pricing_data.get('off_peak_price') else None,
-                    int(pricing_data.get('weekend_price')) if pricing_data.get('weekend_price') else None,
-                    pricing_data.get('effective_from'),
-                    pricing_data.get('effective_until')
-                )
-                
-                result = DatabaseManager.execute_query(insert_query, params, fetch_all=False)
+                with DatabaseManager.transaction():
+                    result = DatabaseManager.execute_query(
+                        insert_query, prices + (court_id,), fetch_all=False, raise_errors=True
+                    )
+                    PricingService._bump_version()
                 
                 if result is not None:
-                    logger.info(f"Created pricing for court {court_id}")
+                    logger.info(f"Created pricing for court {court_id} effective {effective_from or 'always'}")
+                    if effective_from:
+                        return True, f"Pricing for {court_id} takes effect {effective_from.isoformat()}"
                     return True, f"Pricing created for {court_id}"
                 else:
                     return False, "Failed to create pricing"
@@ -165,19 +414,24 @@ class PricingService:
             return False, f"Error: {str(e)}"
     
     @staticmethod
-    def delete_pricing(court_id: str) -> Tuple[bool, str]:
-        """Delete (deactivate) pricing for a court"""
+    def delete_pricing(court_id: str, pricing_id: int = None) -> Tuple[bool, str]:
+        """Delete (deactivate) one pricing version of a court, or all of them"""
         try:
             query = """
                 UPDATE court_pricing 
                 SET is_active = FALSE, updated_at = CURRENT_TIMESTAMP
-                WHERE court_id = %s AND is_active = TRUE
+                WHERE court_id = %s AND is_active = TRUE AND (%s::int IS NULL OR id = %s::int)
             """
             
-            result = DatabaseManager.execute_query(query, (court_id,), fetch_all=False)
+            with DatabaseManager.transaction():
+                result = DatabaseManager.execute_query(
+                    query, (court_id, pricing_id, pricing_id), fetch_all=False, raise_errors=True
+                )
+                if result:
+                    PricingService._bump_version()
             
             if result is not None and result > 0:
-                logger.info(f"Deactivated pricing for court {court_id}")
+                logger.info(f"Deactivated {result} pricing version(s) for court {court_id}")
                 return True, f"Pricing removed for {court_id}"
             else:
                 return False, "No active pricing found to remove"
@@ -187,52 +441,58 @@ class PricingService:
             return False, f"Error: {str(e)}"
     
     @staticmethod
-    def calculate_price(court_id: str, booking_date: date, time_slots: List[str]) -> int:
-        """Calculate price for booking based on court, date, and time slots"""
+    def get_slot_prices(court_id: str, booking_date: date) -> Tuple[int, ...]:
+        """What each slot of the court's grid costs on a workday, indexed by slot number.
+        
+        Uses the pricing version in effect on that date (past dates are priced
+        as they were then); courts without one get the fallback price.
+        """
+        snapshot = PricingService._get_snapshot()
+        index = snapshot.by_court.get(court_id) if snapshot else None
+        pricing = index.at(booking_date) if index else None
+        if pricing:
+            return snapshot.tables[pricing.id].for_date(booking_date)
+        # Fallback to hardcoded pricing if not found in database
+        return (PricingService._get_fallback_pricing(court_id, 1),) * BookingUtils.get_slot_grid(court_id).count
+    
+    @staticmethod
+    def calculate_price(court_id: str, booking_date: date, time_slots: List) -> int:
+        """Calculate price for booking based on court, date, and time slots ('HH:mm' or slot numbers).
+        
+        Prices are per 30 minutes; slots on a 15-minute court cost half.
+        """
         try:
-            pricing = PricingService.get_pricing_by_court(court_id)
-            
-            if not pricing:
-                # Fallback to hardcoded pricing if not found in database
-                return PricingService._get_fallback_pricing(court_id, len(time_slots))
+            slot_indexes = BookingUtils.get_slot_grid(court_id).to_indexes(time_slots)
+            prices = PricingService.get_slot_prices(court_id, booking_date)
+            total_price = sum(map(prices.__getitem__, slot_indexes))
             
-            # Check if booking date is within effective period
-            today = date.today()
-            if pricing.effective_from and booking_date < pricing.effective_from:
-                return PricingService._get_fallback_pricing(court_id, len(time_slots))
-            if pricing.effective_until and booking_date > pricing.effective_until:
-                return PricingService._get_fallback_pricing(court_id, len(time_slots))
-            
-            # Determine pricing based on day and time
-            is_weekend = booking_date.weekday() >= 5  # Saturday = 5, Sunday = 6
-            
-            total_price = 0
-            for time_slot in time_slots:
-                slot_price = pricing.base_price
-                
-                # Apply weekend pricing if available
-                if is_weekend and pricing.weekend_price:
-                    slot_price = pricing.weekend_price
-                else:
-                    # Check for peak/off-peak pricing
-                    hour = int(time_slot.split(':')[0])
-                    
-                    # Peak hours: 5 PM - 2 AM (17:00 - 02:00 next day)
-                    if ((hour >= 17) or (hour < 2)) and pricing.peak_price:
-                        slot_price = pricing.peak_price
-                    # Off-peak hours: 2 PM - 5 PM (14:00 - 17:00) and 2 AM - 6 AM (02:00 - 06:00)
-                    elif ((14 <= hour < 17) or (2 <= hour < 6)) and pricing.off_peak_price:
-                        slot_price = pricing.off_peak_price
-                
-                total_price += slot_price
-            
-            logger.info(f"Calculated price for {court_id}: {total_price} PKR for {len(time_slots)} slots")
+            logger.info(f"Calculated price for {court_id}: {total_price} PKR for {len(slot_indexes)} slots")
             return total_price
             
         except Exception as e:
             logger.error(f"Error calculating price: {e}")
             return PricingService._get_fallback_pricing(court_id, len(time_slots))
     
+    @staticmethod
+    def get_price_matrix(court_ids: List[str], booking_date: date) -> Dict[str, Dict]:
+        """Price of every bookable slot per court on a workday.
+        
+        ``{court: {"slotMinutes": n, "prices": {"HH:mm": price}}}``; a
+        selection costs the sum of its slots' prices, as in calculate_price.
+        """
+        from services.availability_service import AvailabilityService
+        
+        matrix = {}
+        for court_id in court_ids:
+            grid = BookingUtils.get_slot_grid(court_id)
+            prices = PricingService.get_slot_prices(court_id, booking_date)
+            open_mask = AvailabilityService.open_mask(grid.minutes)
+            matrix[court_id] = {
+                "slotMinutes": grid.minutes,
+                "prices": {grid.times[i]: prices[i] for i in range(grid.count) if open_mask >> i & 1},
+            }
+        return matrix
+    
     @staticmethod
     def _get_fallback_pricing(court_id: str, slot_count: int) -> int:
         """Fallback pricing when database pricing is not available"""
@@ -247,7 +507,7 @@ class PricingService:
         }
         
         base_price = fallback_prices.get(court_id, 3000)  # Default 3000 if not found
-        return base_price * slot_count
+        return base_price * slot_count * BookingUtils.get_slot_minutes(court_id) // TimeUtils.SLOT_MINUTES
     
     @staticmethod
     def initialize_default_pricing() -> bool:
@@ -306,3 +566,6 @@ class PricingService:
         except Exception as e:
             logger.error(f"Error initializing default pricing: {e}")
             return False
+
+
+NotificationService.subscribe(PricingService.CACHE_NAME, PricingService._on_notification)
@@ -363,12 +363,14 @@ class PromoService:
     
     @staticmethod
     def increment_usage_count(code: str) -> bool:
-        """Increment the usage count for a promo code"""
+        """Increment the usage count for a promo code (False once its usage limit is reached)"""
         try:
+            # The row lock serializes concurrent redemptions, so the limit holds
             query = """
                 UPDATE promo_codes 
                 SET usage_count = usage_count + 1, updated_at = CURRENT_TIMESTAMP
                 WHERE UPPER(code) = UPPER(%s)
+                AND (usage_limit IS NULL OR usage_limit = 0 OR usage_count < usage_limit)
             """
             
             result = DatabaseManager.execute_query(query, (code,), fetch_all=False)
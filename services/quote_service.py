@@ -0,0 +1,159 @@
+"""
+Quote service: availability, price and promo for a checkout in one signed quote.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+
+from config import Config
+from services.booking_service import BookingService, BookingConflictError
+from services.promo_service import PromoService
+from utils.booking_utils import BookingUtils
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteError(ValueError):
+    """Raised when a quote token is invalid, expired or for a different selection"""
+
+
+class QuoteService:
+    """Short-lived, signed price quotes for a court, workday and slots.
+
+    ``create_quote`` checks availability, prices the slots and applies the
+    promo code in one pass. ``BookingService.create_booking`` redeems the
+    token in place of trusting client amounts; it still re-checks and claims
+    the slots under the workday lock and re-validates the promo.
+
+    An "any court" quote prices the court that would be assigned now; if the
+    booking ends up on a different court it is re-priced for that court.
+    """
+
+    SALT = "booking-quote"
+
+    @staticmethod
+    def _serializer() -> URLSafeTimedSerializer:
+        return URLSafeTimedSerializer(Config.SECRET_KEY, salt=QuoteService.SALT)
+
+    @staticmethod
+    def price_selection(court_id: str, date: str, slot_times: List[str],
+                        promo_code: str = "") -> Tuple[int, int, str, Optional[Dict]]:
+        """Server-side price of a selection: (original, discount, applied promo code, promo info).
+
+        The promo's sport is the court's sport. An invalid code is reported in
+        the promo info and priced without a discount.
+        """
+        original_amount = BookingService.calculate_booking_price(court_id, date, slot_times)
+        promo_code = (promo_code or "").strip().upper()
+        if not promo_code:
+            return original_amount, 0, "", None
+
+        applied, message, discount_amount, _ = PromoService.apply_promo_code(
+            promo_code, original_amount, BookingUtils.get_sport_from_court(court_id)
+        )
+        promo = {"code": promo_code, "applied": applied, "message": message}
+        if not applied:
+            return original_amount, 0, "", promo
+        return original_amount, discount_amount, promo_code, promo
+
+    @staticmethod
+    def create_quote(court_id: str, date: str, slot_times: List[str], sport: str = None,
+                     promo_code: str = "", hold_token: str = None) -> Dict:
+        """Quote a selection; ``quoteToken`` is only issued if every slot is free.
+
+        ``court_id`` may be "any" together with ``sport``. Slots held under
+        ``hold_token`` count as free.
+        """
+        slot_times = sorted(set(slot_times))
+        requested_court = court_id
+        if court_id in (None, "", "any"):
+            requested_court = "any"
+            if sport not in Config.COURT_CONFIG:
+                raise ValueError("A sport is required to quote any court")
+            try:
+                # Unlocked preview: create_booking locks and re-assigns at redemption
+                court_id = BookingService.assign_court(sport, date, slot_times, hold_token, lock=False)
+                available, conflicts = True, []
+            except BookingConflictError as conflict:
+                court_id = next(iter(BookingService.get_assignable_courts(sport)), None)
+                if court_id is None:
+                    raise ValueError("This sport can only be booked by phone")
+                available, conflicts = False, conflict.conflicts
+        else:
+            if BookingUtils.is_phone_only(court_id):
+                raise ValueError("This court can only be booked by phone")
+            available, conflicts = BookingService.check_slot_availability(
+                court_id, date, slot_times, hold_token
+            )
+
+        original_amount, discount_amount, applied_code, promo = QuoteService.price_selection(
+            court_id, date, slot_times, promo_code
+        )
+        quote = {
+            "available": available,
+            "conflicts": conflicts,
+            "court": court_id,
+            "courtName": BookingUtils.get_court_name(court_id),
+            "originalAmount": original_amount,
+            "discountAmount": discount_amount,
+            "totalAmount": original_amount - discount_amount,
+            "promo": promo,
+        }
+        if available:
+            quote["quoteToken"] = QuoteService._serializer().dumps({
+                "court": requested_court,
+                "pricedCourt": court_id,
+                "date": date,
+                "slots": slot_times,
+                "original": original_amount,
+                "discount": discount_amount,
+                "promo": applied_code,
+            })
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=Config.QUOTE_TTL_SECONDS)
+            quote["expiresAt"] = expires_at.isoformat()
+            quote["ttlSeconds"] = Config.QUOTE_TTL_SECONDS
+        logger.info(f"Quoted {court_id} {date} {len(slot_times)} slots: {quote['totalAmount']} PKR, available={available}")
+        return quote
+
+    @staticmethod
+    def verify_quote(token: str, court_id: str, date: str, slot_times: List[str]) -> Dict:
+        """The signed quote for this exact selection ("any" for any court); raises QuoteError otherwise"""
+        try:
+            quote = QuoteService._serializer().loads(token, max_age=Config.QUOTE_TTL_SECONDS)
+        except SignatureExpired:
+            raise QuoteError("Your price quote has expired; please review your booking again")
+        except BadSignature:
+            raise QuoteError("Invalid price quote")
+
+        if (quote.get("court"), quote.get("date"), quote.get("slots")) != (court_id, date, sorted(set(slot_times))):
+            raise QuoteError("The price quote does not match the selected court, date and slots")
+        return quote
+
+    @staticmethod
+    def redeem_quote(token: str, requested_court: str, court_id: str, date: str,
+                     slot_times: List[str]) -> Tuple[int, int, str]:
+        """(original, discount, promo code) to book a quote on ``court_id``.
+
+        Runs inside the booking transaction. The quoted promo must still be
+        valid; a booking assigned to another court than the one quoted is
+        re-priced for its court.
+        """
+        quote = QuoteService.verify_quote(token, requested_court, date, slot_times)
+        if quote["pricedCourt"] != court_id:
+            original_amount, discount_amount, promo_code, promo = QuoteService.price_selection(
+                court_id, date, slot_times, quote["promo"]
+            )
+            if quote["promo"] and not promo_code:
+                raise QuoteError(f"Promo code {quote['promo']} can no longer be applied: {promo['message']}")
+            logger.info(f"Re-priced quote for {court_id} (quoted {quote['pricedCourt']}): {original_amount - discount_amount} PKR")
+            return original_amount, discount_amount, promo_code
+
+        if quote["promo"]:
+            is_valid, message, _ = PromoService.validate_promo_code(
+                quote["promo"], quote["original"], BookingUtils.get_sport_from_court(court_id)
+            )
+            if not is_valid:
+                raise QuoteError(f"Promo code {quote['promo']} can no longer be applied: {message}")
+        return quote["original"], quote["discount"], quote["promo"]
@@ -1,123 +1,94 @@
 """
 Schedule service for managing court schedules and availability.
 """
-import json
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 import logging
 
 from database import DatabaseManager
 from config import Config
+from utils.booking_utils import BookingUtils
+from utils.time_utils import TimeUtils
 
 logger = logging.getLogger(__name__)
 
 class ScheduleService:
     """Professional schedule service for court availability management"""
     
+    # Delta cursors older than this fall back to a full schedule reload
+    CHANGE_RETENTION_SECONDS = 6 * 3600
+    
     @staticmethod
     def get_schedule_data(start_date: str, end_date: str, sport_filter: str = None) -> Dict:
         """Get comprehensive schedule data for date range"""
         try:
             logger.info(f"Fetching schedule: {start_date} to {end_date}, sport: {sport_filter}")
-
-            # Rage Room is phone-only with 15-minute slots; keep it off the 30-minute grid
-            if sport_filter == "rage_room":
-                return {}
-            
-            schedule = {}
             
-            # Get courts based on filter
-            if sport_filter and sport_filter in Config.COURT_CONFIG:
-                courts = Config.COURT_CONFIG[sport_filter]
-                logger.info(f"Filtering by sport '{sport_filter}': {len(courts)} courts")
-            else:
-                courts = []
-                for sport in ["padel", "cricket", "futsal", "pickleball"]:
-                    courts.extend(Config.COURT_CONFIG[sport])
-                logger.info(f"All sports: {len(courts)} total courts")
+            court_ids = ScheduleService._get_schedule_court_ids(sport_filter)
             
-            # Process each date in range
+            # Empty grid for every date and court in range
+            schedule = {}
             current_date = datetime.strptime(start_date, "%Y-%m-%d")
             end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
-            
             while current_date <= end_date_obj:
-                date_str = current_date.strftime("%Y-%m-%d")
-                schedule[date_str] = {}
-                
-                # Process each court
-                for court in courts:
-                    court_id = court["id"]
-                    schedule[date_str][court_id] = {}
-                    
-                    # Get bookings for this court and date
-                    bookings = ScheduleService._get_court_bookings(court_id, date_str)
+                schedule[current_date.strftime("%Y-%m-%d")] = {court_id: {} for court_id in court_ids}
+                current_date += timedelta(days=1)
+            if not schedule:
+                return schedule
+            
+            # Booking slots land on their own court first, then multi-purpose
+            # projections from sibling courts, then blocks (later layers win)
+            direct = {}
+            projected = {}
+            for booking in ScheduleService._get_range_bookings(court_ids, start_date, end_date):
+                try:
+                    date_str = booking["booking_date"].isoformat()
+                    booking_court = booking.get("court")
                     
-                    # Process each booking
-                    for booking in bookings:
-                        try:
-                            slots = booking.get("selected_slots", [])
-                            
-                            # Handle both JSON string and parsed data
-                            if isinstance(slots, str):
-                                try:
-                                    slots = json.loads(slots)
-                                except json.JSONDecodeError:
-                                    logger.error(f"Invalid JSON in selected_slots for booking {booking.get('id')}")
-                                    continue
-                            
-                            for slot in slots:
-                                if isinstance(slot, dict) and "time" in slot:
-                                    slot_time = slot["time"]
-                                    
-                                    # Check if this is a multi-purpose court conflict
-                                    is_conflict = ScheduleService._is_multi_purpose_conflict(
-                                        court_id, booking.get("court"), slot_time, date_str
-                                    )
-                                    
-                                    # Create slot data with promo code information and both comment types
-                                    slot_data = {
-                                        "status": "booked-conflict" if is_conflict else ScheduleService._get_booking_status(booking),
-                                        "title": booking.get("player_name", "Booked"),
-                                        "subtitle": f"PKR {booking.get('total_amount', 0):,}" + (" - Multi Court" if is_conflict else ""),
-                                        "bookingId": booking.get("id"),
-                                        "playerName": booking.get("player_name"),
-                                        "playerPhone": booking.get("player_phone"),
-                                        "amount": booking.get("total_amount"),
-                                        "duration": booking.get("duration"),
-                                        "originalCourt": booking.get("court") if is_conflict else court_id,
-                                        "customerComments": booking.get("special_requests", ""),  # Customer requests
-                                        "adminComments": booking.get("admin_comments", ""),       # Admin comments
-                                        "comments": booking.get("special_requests", ""),         # Legacy field for compatibility
-                                        "promoCode": booking.get("promo_code"),
-                                        "discountAmount": booking.get("discount_amount", 0),
-                                        "originalAmount": booking.get("original_amount"),
-                                    }
-                                    
-                                    schedule[date_str][court_id][slot_time] = slot_data
-                        
-                        except Exception as e:
-                            logger.error(f"Error processing booking {booking.get('id', 'unknown')}: {e}")
-                            continue
+                    targets = []
+                    if booking_court in schedule[date_str]:
+                        targets.append((direct, booking_court, False))
+                    if (booking.get("sport") == "pickleball" and booking_court != "pickleball-1"
+                            and "pickleball-1" in schedule[date_str]):
+                        targets.append((direct, "pickleball-1", False))
+                    for sibling in BookingUtils.get_conflicting_courts(booking_court):
+                        if sibling in schedule[date_str]:
+                            targets.append((projected, sibling, True))
+                    if not targets:
+                        continue
                     
-                    # Add blocked slots for this court and date
-                    blocked_slots = ScheduleService._get_blocked_slots(court_id, date_str)
-                    for blocked_slot in blocked_slots:
-                        slot_time = blocked_slot["time_slot"]
-                        
-                        # Create blocked slot data
-                        slot_data = {
-                            "status": "blocked",
-                            "title": "Blocked",
-                            "subtitle": blocked_slot["reason"],
-                            "blockReason": blocked_slot["reason"],
-                            "isBlocked": True,
-                            "blocked_by": blocked_slot.get("blocked_by", "admin"),
-                            "created_at": blocked_slot.get("created_at")
-                        }
-                        
-                        schedule[date_str][court_id][slot_time] = slot_data
+                    # Cells are keyed by the slot times of the booking's court grid
+                    # (courts sharing a resource share its grid)
+                    grid = BookingUtils.get_slot_grid(booking_court)
+                    slot_times = [
+                        grid.index_to_time(i)
+                        for i in TimeUtils.mask_to_slot_indexes(int(booking.get("slot_mask") or 0))
+                    ]
+                    for layer, court_id, is_conflict in targets:
+                        slot_data = ScheduleService._booking_slot_data(booking, court_id, is_conflict)
+                        cell = layer.setdefault((date_str, court_id), {})
+                        for slot_time in slot_times:
+                            cell[slot_time] = slot_data
                 
-                current_date += timedelta(days=1)
+                except Exception as e:
+                    logger.error(f"Error processing booking {booking.get('id', 'unknown')}: {e}")
+                    continue
+            
+            for layer in (direct, projected):
+                for (date_str, court_id), slots in layer.items():
+                    schedule[date_str][court_id].update(slots)
+            
+            for blocked_slot in ScheduleService._get_range_blocked_slots(court_ids, start_date, end_date):
+                schedule[blocked_slot["date"]][blocked_slot["court"]][blocked_slot["time_slot"]] = {
+                    "status": "blocked",
+                    "title": "Blocked",
+                    "subtitle": blocked_slot["reason"],
+                    "blockReason": blocked_slot["reason"],
+                    "isBlocked": True,
+                    "blocked_by": blocked_slot.get("blocked_by", "admin"),
+                    "created_at": blocked_slot.get("created_at")
+                }
             
             logger.info("Schedule data prepared successfully")
             return schedule
@@ -127,96 +98,152 @@ class ScheduleService:
             return {}
     
     @staticmethod
-    def _get_court_bookings(court_id: str, date: str) -> List[Dict]:
-        """Get all bookings affecting a specific court on a date"""
-        try:
-            # Direct bookings for this court - including promo code data and comments
-            base_fields = """
-                id, sport, court, court_name, booking_date, start_time, end_time,
-                duration, selected_slots, player_name, player_phone, player_email,
-                player_count, special_requests, payment_type, total_amount, status,
-                payment_verified, created_at, confirmed_at, cancelled_at,
-                promo_code, discount_amount, original_amount, admin_comments
-            """
-            
-            if court_id == "pickleball-1":
-                direct_query = f"""
-                    SELECT {base_fields} FROM bookings 
-                    WHERE status IN ('confirmed', 'pending_payment') 
-                    AND booking_date = %s 
-                    AND (court = %s OR sport = 'pickleball')
-                    ORDER BY start_time
-                """
-            else:
-                direct_query = f"""
-                    SELECT {base_fields} FROM bookings 
-                    WHERE status IN ('confirmed', 'pending_payment') 
-                    AND booking_date = %s 
-                    AND court = %s
-                    ORDER BY start_time
-                """
-            
-            direct_bookings = DatabaseManager.execute_query(direct_query, (date, court_id)) or []
-            
-            # Multi-purpose court conflicts
-            conflict_bookings = []
-            if court_id in Config.MULTI_PURPOSE_COURTS:
-                multi_court_type = Config.MULTI_PURPOSE_COURTS[court_id]
-                conflicting_courts = [
-                    k for k, v in Config.MULTI_PURPOSE_COURTS.items() 
-                    if v == multi_court_type and k != court_id
-                ]
-                
-                if conflicting_courts:
-                    placeholders = ",".join(["%s"] * len(conflicting_courts))
-                    conflict_query = f"""
-                        SELECT {base_fields} FROM bookings 
-                        WHERE status IN ('confirmed', 'pending_payment') 
-                        AND booking_date = %s 
-                        AND court IN ({placeholders})
-                        ORDER BY start_time
-                    """
-                    
-                    conflict_params = [date] + conflicting_courts
-                    conflict_bookings = DatabaseManager.execute_query(conflict_query, conflict_params) or []
-            
-            # Convert to list of dicts
-            all_bookings = []
-            for booking in direct_bookings + conflict_bookings:
-                if booking:
-                    booking_dict = dict(booking)
-                    # Ensure selected_slots is properly handled
-                    if booking_dict.get("selected_slots") and isinstance(booking_dict["selected_slots"], str):
-                        try:
-                            booking_dict["selected_slots"] = json.loads(booking_dict["selected_slots"])
-                        except json.JSONDecodeError:
-                            booking_dict["selected_slots"] = []
-                    all_bookings.append(booking_dict)
-            
-            return all_bookings
+    def _get_schedule_court_ids(sport_filter: str = None) -> List[str]:
+        """Courts shown on the schedule grid for a sport filter"""
+        if sport_filter and sport_filter in Config.COURT_CONFIG:
+            courts = Config.COURT_CONFIG[sport_filter]
+            logger.info(f"Filtering by sport '{sport_filter}': {len(courts)} courts")
+        else:
+            courts = []
+            for sport in ["padel", "cricket", "futsal", "pickleball"]:
+                courts.extend(Config.COURT_CONFIG[sport])
+            logger.info(f"All sports: {len(courts)} total courts")
+        return [court["id"] for court in courts]
+    
+    @staticmethod
+    def get_change_cursor() -> Optional[str]:
+        """Cursor for get_schedule_changes: '<snapshot xmin>.<epoch seconds>'.
         
+        Take it before reading the schedule. Every transaction older than the
+        snapshot xmin has finished, so changes committed after the read carry
+        a txid at or above it and are returned by the next delta call.
+        pg_current_snapshot()/pg_snapshot_xmin need PostgreSQL 13 or newer.
+        """
+        try:
+            row = DatabaseManager.execute_query("""
+                SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint AS xmin,
+                       FLOOR(EXTRACT(EPOCH FROM CURRENT_TIMESTAMP))::bigint AS issued_at
+            """, fetch_one=True)
+            return f"{row['xmin']}.{row['issued_at']}" if row else None
         except Exception as e:
-            logger.error(f"Error getting court bookings: {e}")
-            return []
+            logger.error(f"Error getting schedule change cursor: {e}")
+            return None
+    
+    @staticmethod
+    def get_schedule_changes(start_date: str, end_date: str, sport_filter: str = None, since: str = None) -> Dict:
+        """Schedule cells changed since a cursor.
+        
+        Returns {"cursor", "full": False, "changes": {date: {court: cell}}} where
+        each listed cell replaces the client's copy (an empty cell means the
+        court is now free all day). If the cursor is missing, malformed or
+        older than the change log's retention, returns {"cursor", "full": True,
+        "schedule"} instead.
+        """
+        try:
+            since_xmin, issued_at = (int(part) for part in str(since).split("."))
+        except (TypeError, ValueError):
+            since_xmin = issued_at = None
+        
+        if since_xmin is None or time.time() - issued_at > ScheduleService.CHANGE_RETENTION_SECONDS:
+            ScheduleService.prune_schedule_changes()
+            cursor = ScheduleService.get_change_cursor()
+            return {
+                "cursor": cursor,
+                "full": True,
+                "schedule": ScheduleService.get_schedule_data(start_date, end_date, sport_filter),
+            }
+        
+        cursor = ScheduleService.get_change_cursor()
+        
+        rows = DatabaseManager.execute_query("""
+            SELECT DISTINCT court, sport, change_date FROM schedule_changes
+            WHERE txid >= %s AND change_date BETWEEN %s AND %s
+        """, (since_xmin, start_date, end_date))
+        if rows is None:
+            raise Exception("Could not read schedule changes")
+        
+        # A write shows up on its own court, its multi-purpose siblings and,
+        # for stray pickleball bookings, on the pickleball court
+        court_ids = set(ScheduleService._get_schedule_court_ids(sport_filter))
+        affected = set()
+        for row in rows:
+            courts = {row["court"], *BookingUtils.get_conflicting_courts(row["court"])}
+            if row["sport"] == "pickleball":
+                courts.add("pickleball-1")
+            affected.update((row["change_date"].isoformat(), court) for court in courts & court_ids)
+        
+        changes = {}
+        if affected:
+            dates = sorted(date_str for date_str, _ in affected)
+            schedule = ScheduleService.get_schedule_data(dates[0], dates[-1], sport_filter)
+            for date_str, court_id in sorted(affected):
+                changes.setdefault(date_str, {})[court_id] = schedule.get(date_str, {}).get(court_id, {})
+        
+        logger.info(f"Schedule delta since {since}: {len(affected)} changed cells")
+        return {"cursor": cursor, "full": False, "changes": changes}
+    
+    @staticmethod
+    def prune_schedule_changes() -> int:
+        """Drop change-log rows no valid cursor can still ask for"""
+        result = DatabaseManager.execute_query(
+            "DELETE FROM schedule_changes WHERE changed_at < CURRENT_TIMESTAMP - make_interval(secs => %s)",
+            (ScheduleService.CHANGE_RETENTION_SECONDS * 2,), fetch_all=False
+        )
+        return result or 0
     
     @staticmethod
-    def _is_multi_purpose_conflict(court_id: str, booking_court: str, slot_time: str, date: str) -> bool:
-        """Check if this is a multi-purpose court conflict"""
+    def _booking_slot_data(booking: Dict, court_id: str, is_conflict: bool) -> Dict:
+        """Schedule cell for a booking shown on court_id (shared by all of its slots)"""
+        # Create slot data with promo code information and both comment types
+        return {
+            "status": "booked-conflict" if is_conflict else ScheduleService._get_booking_status(booking),
+            "title": booking.get("player_name", "Booked"),
+            "subtitle": f"PKR {booking.get('total_amount', 0):,}" + (" - Multi Court" if is_conflict else ""),
+            "bookingId": booking.get("id"),
+            "playerName": booking.get("player_name"),
+            "playerPhone": booking.get("player_phone"),
+            "amount": booking.get("total_amount"),
+            "duration": booking.get("duration"),
+            "originalCourt": booking.get("court") if is_conflict else court_id,
+            "customerComments": booking.get("special_requests", ""),  # Customer requests
+            "adminComments": booking.get("admin_comments", ""),       # Admin comments
+            "comments": booking.get("special_requests", ""),         # Legacy field for compatibility
+            "promoCode": booking.get("promo_code"),
+            "discountAmount": booking.get("discount_amount", 0),
+            "originalAmount": booking.get("original_amount"),
+        }
+    
+    @staticmethod
+    def _get_range_bookings(court_ids: List[str], start_date: str, end_date: str) -> List[Dict]:
+        """Get all active bookings shown on the given courts over a date range, in one query"""
         try:
-            is_conflict = (
-                court_id in Config.MULTI_PURPOSE_COURTS and
-                booking_court != court_id and
-                booking_court in Config.MULTI_PURPOSE_COURTS and
-                Config.MULTI_PURPOSE_COURTS[court_id] == Config.MULTI_PURPOSE_COURTS[booking_court]
-            )
+            # Sibling multi-purpose courts project their bookings onto the shown ones
+            query_courts = set(court_ids)
+            for court_id in court_ids:
+                query_courts.update(BookingUtils.get_conflicting_courts(court_id))
+            
+            query = """
+                SELECT id, sport, court, court_name, booking_date, start_time, end_time,
+                       duration, slot_mask, player_name, player_phone, player_email,
+                       player_count, special_requests, payment_type, total_amount, status,
+                       payment_verified, created_at, confirmed_at, cancelled_at,
+                       promo_code, discount_amount, original_amount, admin_comments
+                FROM bookings
+                WHERE status IN ('confirmed', 'pending_payment')
+                AND booking_date BETWEEN %s AND %s
+                AND (court = ANY(%s) OR (%s AND sport = 'pickleball'))
+                ORDER BY booking_date, start_time
+            """
             
-            if is_conflict:
-                logger.info(f"Multi-purpose conflict detected: {court_id} vs {booking_court} at {slot_time}")
+            rows = DatabaseManager.execute_query(
+                query, (start_date, end_date, sorted(query_courts), "pickleball-1" in court_ids)
+            ) or []
             
-            return is_conflict
+            return [dict(row) for row in rows]
+        
         except Exception as e:
-            logger.error(f"Error checking multi-purpose conflict: {e}")
-            return False
+            logger.error(f"Error getting bookings for {start_date} to {end_date}: {e}")
+            return []
     
     @staticmethod
     def _get_booking_status(booking: Dict) -> str:
@@ -236,33 +263,32 @@ class ScheduleService:
             return "booked-pending"
     
     @staticmethod
-    def _get_blocked_slots(court_id: str, date: str) -> List[Dict]:
-        """Get blocked slots for a specific court and date"""
+    def _get_range_blocked_slots(court_ids: List[str], start_date: str, end_date: str) -> List[Dict]:
+        """Get blocked slots for the given courts over a date range, in one query"""
         try:
             query = """
-                SELECT time_slot, reason, blocked_by, created_at
+                SELECT court, date, time_slot, reason, blocked_by, created_at
                 FROM blocked_slots 
-                WHERE court = %s AND date = %s
-                ORDER BY time_slot
+                WHERE court = ANY(%s) AND date BETWEEN %s AND %s
+                ORDER BY date, time_slot
             """
             
-            results = DatabaseManager.execute_query(query, (court_id, date))
+            results = DatabaseManager.execute_query(query, (court_ids, start_date, end_date)) or []
             
-            if results:
-                blocked_slots = []
-                for row in results:
-                    blocked_slots.append({
-                        "time_slot": row["time_slot"].strftime("%H:%M"),
-                        "reason": row["reason"],
-                        "blocked_by": row["blocked_by"],
-                        "created_at": row["created_at"]
-                    })
-                
-                logger.info(f"Found {len(blocked_slots)} blocked slots for {court_id} on {date}")
-                return blocked_slots
-            else:
-                return []
+            blocked_slots = []
+            for row in results:
+                blocked_slots.append({
+                    "court": row["court"],
+                    "date": row["date"].isoformat(),
+                    "time_slot": row["time_slot"].strftime("%H:%M"),
+                    "reason": row["reason"],
+                    "blocked_by": row["blocked_by"],
+                    "created_at": row["created_at"]
+                })
+            
+            logger.info(f"Found {len(blocked_slots)} blocked slots for {start_date} to {end_date}")
+            return blocked_slots
                 
         except Exception as e:
-            logger.error(f"Error getting blocked slots for {court_id} on {date}: {e}")
+            logger.error(f"Error getting blocked slots for {start_date} to {end_date}: {e}")
             return []
@@ -109,7 +109,7 @@ class PricingManager {
                                     <li><a class="dropdown-item" href="#" onclick="editPricing('${pricing.court_id}')">
                                         <i class="fas fa-edit me-2"></i>Edit
                                     </a></li>
-                                    <li><a class="dropdown-item text-danger" href="#" onclick="deletePricing('${pricing.court_id}')">
+                                    <li><a class="dropdown-item text-danger" href="#" onclick="deletePricing('${pricing.court_id}', ${pricing.id})">
                                         <i class="fas fa-trash me-2"></i>Remove
                                     </a></li>
                                 </ul>
@@ -253,15 +253,16 @@ class PricingManager {
         }
     }
 
-    async deletePricing(courtId) {
-        if (!confirm('Are you sure you want to remove pricing for this court? This action cannot be undone.')) {
+    async deletePricing(courtId, pricingId) {
+        if (!confirm('Are you sure you want to remove this pricing? This action cannot be undone.')) {
             return;
         }
 
         try {
-            console.log('🗑️ Deleting pricing for court:', courtId);
+            console.log('🗑️ Deleting pricing for court:', courtId, pricingId);
 
-            const response = await fetch(`/admin/api/pricing/${courtId}`, {
+            const query = pricingId ? `?id=${pricingId}` : '';
+            const response = await fetch(`/admin/api/pricing/${courtId}${query}`, {
                 method: 'DELETE',
                 headers: {
                     'Content-Type': 'application/json'
@@ -323,6 +324,9 @@ class PricingManager {
         document.getElementById('peakPrice').value = pricing.peak_price || '';
         document.getElementById('offPeakPrice').value = pricing.off_peak_price || '';
         document.getElementById('weekendPrice').value = pricing.weekend_price || '';
+        // Saving an edit adds a version from today unless dates are given
+        document.getElementById('effectiveFrom').value = '';
+        document.getElementById('effectiveUntil').value = '';
     }
 
     showAddPricingModal() {
@@ -410,8 +414,8 @@ function editPricing(courtId) {
     pricingManager.editPricing(courtId);
 }
 
-function deletePricing(courtId) {
-    pricingManager.deletePricing(courtId);
+function deletePricing(courtId, pricingId) {
+    pricingManager.deletePricing(courtId, pricingId);
 }
 
 function showTimingConfigModal() {
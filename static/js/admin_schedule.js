@@ -41,6 +41,8 @@ class AdminScheduleManager {
     this.currentDate = new Date();
     this.currentView = "day"; // default to day view for single-day layout
     this.scheduleData = {};
+    this.scheduleCursor = null; // change cursor from the last schedule load
+    this.scheduleRequestKey = null; // range/sport the cursor belongs to
     this.selectedSlot = null;
     this.isSubmittingBooking = false;
 
@@ -78,6 +80,9 @@ class AdminScheduleManager {
       archery: [
         { id: "archery-1", name: "Lane 1: Archery Range", pricing: 3500 },
       ],
+      rage_room: [
+        { id: "rage-room-1", name: "Rage Room", pricing: 0, slotMinutes: 15 },
+      ],
     };
 
     // Multi-purpose mapping
@@ -87,28 +92,43 @@ class AdminScheduleManager {
     };
 
     // Build time slots for a single day:
-    // 00:00–05:30 (12 slots), then 14:00–23:30 (20 slots) = 32 slots total
+    // 00:00–05:30 (12 slots), then 14:00–23:30 (20 slots) = 32 slots total;
+    // twice as many rows for 15-minute lanes (see applySlotGrid)
+    this.slotMinutes = 30;
     this.timeSlots = this.generateTimeSlots();
 
     // Init
     this.init();
   }
 
-  // ===== Time slots (workday 14:00 -> 06:00 next day) =====
+  // ===== Time slots (workday 14:00 -> 06:00 next day, every this.slotMinutes) =====
   generateTimeSlots() {
     const slots = [];
+    const addRange = (fromMins, toMins) => {
+      for (let mins = fromMins; mins < toMins; mins += this.slotMinutes) {
+        slots.push(
+          `${String(Math.floor(mins / 60)).padStart(2, "0")}:${String(
+            mins % 60
+          ).padStart(2, "0")}`
+        );
+      }
+    };
     // Afternoon/Evening: 14:00..23:30
-    for (let hour = 14; hour < 24; hour++) {
-      slots.push(`${String(hour).padStart(2, "0")}:00`);
-      slots.push(`${String(hour).padStart(2, "0")}:30`);
-    }
+    addRange(14 * 60, 24 * 60);
     // Next-day early morning: 00:00..05:30
-    for (let hour = 0; hour < 6; hour++) {
-      slots.push(`${String(hour).padStart(2, "0")}:00`);
-      slots.push(`${String(hour).padStart(2, "0")}:30`);
-    }
+    addRange(0, 6 * 60);
     return slots;
   }
+
+  // Rows follow the slot length of the filtered sport's courts (15-minute lanes)
+  applySlotGrid(sport) {
+    const courts = (sport && this.courtConfig[sport]) || [];
+    const minutes = courts[0]?.slotMinutes || 30;
+    if (minutes !== this.slotMinutes) {
+      this.slotMinutes = minutes;
+      this.timeSlots = this.generateTimeSlots();
+    }
+  }
   // Session labeling helpers
   isMorningSlot(time) {
     const h = parseInt(time.split(":")[0], 10);
@@ -126,8 +146,8 @@ class AdminScheduleManager {
   getTimeSegment(time /* 'HH:mm' */) {
     const [h, m] = time.split(":").map(Number);
     const mins = h * 60 + m;
-    if (mins >= 0 && mins <= 330) return "night"; // 00:00–05:30
-    if (mins >= 840 && mins <= 1410) return "day"; // 14:00–23:30
+    if (mins >= 0 && mins < 360) return "night"; // 00:00–05:30
+    if (mins >= 840 && mins < 1440) return "day"; // 14:00–23:30
     return "gap"; // 05:30–14:00 (closed)
   }
 
@@ -277,31 +297,10 @@ class AdminScheduleManager {
     this.showLoading(true);
     try {
       const sportFilter = document.getElementById("sport-filter")?.value || "";
-      if (sportFilter === "rage_room") {
-        this.scheduleData = {};
-        this.renderRageRoomNotice();
-        this.showLoading(false);
-        return;
-      }
+      this.applySlotGrid(sportFilter);
 
-      const startDate =
-        this.currentView === "week"
-          ? this.getWeekStartDate(this.currentDate)
-          : new Date(this.currentDate);
-      const endDate =
-        this.currentView === "week"
-          ? (() => {
-              const end = new Date(startDate);
-              end.setDate(startDate.getDate() + 6);
-              return end;
-            })()
-          : new Date(this.currentDate);
-
-      const requestData = {
-        startDate: localDateKey(startDate),
-        endDate: localDateKey(endDate),
-        sport: document.getElementById("sport-filter")?.value || "",
-      };
+      const requestData = this.getScheduleRequest();
+      this.scheduleCursor = null;
 
       console.log("🔧 Load schedule:", requestData);
 
@@ -317,6 +316,8 @@ class AdminScheduleManager {
         throw new Error(data.message || "Failed to load schedule");
 
       this.scheduleData = data.schedule || {};
+      this.scheduleCursor = data.cursor || null;
+      this.scheduleRequestKey = JSON.stringify(requestData);
       console.log("📊 Days loaded:", Object.keys(this.scheduleData).length);
 
       this.renderSchedule();
@@ -342,46 +343,78 @@ class AdminScheduleManager {
     }
   }
 
-  renderSchedule() {
-    const isMobile = window.innerWidth <= 768;
-    if (isMobile) this.renderExcelView();
-    else this.renderDesktopView();
+  getScheduleRequest() {
+    const startDate =
+      this.currentView === "week"
+        ? this.getWeekStartDate(this.currentDate)
+        : new Date(this.currentDate);
+    const endDate =
+      this.currentView === "week"
+        ? (() => {
+            const end = new Date(startDate);
+            end.setDate(startDate.getDate() + 6);
+            return end;
+          })()
+        : new Date(this.currentDate);
+
+    return {
+      startDate: localDateKey(startDate),
+      endDate: localDateKey(endDate),
+      sport: document.getElementById("sport-filter")?.value || "",
+    };
   }
 
-  renderRageRoomNotice() {
-    const grid = document.getElementById("schedule-grid");
-    if (grid) {
-      grid.innerHTML = `
-        <div class="rage-room-notice">
-          <div class="notice-icon"><i class="fas fa-fire-alt"></i></div>
-          <h3>Rage Room is phone-only</h3>
-          <p>Sessions are booked in 15-minute blocks directly via call or WhatsApp.</p>
-          <div class="notice-actions">
-            <a class="btn-modern primary" href="tel:+923161439569"><i class="fas fa-phone"></i> Call 0332 5021711</a>
-            <a class="btn-modern secondary" href="https://wa.me/923161439569?text=Hi%21%20I%27d%20like%20to%20book%20the%20Rage%20Room%20%2815-minute%20sessions%29.%20Please%20share%20available%20times%20and%20pricing." target="_blank"><i class="fab fa-whatsapp"></i> WhatsApp</a>
-          </div>
-          <small class="notice-footnote">Rage Room is excluded from the 30-minute slot grid to keep timings accurate.</small>
-        </div>
-      `;
+  // Fetch only the cells changed since the last load and patch them in;
+  // falls back to a full load when there is no usable cursor.
+  async refreshScheduleChanges() {
+    const requestData = this.getScheduleRequest();
+    if (
+      !this.scheduleCursor ||
+      this.scheduleRequestKey !== JSON.stringify(requestData)
+    ) {
+      return this.loadScheduleData();
     }
 
-    const excel = document.getElementById("schedule-excel");
-    if (excel) {
-      excel.innerHTML = `
-        <div class="rage-room-notice">
-          <div class="notice-icon"><i class="fas fa-fire-alt"></i></div>
-          <h3>Rage Room is phone-only</h3>
-          <p>15-minute sessions are booked directly via call or WhatsApp.</p>
-          <div class="notice-actions">
-            <a class="btn-modern primary" href="tel:+923161439569"><i class="fas fa-phone"></i> Call 0332 5021711</a>
-            <a class="btn-modern secondary" href="https://wa.me/923161439569?text=Hi%21%20I%27d%20like%20to%20book%20the%20Rage%20Room%20%2815-minute%20sessions%29.%20Please%20share%20available%20times%20and%20pricing." target="_blank"><i class="fab fa-whatsapp"></i> WhatsApp</a>
-          </div>
-          <small class="notice-footnote">Rage Room is excluded from the 30-minute slot grid to keep timings accurate.</small>
-        </div>
-      `;
+    try {
+      const res = await fetch("/admin/api/schedule-data", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ ...requestData, since: this.scheduleCursor }),
+      });
+      if (!res.ok) throw new Error(`HTTP ${res.status}: ${res.statusText}`);
+
+      const data = await res.json();
+      if (!data.success || (!data.full && !data.changes))
+        return this.loadScheduleData();
+
+      this.scheduleCursor = data.cursor || null;
+      if (data.full) {
+        this.scheduleData = data.schedule || {};
+        this.renderSchedule();
+        return;
+      }
+
+      const dates = Object.keys(data.changes);
+      if (dates.length === 0) return;
+      dates.forEach((date) => {
+        if (!this.scheduleData[date]) this.scheduleData[date] = {};
+        Object.entries(data.changes[date]).forEach(([court, cell]) => {
+          this.scheduleData[date][court] = cell || {};
+        });
+      });
+      this.renderSchedule();
+    } catch (err) {
+      console.error("❌ Schedule refresh error:", err);
+      return this.loadScheduleData();
     }
   }
 
+  renderSchedule() {
+    const isMobile = window.innerWidth <= 768;
+    if (isMobile) this.renderExcelView();
+    else this.renderDesktopView();
+  }
+
   renderDesktopView() {
     const grid = document.getElementById("schedule-grid");
     if (!grid) {
@@ -651,7 +684,7 @@ class AdminScheduleManager {
         } else if (slotData.isGroupStart) {
           const statusClass = slotData.status || "booked-pending";
           slot.className = `time-slot ${statusClass} group-start`;
-          const duration = slotData.groupSize * 0.5;
+          const duration = (slotData.groupSize * this.slotMinutes) / 60;
 
           const hasCustomerComments =
             (slotData.customerComments || slotData.special_requests) &&
@@ -1053,7 +1086,7 @@ class AdminScheduleManager {
         throw new Error(result.message || "Failed to confirm booking");
       this.showSuccessToast("Booking confirmed");
       this.closeSlotModal();
-      this.loadScheduleData();
+      this.refreshScheduleChanges();
     } catch (e) {
       console.error("❌ confirmBooking error:", e);
       this.showErrorToast("Failed to confirm booking: " + e.message);
@@ -1079,7 +1112,7 @@ class AdminScheduleManager {
         throw new Error(result.message || "Failed to decline booking");
       this.showSuccessToast("Booking declined");
       this.closeSlotModal();
-      this.loadScheduleData();
+      this.refreshScheduleChanges();
     } catch (e) {
       console.error("❌ declineBooking error:", e);
       this.showErrorToast("Failed to decline booking: " + e.message);
@@ -1105,7 +1138,7 @@ class AdminScheduleManager {
         throw new Error(result.message || "Failed to cancel booking");
       this.showSuccessToast("Booking cancelled");
       this.closeSlotModal();
-      this.loadScheduleData();
+      this.refreshScheduleChanges();
     } catch (e) {
       console.error("❌ cancelBooking error:", e);
       this.showErrorToast("Failed to cancel booking: " + e.message);
@@ -1165,7 +1198,7 @@ class AdminScheduleManager {
       if (this.selectedSlot.data)
         this.selectedSlot.data.adminComments = adminComment;
       this.showSuccessToast("Admin comment saved");
-      await this.loadScheduleData();
+      await this.refreshScheduleChanges();
       this.closeSlotModal();
     } catch (e) {
       console.error("❌ saveSlotComment error:", e);
@@ -1333,7 +1366,7 @@ class AdminScheduleManager {
       this.showSuccessToast('Booking updated successfully');
       this.closeScheduleEditModal();
       this.closeSlotModal();
-      await this.loadScheduleData();
+      await this.refreshScheduleChanges();
     } catch (err) {
       console.error('❌ handleScheduleEditSubmit error:', err);
       this.showErrorToast('Failed to update booking: ' + err.message);
@@ -1385,7 +1418,7 @@ class AdminScheduleManager {
         const timeRangeText = document.getElementById("time-range-text");
         if (timeDisplayGroup && timeRangeText) {
           timeDisplayGroup.style.display = "block";
-          const duration = this.selectedSlots.length * 0.5;
+          const duration = (this.selectedSlots.length * this.slotMinutes) / 60;
           timeRangeText.innerHTML = `${this.formatTime(
             this.startSlot.time
           )} - ${this.formatTime(this.endSlot.time)} (${duration} hours)`;
@@ -1516,7 +1549,7 @@ class AdminScheduleManager {
         this.showSuccessToast(`Booking created! ID: ${result.bookingId}`);
         this.closeQuickBookModal();
         this.clearBookingSelectionState();
-        setTimeout(() => this.loadScheduleData(), 400);
+        setTimeout(() => this.refreshScheduleChanges(), 400);
       } else {
         throw new Error(result.message || "Failed to create booking");
       }
@@ -1557,7 +1590,7 @@ class AdminScheduleManager {
     if (isNewSelection) {
       startTime = this.startSlot.time;
       endTime = this.endSlot.time;
-      duration = this.selectedSlots.length * 0.5;
+      duration = (this.selectedSlots.length * this.slotMinutes) / 60;
       courtId = this.startSlot.courtId;
       courtSport = this.getCourtSport(courtId);
       courtName = this.getCourtName(courtId);
@@ -1690,12 +1723,12 @@ class AdminScheduleManager {
     }
   }
 
-  // Build 30-min slots from startTime for duration (hours)
+  // Build slots of the current grid from startTime for duration (hours)
   generateSlotsForDuration(startTime, durationHours) {
     const out = [];
     try {
       const [h0, m0] = startTime.split(":").map(Number);
-      const count = Math.ceil(durationHours * 2); // 30-min
+      const count = Math.ceil((durationHours * 60) / this.slotMinutes);
       let h = h0,
         m = m0;
 
@@ -1704,7 +1737,7 @@ class AdminScheduleManager {
           time: `${String(h).padStart(2, "0")}:${String(m).padStart(2, "0")}`,
           index: i,
         });
-        m += 30;
+        m += this.slotMinutes;
         if (m >= 60) {
           m -= 60;
           h = (h + 1) % 24;
@@ -1721,10 +1754,10 @@ class AdminScheduleManager {
   generateSelectedSlots(startTime, durationHours) {
     try {
       const [h0, m0] = startTime.split(":").map(Number);
-      const total = Math.ceil(durationHours * 2);
+      const total = Math.ceil((durationHours * 60) / this.slotMinutes);
       const slots = [];
       for (let i = 0; i < total; i++) {
-        const mins = h0 * 60 + m0 + i * 30;
+        const mins = h0 * 60 + m0 + i * this.slotMinutes;
         const hh = Math.floor((mins / 60) % 24);
         const mm = mins % 60;
         slots.push({
@@ -2275,7 +2308,7 @@ class AdminScheduleManager {
         } else if (slotData.isGroupStart) {
           const status = slotData.status || "booked-pending";
           slot.className = `excel-slot ${status} group-start`;
-          const duration = slotData.groupSize * 0.5;
+          const duration = (slotData.groupSize * this.slotMinutes) / 60;
 
           const hasCust =
             (
@@ -2508,7 +2541,7 @@ class AdminScheduleManager {
     const btn = document.getElementById("refresh-schedule");
     const icon = btn?.querySelector("i");
     if (icon) icon.style.animation = "spin 1s linear infinite";
-    this.loadScheduleData().finally(() => {
+    this.refreshScheduleChanges().finally(() => {
       if (icon) icon.style.animation = "";
     });
   }
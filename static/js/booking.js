@@ -23,6 +23,8 @@ class BookingSystem {
       originalAmount: 0,
       discountAmount: 0,
       promoCode: "",
+      holdToken: "",           // checkout hold on selectedSlots (see holdSelectedSlots)
+      quoteToken: "",          // signed price quote for the booking (see requestQuote)
       // derived
       isCrossMidnight: false,
       actualStartDate: "",
@@ -30,6 +32,14 @@ class BookingSystem {
       finalBookingDate: ""     // ALWAYS the selected calendar date (workday)
     };
 
+    // Per-date availability of all courts of a sport (short-lived, so switching
+    // courts on the same date does not refetch)
+    this.availabilityCache = {};
+    this.availabilityCacheMs = 30000;
+
+    // Per-date slot prices of all courts of a sport (see priceSelectionLocally)
+    this.priceMatrixCache = {};
+
     this.rageRoomContact = {
       phone: "03161439569",
       whatsapp: "923161439569"
@@ -468,8 +478,9 @@ class BookingSystem {
     if (modal) modal.style.display = "none";
   }
 
-  nextStep() {
+  async nextStep() {
     if (this.currentStep >= 4) return;
+    if (this.currentStep === 2 && !(await this.holdSelectedSlots())) return;
     if (this.currentStep === 3) {
       // Force validation with visible messages
       const ok = this.validateStep3(true);
@@ -489,6 +500,39 @@ class BookingSystem {
     this.initializeCurrentStep();
   }
 
+  // Reserve the chosen slots for a few minutes while the customer checks out.
+  // Returns false (and refreshes the grid) only if a slot was taken meanwhile.
+  async holdSelectedSlots() {
+    try {
+      const response = await fetch("/api/slot-holds", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          court: this.bookingData.court,
+          date: this.bookingData.finalBookingDate || this.bookingData.date, // workday date
+          selectedSlots: this.bookingData.selectedSlots,
+          holdToken: this.bookingData.holdToken || undefined,
+        }),
+      });
+      const result = await response.json();
+      if (response.status === 409) {
+        this.bookingData.holdToken = "";
+        this.bookingData.selectedSlots = [];
+        this.availabilityCache = {};
+        alert(`Sorry, ${(result.conflicts || []).map((t) => this.formatTime(t)).join(", ")} was just taken. Please choose another time.`);
+        await this.loadTimeSlots();
+        this.updateSelectedSlotsDisplay();
+        this.validateStep2();
+        return false;
+      }
+      if (result.success) this.bookingData.holdToken = result.holdToken;
+    } catch (error) {
+      // Holding is best-effort; create-booking still re-checks availability
+      console.error("Slot hold error:", error);
+    }
+    return true;
+  }
+
   prevStep() {
     if (this.currentStep <= 1) return;
     const cur = document.getElementById(`step-${this.currentStep}`);
@@ -611,24 +655,31 @@ class BookingSystem {
     container.innerHTML = '<div class="loading">Loading available slots...</div>';
 
     try {
-      const response = await fetch("/api/booked-slots", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          court: this.bookingData.court,
-          date: this.bookingData.finalBookingDate || this.bookingData.date, // workday date
-        }),
-      });
-
-      if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-      const bookedSlots = await response.json();
-      this.renderTimeSlots(container, bookedSlots);
+      const date = this.bookingData.finalBookingDate || this.bookingData.date; // workday date
+      const courts = await this.fetchAvailability(this.bookingData.sport, date);
+      this.renderTimeSlots(container, courts[this.bookingData.court] || []);
     } catch (error) {
       console.error("Error loading time slots:", error);
       container.innerHTML = '<div class="error">Error loading time slots. Please try again.</div>';
     }
   }
 
+  async fetchAvailability(sport, date) {
+    // Our own checkout hold is shown as free so the selection can be kept
+    const holdToken = this.bookingData.holdToken;
+    const key = `${sport}|${date}|${holdToken}`;
+    const cached = this.availabilityCache[key];
+    if (cached && Date.now() - cached.fetchedAt < this.availabilityCacheMs) return cached.courts;
+
+    const params = new URLSearchParams({ date, sport });
+    if (holdToken) params.set("holdToken", holdToken);
+    const response = await fetch(`/api/availability?${params}`);
+    if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+    const data = await response.json();
+    this.availabilityCache[key] = { courts: data.courts || {}, fetchedAt: Date.now() };
+    return this.availabilityCache[key].courts;
+  }
+
   renderTimeSlots(container, bookedSlots) {
     container.innerHTML = "";
     let nextDayHeaderAdded = false;
@@ -891,9 +942,9 @@ class BookingSystem {
       }
 
       confirmBtn.textContent = "Checking availability...";
-      const conflictCheck = await this.checkForConflicts();
-      if (conflictCheck.hasConflict) {
-        alert(`Sorry, ${conflictCheck.message}. Please go back and select different time slots.`);
+      const quote = await this.requestQuote();
+      if (!quote.success) {
+        alert(`Sorry, ${quote.message}. Please go back and select different time slots.`);
         return;
       }
 
@@ -913,8 +964,13 @@ class BookingSystem {
       });
 
       const result = await response.json();
+      // Whatever happened, the slots shown for this date are now stale
+      this.availabilityCache = {};
+
+      this.bookingData.quoteToken = "";
 
       if (result.success) {
+        this.bookingData.holdToken = "";
         this.showBookingConfirmation(result.bookingId);
         await this.sendAdminNotification(result.bookingId);
         await this.sendCustomerNotification(result.bookingId);
@@ -959,22 +1015,37 @@ class BookingSystem {
     if (a2) a2.href = href;
   }
 
-  async checkForConflicts() {
+  // Availability, price and promo in one call; the signed quote is booked
+  // at exactly these amounts by create-booking
+  async requestQuote() {
     try {
-      const conflictCheckData = {
-        court: this.bookingData.court,
-        date: this.bookingData.finalBookingDate || this.bookingData.date, // workday
-        selectedSlots: this.bookingData.selectedSlots,
-      };
-      const response = await fetch("/api/check-conflicts", {
+      const response = await fetch("/api/quote", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify(conflictCheckData),
+        body: JSON.stringify({
+          court: this.bookingData.court,
+          date: this.bookingData.finalBookingDate || this.bookingData.date, // workday
+          selectedSlots: this.bookingData.selectedSlots,
+          sport: this.bookingData.sport,
+          promoCode: this.bookingData.promoCode || undefined,
+          holdToken: this.bookingData.holdToken || undefined,
+        }),
       });
-      return await response.json();
+      const result = await response.json();
+      if (response.status === 409) {
+        const taken = (result.conflicts || []).map((t) => this.formatTime(t)).join(", ");
+        return { success: false, message: `${taken} is no longer available` };
+      }
+      if (!result.success) return { success: false, message: result.message || "Error checking availability" };
+
+      this.bookingData.originalAmount = result.originalAmount;
+      this.bookingData.discountAmount = result.discountAmount;
+      this.bookingData.totalAmount = result.totalAmount;
+      this.bookingData.quoteToken = result.quoteToken;
+      return result;
     } catch (error) {
-      console.error("Error checking conflicts:", error);
-      return { hasConflict: true, message: "Error checking availability" };
+      console.error("Error requesting quote:", error);
+      return { success: false, message: "Error checking availability" };
     }
   }
 
@@ -1105,7 +1176,53 @@ class BookingSystem {
     }
   }
 
+  async fetchPriceMatrix(sport, date) {
+    const key = `${sport}|${date}`;
+    if (!this.priceMatrixCache[key]) {
+      const params = new URLSearchParams({ date, sport });
+      this.priceMatrixCache[key] = fetch(`/api/price-matrix?${params}`)
+        .then((response) => {
+          if (!response.ok) throw new Error(`HTTP ${response.status}`);
+          return response.json();
+        })
+        .then((data) => data.courts || {})
+        .catch((error) => {
+          delete this.priceMatrixCache[key];
+          throw error;
+        });
+    }
+    return this.priceMatrixCache[key];
+  }
+
+  // Sum of the selected slots' prices from the day's price matrix, or null
+  // if any slot is missing from it
+  async priceSelectionLocally() {
+    const date = this.bookingData.finalBookingDate || this.bookingData.date;
+    const courts = await this.fetchPriceMatrix(this.bookingData.sport, date);
+    const prices = courts[this.bookingData.court]?.prices;
+    if (!prices) return null;
+
+    let total = 0;
+    for (const slot of this.bookingData.selectedSlots) {
+      const price = prices[slot.time ?? slot];
+      if (price === undefined) return null;
+      total += price;
+    }
+    return total;
+  }
+
   async calculateDynamicPrice() {
+    try {
+      const total = await this.priceSelectionLocally();
+      if (total !== null) {
+        this.bookingData.totalAmount = total;
+        this.bookingData.originalAmount = total;
+        return;
+      }
+    } catch (error) {
+      console.warn("Price matrix unavailable, asking the server:", error);
+    }
+
     try {
       const response = await fetch("/api/calculate-price", {
         method: "POST",
@@ -108,7 +108,9 @@ class APIClient {
             const response = await fetch(url, config);
             
             if (!response.ok) {
-                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+                // Prefer the API's own message (e.g. which slots are taken on a 409)
+                const body = await response.json().catch(() => null);
+                throw new Error(body?.message || `HTTP ${response.status}: ${response.statusText}`);
             }
             
             return await response.json();
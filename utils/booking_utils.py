@@ -7,6 +7,7 @@ from typing import List, Dict, Optional
 import logging
 
 from config import Config
+from utils.time_utils import SlotGrid, TimeUtils
 
 logger = logging.getLogger(__name__)
 
@@ -109,6 +110,15 @@ class BookingUtils:
             logger.error(f"Error getting court info: {e}")
             return None
     
+    @staticmethod
+    def is_phone_only(court_id: str) -> bool:
+        """Courts booked by staff only (no online checkout or price list)"""
+        for courts in Config.COURT_CONFIG.values():
+            for court in courts:
+                if court["id"] == court_id:
+                    return court.get("booking_mode") == "phone_only"
+        return False
+    
     @staticmethod
     def get_sport_from_court(court_id: str) -> str:
         """Get sport type from court ID"""
@@ -137,7 +147,26 @@ class BookingUtils:
             k for k, v in Config.MULTI_PURPOSE_COURTS.items()
             if v == multi_court_type and k != court_id
         ]
-    
+
+    @staticmethod
+    def get_slot_minutes(court_id: str) -> int:
+        """Slot length of a court's booking grid (COURT_CONFIG "slot_minutes", default 30)"""
+        for courts in Config.COURT_CONFIG.values():
+            for court in courts:
+                if court["id"] == court_id:
+                    return court.get("slot_minutes", TimeUtils.SLOT_MINUTES)
+        return TimeUtils.SLOT_MINUTES
+
+    @staticmethod
+    def get_slot_grid(court_id: str) -> SlotGrid:
+        """The SlotGrid a court's slots, bitmaps and slot numbers are expressed on"""
+        return TimeUtils.slot_grid(BookingUtils.get_slot_minutes(court_id))
+
+    @staticmethod
+    def get_resource_group(court_id: str) -> str:
+        """Get the physical resource a court occupies (shared by multi-purpose courts)"""
+        return Config.MULTI_PURPOSE_COURTS.get(court_id, court_id)
+
     @staticmethod
     def format_booking_status(status: str) -> str:
         """Format booking status for display"""
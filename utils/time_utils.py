@@ -1,15 +1,234 @@
 """
 Time utility functions for booking and scheduling operations.
 """
-from datetime import datetime, timedelta
+import bisect
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
 from typing import List, Tuple
 import logging
 
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    from backports.zoneinfo import ZoneInfo
+
+from config import Config
+
 logger = logging.getLogger(__name__)
 
+
+class SlotGrid:
+    """Slot layout of a workday for one slot length.
+
+    Slot ``i`` starts ``i * minutes`` after the 05:30 workday start, so a
+    30-minute grid has 48 slots and a 15-minute grid 96. Occupancy bitmaps
+    over a grid use bit ``i`` for slot ``i``.
+    """
+    
+    __slots__ = ("minutes", "count", "full_mask", "times", "hours", "index_by_time")
+    
+    def __init__(self, minutes: int):
+        if (24 * 60) % minutes or TimeUtils.WORKDAY_START_MINUTES % minutes:
+            raise ValueError(f"Unsupported slot length: {minutes} minutes")
+        self.minutes = minutes
+        self.count = 24 * 60 // minutes
+        self.full_mask = (1 << self.count) - 1
+        offsets = [(TimeUtils.WORKDAY_START_MINUTES + i * minutes) % (24 * 60) for i in range(self.count)]
+        self.times = tuple(f"{m // 60:02d}:{m % 60:02d}" for m in offsets)
+        self.hours = tuple(m // 60 for m in offsets)
+        self.index_by_time = {label: i for i, label in enumerate(self.times)}
+    
+    def time_to_index(self, time_str: str) -> int:
+        """Map 'HH:mm' to the slot containing it"""
+        index = self.index_by_time.get(time_str)
+        if index is not None:
+            return index
+        hour, minute = map(int, time_str.split(':')[:2])
+        return (hour * 60 + minute - TimeUtils.WORKDAY_START_MINUTES) % (24 * 60) // self.minutes
+    
+    def index_to_time(self, slot_index: int) -> str:
+        return self.times[slot_index % self.count]
+    
+    def to_indexes(self, slots) -> List[int]:
+        """Sorted slot numbers from API slot shapes ({"time": ...}, 'HH:mm' or int)"""
+        indexes = set()
+        for slot in slots:
+            if isinstance(slot, dict):
+                slot = slot.get("time")
+            if isinstance(slot, int):
+                indexes.add(slot)
+            elif isinstance(slot, str) and ':' in slot:
+                indexes.add(self.time_to_index(slot))
+        return sorted(indexes)
+    
+    def require_contiguous(self, slot_indexes: List[int]) -> None:
+        """Raise ValueError unless the sorted slot numbers form one unbroken run.
+        
+        A booking is stored as a single start/end span, so a gap (or a
+        selection wrapping past the 05:30 end of the workday, e.g. 05:00 and
+        05:30) would cover slots it does not occupy.
+        """
+        if not slot_indexes:
+            raise ValueError("No time slots selected")
+        if slot_indexes[-1] - slot_indexes[0] + 1 != len(slot_indexes):
+            raise ValueError("Selected time slots must be consecutive within one workday (05:30 to 05:30)")
+    
+    def slot_count(self, duration: float) -> int:
+        """Slots in ``duration`` hours"""
+        return int(duration * 60 / self.minutes)
+    
+    def indexes_from_start(self, start_time: str, duration: float) -> List[int]:
+        """Consecutive slot numbers covering ``duration`` hours from ``start_time``.
+        
+        Raises ValueError if they would run past the 05:30 end of the workday.
+        """
+        first = self.time_to_index(start_time)
+        count = self.slot_count(duration)
+        if first + count > self.count:
+            raise ValueError("booking crosses the 05:30 workday boundary")
+        return list(range(first, first + count))
+    
+    def convert_mask(self, mask: int, source: "SlotGrid") -> int:
+        """Re-express a ``source``-grid bitmap on this grid (slots covering any occupied minute)"""
+        converted = 0
+        for index in TimeUtils.mask_to_slot_indexes(mask):
+            start = index * source.minutes
+            for target in range(start // self.minutes, (start + source.minutes - 1) // self.minutes + 1):
+                converted |= 1 << target
+        return converted
+
+
+class WorkdaySlots:
+    """Slot boundaries of one workday on a grid: ``local[i]``/``utc[i]`` is
+    where slot i starts, and index ``grid.count`` is the 05:30 end of the workday."""
+    
+    __slots__ = ("workday", "grid", "local", "utc")
+    
+    def __init__(self, workday: date, grid: SlotGrid):
+        tz = ZoneInfo(Config.ARENA_TIMEZONE)
+        day_start = datetime(workday.year, workday.month, workday.day, tzinfo=tz)
+        self.workday = workday
+        self.grid = grid
+        self.local = tuple(
+            day_start + timedelta(minutes=TimeUtils.WORKDAY_START_MINUTES + i * grid.minutes)
+            for i in range(grid.count + 1)
+        )
+        self.utc = tuple(dt.astimezone(timezone.utc) for dt in self.local)
+    
+    def span_utc(self, slot_indexes: List[int]) -> Tuple[datetime, datetime]:
+        """UTC start of the first slot and end of the last"""
+        return self.utc[min(slot_indexes)], self.utc[max(slot_indexes) + 1]
+    
+    def index_at(self, moment: datetime) -> int:
+        """Slot containing an aware datetime, or -1 if it is outside this workday"""
+        index = bisect.bisect_right(self.utc, moment) - 1
+        return index if 0 <= index < self.grid.count else -1
+
+
 class TimeUtils:
     """Utility class for time-related operations"""
     
+    # A workday runs 05:30 → 05:30 (next calendar day); courts use 30-minute
+    # slots unless Config.COURT_CONFIG gives them a "slot_minutes" of their own
+    WORKDAY_START_MINUTES = 5 * 60 + 30
+    SLOT_MINUTES = 30
+    SLOTS_PER_WORKDAY = 24 * 60 // SLOT_MINUTES
+    
+    # Per-workday, per-grid slot → local/UTC tables (see workday_slots), least recently used first
+    WORKDAY_TABLE_CACHE_SIZE = 512
+    _workday_tables = OrderedDict()
+    _workday_tables_lock = threading.Lock()
+    
+    # Slot length (minutes) -> SlotGrid
+    _grids = {}
+    
+    @staticmethod
+    def slot_grid(slot_minutes: int = None) -> SlotGrid:
+        """Shared SlotGrid for a slot length (default: 30 minutes)"""
+        slot_minutes = slot_minutes or TimeUtils.SLOT_MINUTES
+        grid = TimeUtils._grids.get(slot_minutes)
+        if grid is None:
+            grid = TimeUtils._grids.setdefault(slot_minutes, SlotGrid(slot_minutes))
+        return grid
+    
+    @staticmethod
+    def time_to_slot_index(time_str: str) -> int:
+        """Map 'HH:mm' to its 30-minute slot number within the workday (05:30 → 0, 05:00 → 47)"""
+        return TimeUtils.slot_grid().time_to_index(time_str)
+    
+    @staticmethod
+    def slot_index_to_time(slot_index: int) -> str:
+        """Map a 30-minute workday slot number back to 'HH:mm'"""
+        return TimeUtils.slot_grid().index_to_time(slot_index)
+    
+    @staticmethod
+    def workday_slots(workday, slot_minutes: int = None) -> WorkdaySlots:
+        """Cached slot → local/UTC table for a workday ('YYYY-MM-DD' or date) on a grid"""
+        if not isinstance(workday, date):
+            workday = datetime.strptime(workday, "%Y-%m-%d").date()
+        grid = TimeUtils.slot_grid(slot_minutes)
+        key = (workday, grid.minutes)
+        tables = TimeUtils._workday_tables
+        with TimeUtils._workday_tables_lock:
+            table = tables.get(key)
+            if table is not None:
+                tables.move_to_end(key)
+                return table
+        
+        table = WorkdaySlots(workday, grid)
+        with TimeUtils._workday_tables_lock:
+            tables[key] = table
+            while len(tables) > TimeUtils.WORKDAY_TABLE_CACHE_SIZE:
+                tables.popitem(last=False)
+        return table
+    
+    @staticmethod
+    def locate_slot(moment: datetime, slot_minutes: int = None) -> Tuple[date, int]:
+        """(workday, slot number on the grid) containing an aware datetime"""
+        local = moment.astimezone(ZoneInfo(Config.ARENA_TIMEZONE))
+        workday = (local - timedelta(minutes=TimeUtils.WORKDAY_START_MINUTES)).date()
+        return workday, TimeUtils.workday_slots(workday, slot_minutes).index_at(moment)
+    
+    @staticmethod
+    def to_slot_indexes(slots) -> List[int]:
+        """Sorted 30-minute slot numbers from API slot shapes ({"time": ...}, 'HH:mm' or int)"""
+        return TimeUtils.slot_grid().to_indexes(slots)
+    
+    @staticmethod
+    def slot_indexes_to_mask(indexes: List[int]) -> int:
+        """Bitmask with bit i set for workday slot i (what bookings.slot_mask stores)"""
+        mask = 0
+        for index in indexes:
+            mask |= 1 << index
+        return mask
+    
+    @staticmethod
+    def mask_to_slot_indexes(mask: int) -> List[int]:
+        """Inverse of slot_indexes_to_mask"""
+        indexes = []
+        while mask:
+            low = mask & -mask
+            indexes.append(low.bit_length() - 1)
+            mask ^= low
+        return indexes
+    
+    @staticmethod
+    def slot_index_hour(slot_index: int) -> int:
+        """Local clock hour (0-23) a 30-minute workday slot starts in"""
+        return TimeUtils.slot_grid().hours[slot_index]
+    
+    @staticmethod
+    def slot_indexes_from_start(start_time: str, duration: float) -> List[int]:
+        """Consecutive 30-minute slot numbers covering ``duration`` hours from ``start_time``"""
+        return TimeUtils.slot_grid().indexes_from_start(start_time, duration)
+    
+    @staticmethod
+    def booking_span_utc(workday: str, slot_times: List, slot_minutes: int = None) -> Tuple[datetime, datetime]:
+        """UTC start/end of a booking's slots on a workday (00:00–05:30 fall on the next calendar day)"""
+        table = TimeUtils.workday_slots(workday, slot_minutes)
+        return table.span_utc(table.grid.to_indexes(slot_times))
+    
     @staticmethod
     def calculate_end_time(start_time: str, duration: float) -> str:
         """Calculate end time based on start time and duration in hours"""
@@ -110,4 +329,5 @@ class TimeUtils:
         times1 = {slot["time"] for slot in slots1 if "time" in slot}
         times2 = {slot["time"] for slot in slots2 if "time" in slot}
         overlaps = times1.intersection(times2)
-        return list(overlaps)
\ No newline at end of file
+        return list(overlaps)
+